@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+
+"""
+Memory benchmark comparing the buffered and the streamed download of episode audio files.
+
+Serves a synthetic audio file of configurable size from a local HTTP server and reports the peak of the memory
+allocated by Python while downloading it, once buffered in a 'BytesIO' object and once streamed to disk in chunks.
+
+Usage: python benchmarks/bench_audio_memory.py [size in MB] [chunk size in KB]
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from pathlib import Path
+from requests import get
+from sys import argv
+from tempfile import TemporaryDirectory
+from threading import Thread
+from tracemalloc import get_traced_memory, reset_peak, start, stop
+from zeitsprung.scraping import Scraper
+
+
+def serve(size: int) -> ThreadingHTTPServer:
+    block = bytes(1024 * 1024)
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'audio/mpeg')
+            self.send_header('Content-Length', str(size))
+            self.end_headers()
+            remaining = size
+            while remaining > 0:
+                self.wfile.write(block[:min(remaining, len(block))])
+                remaining -= len(block)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def peak_mb(func) -> float:
+    start()
+    reset_peak()
+    func()
+    peak = get_traced_memory()[1]
+    stop()
+    return peak / 1024 ** 2
+
+
+def main(size_mb: int = 200, chunk_kb: int = 1024) -> None:
+    server = serve(size_mb * 1024 ** 2)
+    url = f'http://127.0.0.1:{server.server_address[1]}/episode.mp3'
+    with TemporaryDirectory() as tmp:
+        s = Scraper(Path(tmp) / 'data', chunk_size=chunk_kb * 1024, verbose=False)
+        buffered = peak_mb(lambda: BytesIO(get(url, allow_redirects=True).content))
+        streamed = peak_mb(lambda: s.download_episode_audio(url, Path(tmp) / 'data' / 'audio' / 'episode.mp3'))
+    server.shutdown()
+    print(f'Download of a {size_mb} MB audio file, peak Python memory:')
+    print(f'  buffered in BytesIO:         {buffered:8.1f} MB')
+    print(f'  streamed in {chunk_kb:>5} KB chunks: {streamed:8.1f} MB')
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in argv[1:3]])
@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+
+"""
+Microbenchmark of the parser backends extracting the meta data from the saved episode pages in 'tests/data'.
+
+Checks that all backends return identical rows and reports the mean parse time per page.
+
+Usage: python benchmarks/bench_parsing.py [number of repetitions]
+"""
+
+from pathlib import Path
+from sys import argv
+from timeit import timeit
+from zeitsprung.parsing import PARSERS
+
+FIXTURES = sorted((Path(__file__).parent.parent / 'tests' / 'data').glob('*.html'))
+
+
+def main(number: int = 200) -> None:
+    pages = [fixture.read_bytes() for fixture in FIXTURES]
+    reference = [PARSERS['soup'](page) for page in pages]
+    print(f'Parsing {len(pages)} episode pages, mean time per page:')
+    for name, parser in PARSERS.items():
+        try:
+            assert [parser(page) for page in pages] == reference, f"Parser '{name}' returns different rows."
+        except ImportError as e:
+            print(f'  {name:<10} skipped ({e})')
+            continue
+        seconds = timeit(lambda: [parser(page) for page in pages], number=number)
+        print(f'  {name:<10} {seconds / number / len(pages) * 1000:8.3f} ms')
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in argv[1:2]])
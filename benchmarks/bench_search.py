@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+
+"""
+Benchmark of the full-text search over the episode titles and descriptions on a synthetically enlarged archive.
+
+Compares 'SQLiteEngine.search' with loading the 'meta' table through 'SQLiteEngine.query_all_meta' and scanning it
+with pandas 'str.contains', as needed without the full-text index.
+
+Usage: python benchmarks/bench_search.py [number of episodes]
+"""
+
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from random import Random
+from sys import argv
+from tempfile import TemporaryDirectory
+from timeit import timeit
+from zeitsprung.database import SQLiteEngine
+
+WORDS = ('Geschichte Kaiser Krieg Frieden Stadt Kirche Hexe Papst Revolution Handel Pest Reise Kloster König Burg '
+         'Schiff Erfindung Seuche Brief Vertrag Bauer Markt Gericht Insel Zeitung Eisenbahn Schule Fest Gold').split()
+
+
+def synthetic_rows(n: int, seed: int = 42) -> list:
+    rng = Random(seed)
+    date = datetime(2015, 8, 20, 6, tzinfo=timezone.utc)
+    return [[
+        i, date + timedelta(days=7 * i), date + timedelta(days=7 * i), f'ZS{i}',
+        ' '.join(rng.choices(WORDS, k=5)), ' '.join(rng.choices(WORDS, k=80)),
+        f'https://www.zeitsprung.fm/podcast/zs{i:02d}/', f'https://www.zeitsprung.fm/podlove/file/{i}/zs{i:02d}.mp3'
+    ] for i in range(1, n + 1)]
+
+
+def main(n: int = 50000, number: int = 10) -> None:
+    with TemporaryDirectory() as tmp:
+        db = SQLiteEngine(Path(tmp) / 'zeitsprung.db', verbose=False)
+        db.setup_schema()
+        db.insert_meta_rows(synthetic_rows(n))
+
+        def pandas_scan():
+            df = db.query_all_meta()
+            hits = df[df['title'].str.contains('Hexe') & df['description'].str.contains('Papst')]
+            return hits['uid'].head(10).tolist()
+
+        fts = timeit(lambda: db.search('title:Hexe AND description:Papst'), number=number) / number
+        scan = timeit(pandas_scan, number=number) / number
+        db.close()
+    print(f'Search over {n} episodes, mean time per query:')
+    print(f'  full-text index (meta_fts):       {fts * 1000:10.2f} ms')
+    print(f'  query_all_meta + str.contains:    {scan * 1000:10.2f} ms')
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in argv[1:2]])
@@ -0,0 +1,24 @@
+"""Fixtures for the `zeitsprung` benchmarks."""
+
+from fixture_server import FixtureServer
+from shutil import which
+import pytest
+
+AUDIO_FORMAT = 'mp3' if which('ffprobe') else 'wav'
+
+
+def pytest_addoption(parser):
+    parser.addoption('--episodes', type=int, default=200, help='Number of episodes served by the fixture server.')
+    parser.addoption('--seconds', type=float, default=30, help='Length of the served audio files in seconds.')
+
+
+@pytest.fixture(scope='session')
+def fixture_server(request):
+    """
+    Local stand-in for the 'zeitsprung.fm' website serving '--episodes' synthetic episodes with '--seconds' of audio,
+    as MP3 files if 'ffprobe' is installed and as WAV files otherwise.
+    """
+    server = FixtureServer(request.config.getoption('--episodes'), request.config.getoption('--seconds'),
+                           AUDIO_FORMAT).start()
+    yield server
+    server.stop()
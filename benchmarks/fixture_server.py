@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+
+"""
+Local stand-in for the 'zeitsprung.fm' website, serving synthetic episode pages in the format of the real pages
+(JSON-LD graph, 'og:' meta tags and download list) and generated audio files of configurable length.
+
+The pages are served at '/podcast/zs<number>/' for the episodes 1 to 'n_episodes', later episodes are answered with
+status 404. The audio files are silent MPEG-1 Layer III frames ('/audio/zs<number>.mp3') or silent PCM samples
+('/audio/zs<number>.wav').
+
+Usage: python benchmarks/fixture_server.py [number of episodes] [seconds of audio] [mp3|wav] [port]
+"""
+
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from json import dumps
+from math import ceil
+from sys import argv
+from threading import Thread
+from wave import open as open_wave
+
+FIRST_RELEASE = datetime(2015, 8, 20, 6, tzinfo=timezone.utc)
+MP3_FRAME = b'\xff\xfb\x90\xc0' + bytes(413)  # MPEG-1 Layer III, 128 kbit/s, 44.1 kHz, mono, no padding
+MP3_FRAME_SAMPLES = 1152
+
+PAGE = '''<!DOCTYPE html>
+<html lang="de-DE">
+<head>
+<meta charset="UTF-8">
+<script type="application/ld+json" class="yoast-schema-graph">{graph}</script>
+<title>ZS{i}: {title} &#8211; &#8222;Zeitsprung&#8220;</title>
+<meta property="og:locale" content="de_DE" />
+<meta property="og:type" content="article" />
+<meta property="og:title" content="ZS{i}: {title}" />
+<meta property="og:description" content="{description}" />
+<meta property="og:url" content="{url}" />
+<meta property="og:site_name" content="Zeitsprung" />
+</head>
+<body class="podcast-template-default single single-podcast">
+<header class="site-header"><nav><ul class="menu"><li><a href="{base_url}/">Start</a></li></ul></nav></header>
+<main id="main" class="site-main">
+<article class="podcast type-podcast status-publish">
+<h1 class="entry-title">ZS{i}: {title}</h1>
+<div class="entry-content">
+<p>{description}</p>
+<h3>Download</h3>
+<ul class="episode_download_list">
+<li><a href="{url_audio}">Audio</a></li>
+</ul>
+</div>
+</article>
+</main>
+</body>
+</html>
+'''
+
+
+def episode_page(i: int, base_url: str, audio_format: str = 'mp3') -> bytes:
+    """
+    Renders the synthetic page of an episode, released weekly on Wednesdays since the first episode.
+
+    Parameters
+    ----------
+    i : int
+        Number of the episode.
+    base_url : str
+        URL of the server, used for the links on the page.
+    audio_format : str, default 'mp3'
+        Format of the linked audio file, 'mp3' or 'wav'.
+
+    Returns
+    -------
+    bytes
+        The HTML document.
+
+    """
+    url = f"{base_url}/podcast/zs{i:02d}/"
+    published = FIRST_RELEASE + timedelta(weeks=i - 1)
+    graph = dumps({'@context': 'https://schema.org', '@graph': [
+        {'@type': 'WebSite', '@id': f'{base_url}/#website', 'name': 'Zeitsprung'},
+        {'@type': 'WebPage', '@id': f'{url}#webpage', 'url': url, 'datePublished': published.isoformat(),
+         'dateModified': (published + timedelta(days=1)).isoformat()}
+    ]})
+    return PAGE.format(
+        i=i, graph=graph, url=url, base_url=base_url, url_audio=f'{base_url}/audio/zs{i:02d}.{audio_format}',
+        title=f'Episode {i} über die Geschichte', description=f'Wir erzählen die Geschichte Nummer {i}. ' * 5
+    ).encode()
+
+
+def mp3_audio(seconds: float) -> bytes:
+    """
+    Generates a silent MP3 file by repeating an empty frame.
+
+    Parameters
+    ----------
+    seconds : float
+        Length of the audio in seconds.
+
+    Returns
+    -------
+    bytes
+        The MP3 file.
+
+    """
+    return MP3_FRAME * ceil(seconds * 44100 / MP3_FRAME_SAMPLES)
+
+
+def wav_audio(seconds: float, frame_rate: int = 44100) -> bytes:
+    """
+    Generates a silent mono 16-bit WAV file.
+
+    Parameters
+    ----------
+    seconds : float
+        Length of the audio in seconds.
+    frame_rate : int, default 44100
+        Sample rate in Hz.
+
+    Returns
+    -------
+    bytes
+        The WAV file.
+
+    """
+    buffer = BytesIO()
+    with open_wave(buffer, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(frame_rate)
+        f.writeframes(bytes(2 * round(seconds * frame_rate)))
+    return buffer.getvalue()
+
+
+class FixtureServer(ThreadingHTTPServer):
+    """Threaded keep-alive HTTP server, which stands in for the 'zeitsprung.fm' website."""
+
+    def __init__(self, n_episodes: int = 100, seconds: float = 10, audio_format: str = 'mp3',
+                 host: str = '127.0.0.1', port: int = 0) -> None:
+        """
+        Class constructor for the FixtureServer class.
+
+        Parameters
+        ----------
+        n_episodes : int, default 100
+            Number of published episodes.
+        seconds : float, default 10
+            Length of the audio files in seconds.
+        audio_format : str, default 'mp3'
+            Format of the audio files, 'mp3' or 'wav'.
+        host : str, default '127.0.0.1'
+            Address to listen on.
+        port : int, default 0
+            Port to listen on, 0 picks a free port.
+
+        Returns
+        -------
+        None
+
+        """
+        super().__init__((host, port), _Handler)
+        self.n_episodes = n_episodes
+        self.audio_format = audio_format
+        self.audio = mp3_audio(seconds) if audio_format == 'mp3' else wav_audio(seconds)
+        self.url = f'http://{host}:{self.server_address[1]}'
+        self.n_requests = 0
+
+    def start(self) -> 'FixtureServer':
+        """
+        Starts serving from a daemon thread.
+
+        Returns
+        -------
+        FixtureServer
+            The running server.
+
+        """
+        Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        """
+        Stops serving and closes the socket.
+
+        Returns
+        -------
+        None
+
+        """
+        self.shutdown()
+        self.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.n_requests += 1
+        status, content_type, body = 404, 'text/html', b''
+        parts = self.path.strip('/').split('/')
+        if len(parts) == 2 and parts[1].startswith('zs'):
+            i = int(parts[1][2:].split('.')[0])
+            if i <= self.server.n_episodes and parts[0] == 'podcast':
+                status, body = 200, episode_page(i, self.server.url, self.server.audio_format)
+            elif i <= self.server.n_episodes and parts[0] == 'audio':
+                status, content_type, body = 200, f'audio/{self.server.audio_format}', self.server.audio
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main(n_episodes: int = 100, seconds: float = 10, audio_format: str = 'mp3', port: int = 8000) -> None:
+    server = FixtureServer(n_episodes, seconds, audio_format, port=port)
+    print(f'Serving {n_episodes} episodes at {server.url}, stop with Ctrl+C.')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main(*[convert(arg) for convert, arg in zip((int, float, str, int), argv[1:5])])
@@ -0,0 +1,73 @@
+"""
+Benchmarks of 'zeitsprung.scraping' and 'zeitsprung.database' against the local fixture server.
+
+Usage: pytest benchmarks [--episodes 200] [--seconds 30] [--benchmark-autosave]
+       pytest benchmarks --benchmark-compare --benchmark-compare-fail=mean:20%
+"""
+
+from datetime import datetime, timedelta, timezone
+from itertools import count
+from tracemalloc import get_traced_memory, start, stop
+from conftest import AUDIO_FORMAT
+from fixture_server import episode_page
+from zeitsprung.database import SQLiteEngine
+from zeitsprung.parsing import PARSERS
+from zeitsprung.scraping import Scraper
+import pytest
+
+N_ROWS = 1000
+
+
+def _scraper(tmp_path_factory, fixture_server, **kwargs):
+    return Scraper(tmp_path_factory.mktemp('data'), base_url=fixture_server.url, audio_format=AUDIO_FORMAT,
+                   verbose=False, **kwargs)
+
+
+@pytest.mark.parametrize('max_workers', [1, 8])
+def test_update_throughput(benchmark, tmp_path_factory, fixture_server, max_workers):
+    def setup():
+        return (_scraper(tmp_path_factory, fixture_server, max_workers=max_workers, transcode_workers=2),), {}
+
+    n_episodes = benchmark.pedantic(Scraper.update, setup=setup, rounds=3)
+    assert n_episodes == fixture_server.n_episodes
+    if benchmark.stats:
+        benchmark.extra_info['episodes_per_second'] = n_episodes / benchmark.stats.stats.mean
+
+
+def test_update_peak_memory(benchmark, tmp_path_factory, fixture_server):
+    def update(s):
+        start()
+        try:
+            return s.update()
+        finally:
+            benchmark.extra_info['peak_memory_mb'] = get_traced_memory()[1] / 1024 ** 2
+            stop()
+
+    def setup():
+        return (_scraper(tmp_path_factory, fixture_server, max_workers=8, transcode_workers=2),), {}
+
+    assert benchmark.pedantic(update, setup=setup, rounds=1) == fixture_server.n_episodes
+
+
+@pytest.mark.parametrize('parser', list(PARSERS))
+def test_parse(benchmark, fixture_server, parser):
+    if parser == 'lxml':
+        pytest.importorskip('lxml')
+    page = episode_page(1, fixture_server.url, AUDIO_FORMAT)
+    assert benchmark(PARSERS[parser], page)[2] == 'ZS1'
+
+
+def test_db_write_meta_rows(benchmark, tmp_path_factory):
+    date = datetime(2015, 8, 20, 6, tzinfo=timezone.utc)
+    rows = [[i, date + timedelta(weeks=i), date + timedelta(weeks=i), f'ZS{i}', f'Title {i}', 'Description ' * 50,
+             f'https://host/zs{i}/', f'https://host/zs{i}.mp3'] for i in range(1, N_ROWS + 1)]
+    databases = count()
+
+    def setup():
+        db = SQLiteEngine(tmp_path_factory.mktemp('db') / f'{next(databases)}.db', verbose=False)
+        db.setup_schema()
+        return (db, rows), {}
+
+    assert benchmark.pedantic(SQLiteEngine.insert_meta_rows, setup=setup, rounds=10) == N_ROWS
+    if benchmark.stats:
+        benchmark.extra_info['rows_per_second'] = N_ROWS / benchmark.stats.stats.mean
@@ -12,11 +12,19 @@ with open('HISTORY.rst') as history_file:
 
 requirements = [
     'beautifulsoup4',
+    'numpy',
     'pandas',
     'pydub',
     'requests'
 ]
 
+extra_requirements = {
+    'lxml': ['lxml'],
+    'export': ['pyarrow'],
+    'transcription': ['vosk'],
+    'async': ['aiohttp'],
+}
+
 setup_requirements = ['pytest-runner', ]
 
 test_requirements = ['pytest>=3', ]
@@ -34,8 +42,12 @@ setup(
         'Programming Language :: Python :: 3.7',
         'Programming Language :: Python :: 3.8',
     ],
+    entry_points={
+        'console_scripts': ['zeitsprung=zeitsprung.cli:main'],
+    },
     description="Scraper for www.zeitsprung.fm, a great history podcast.",
     install_requires=requirements,
+    extras_require=extra_requirements,
     license="MIT license",
     long_description=readme + '\n\n' + history,
     include_package_data=True,
@@ -0,0 +1,58 @@
+"""Fixtures for the `zeitsprung` tests."""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+import pytest
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        route = self.server.routes.get(self.path, (404, {}, b''))
+        if isinstance(route, list):
+            route = route.pop(0) if len(route) > 1 else route[0]
+        status, headers, body = route
+        headers = dict(headers)
+        truncate_at = headers.pop('X-Truncate-At', None)
+        if 'ETag' in headers and self.headers.get('If-None-Match') == headers['ETag']:
+            status, body = 304, b''
+        elif status == 200 and self.headers.get('Range', '').startswith('bytes=') and \
+                self.headers.get('If-Range', headers.get('ETag')) == headers.get('ETag'):
+            start = int(self.headers['Range'][6:].split('-')[0])
+            headers['Content-Range'] = f'bytes {start}-{len(body) - 1}/{len(body)}'
+            status, body = 206, body[start:]
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if truncate_at is None:
+            self.wfile.write(body)
+        else:
+            self.wfile.write(body[:int(truncate_at)])
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def http_server():
+    """
+    Local keep-alive HTTP server, which serves the '(status, headers, body)' tuples registered in its 'routes' dict,
+    answers conditional requests matching the ETag with status 304 and records the requested paths. A list of tuples is
+    served in order, the last one repeatedly. 'Range' requests are answered with status 206, unless their 'If-Range'
+    does not match the ETag, and the header 'X-Truncate-At' breaks off the transfer after the given number of bytes.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    server.routes = {}
+    server.requests = []
+    server.url = f'http://127.0.0.1:{server.server_address[1]}'
+    thread = Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
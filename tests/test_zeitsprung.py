@@ -2,8 +2,39 @@
 
 """Tests for `zeitsprung` package."""
 
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import io
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+import numpy as np
+import pickle
+import pytest
+import requests
+import sqlite3
+import subprocess
+import sys
+from threading import Timer
+import time
+import wave
+from zeitsprung.audio import transcode
+from zeitsprung.base import LOGGER, configure_logging
+from zeitsprung.cli import main
+from zeitsprung.client import HTTPClient
+from zeitsprung.clips import ClipExtractor, segment_index
 from zeitsprung.database import SQLiteEngine
-from zeitsprung.scraping import Scraper
+from zeitsprung.export import CatalogExporter
+from zeitsprung.features import FeatureExtractor
+from zeitsprung.parsing import get_parser, parse_lastmod
+from zeitsprung.records import Episode
+from zeitsprung.scheduling import PollingScheduler
+from zeitsprung.scraping import AsyncScraper, Scraper, aclosing
+from zeitsprung.transcription import Transcriber
+
+DATA = Path(__file__).parent / 'data'
 
 
 def test_database(tmp_path):
@@ -22,3 +53,676 @@ def test_scraper(tmp_path):
     print(db_file)
     s = Scraper(db_file)
     assert type(s) is Scraper
+
+
+def _write_wav(file_name, seconds=2, frame_rate=8000, channels=2):
+    with wave.open(str(file_name), 'wb') as f:
+        f.setnchannels(channels)
+        f.setsampwidth(2)
+        f.setframerate(frame_rate)
+        f.writeframes(bytes(seconds * frame_rate * channels * 2))
+
+
+def _meta_row(i):
+    date = datetime(2020, 1, i, tzinfo=timezone.utc)
+    return [i, date, date, f'ZS{i}', f'Title {i}', f'Description {i}', f'https://host/zs{i}/', f'https://host/{i}.wav']
+
+
+def test_scraper_update_concurrent(tmp_path, monkeypatch):
+    n_published = 5
+
+    def get_episode_meta(self, i):
+        return Episode(*_meta_row(i)) if i <= n_published else None
+
+    monkeypatch.setattr(Scraper, 'get_episode_meta', get_episode_meta)
+    monkeypatch.setattr(Scraper, 'download_episode_audio', lambda self, url, file_name: _write_wav(file_name))
+    s = Scraper(tmp_path / 'data', max_workers=3, rate_limit=1000, audio_format='wav', channels=1,
+                transcode_workers=2, verbose=False)
+    assert s.update() == n_published
+    assert s.current_episode == n_published
+    assert s.db.query_all_meta()['uid'].tolist() == list(range(1, n_published + 1))
+    audio = s.db.query_all_audio()
+    assert audio['channels'].tolist() == [1] * n_published
+    assert all(Path(file_path).exists() for file_path in audio['file_path'])
+
+
+def test_scraper_download_audio(tmp_path, http_server):
+    body = bytes(range(256)) * 4096
+    http_server.routes['/zs01.mp3'] = (200, {'Content-Type': 'audio/mpeg'}, body)
+    s = Scraper(tmp_path / 'data', chunk_size=1000, verbose=False)
+    file_name = s.download_episode_audio(f'{http_server.url}/zs01.mp3', tmp_path / 'data' / 'audio' / 'zs01.mp3')
+    assert file_name.read_bytes() == body
+    _write_wav(tmp_path / 'zs02.wav')
+    http_server.routes['/zs02.wav'] = (200, {}, (tmp_path / 'zs02.wav').read_bytes())
+    with pytest.deprecated_call():
+        audio = s.get_episode_audio(f'{http_server.url}/zs02.wav')
+    with pytest.deprecated_call():
+        s.save_episode_audio(audio, tmp_path / 'saved.wav')
+    assert (tmp_path / 'saved.wav').read_bytes() == (tmp_path / 'zs02.wav').read_bytes()
+
+
+def test_database_transaction(tmp_path):
+    db = SQLiteEngine(tmp_path / 'zeitsprung.db', synchronous='off', verbose=False)
+    db.setup_schema()
+    assert db.create_connection().execute('PRAGMA journal_mode;').fetchone()[0] == 'wal'
+    try:
+        with db.transaction():
+            db.insert_audio_row([1, 'audio/001.wav', 60, 44100, 4, 2, 'wav', 1024, None])
+            raise RuntimeError
+    except RuntimeError:
+        pass
+    assert db.query_last_episode_id() == 0 and db.query_all_audio().empty
+    with db.transaction():
+        for i in range(1, 11):
+            db.insert_audio_row([i, f'audio/{i:03d}.wav', 60, 44100, 4, 2, 'wav', 1024, None])
+    db.close()
+    assert len(db.query_all_audio()) == 10
+
+
+def test_database_insert_rows(tmp_path):
+    db = SQLiteEngine(tmp_path / 'zeitsprung.db', verbose=False)
+    db.setup_schema()
+    date = datetime(2020, 9, 1, 10, tzinfo=timezone.utc)
+    rows = [[i, date, date, f'ZS{i}', f"Title's {i}", 'Description', f'https://host/zs{i}/', f'https://host/{i}.mp3']
+            for i in range(1, 4)]
+    assert db.insert_meta_rows(rows) == 3
+    df = db.query_all_meta()
+    assert df['title'].tolist() == ["Title's 1", "Title's 2", "Title's 3"]
+    df.loc[df['uid'] == 2, 'title'] = 'Updated'
+    assert db.insert_meta_rows(df) == 3
+    assert db.query_all_meta()['title'].tolist() == ["Title's 1", 'Updated', "Title's 3"]
+    assert db.insert_audio_rows([[1, tmp_path / '001.wav', 60, 44100, 4, 2, 'wav', 1024, None]]) == 1
+    assert db.query_all_audio()['file_path'].tolist() == [str(tmp_path / '001.wav')]
+    db.insert_meta_row([4, date, date, 'ZS4', 'Title 4', 'Description', 'https://host/zs4/', None])
+    db.insert_audio_row([2, tmp_path / '002.wav', 60, 44100, 4, None, None, None, None])
+    meta, audio = db.query_meta(), db.query_audio()
+    assert db.insert_meta_rows(meta) == 4 and db.insert_audio_rows(audio) == 2
+    assert db.query_meta().equals(meta) and db.query_audio().equals(audio)
+    assert db.query_audio(uids=[2])[['channels', 'format', 'file_size', 'sha256']].isna().all(axis=None)
+
+
+def test_scraper_meta_revalidation(tmp_path, http_server):
+    http_server.routes['/podcast/zs01/'] = (200, {'ETag': '"v1"'}, (DATA / 'zs01.html').read_bytes())
+    s = Scraper(tmp_path / 'data', base_url=http_server.url, verbose=False)
+    meta_row = s.get_episode_meta(1)
+    assert list(meta_row)[1:5] == [datetime(2015, 8, 20, 6, 0, 34, tzinfo=timezone.utc),
+                                   datetime(2019, 5, 29, 19, 37, 14, tzinfo=timezone.utc),
+                                   'ZS1', 'Wie alles begann – „Zeitsprung“']
+    s.parser = None
+    assert s.get_episode_meta(1) == meta_row
+    assert Scraper(tmp_path / 'data', base_url=http_server.url, verbose=False).get_episode_meta(1) == meta_row
+    assert s.get_episode_meta(2) is None
+    assert http_server.requests == ['/podcast/zs01/'] * 3 + ['/podcast/zs02/']
+
+
+@pytest.mark.parametrize('parser', ['strainer', 'lxml'])
+def test_parsers_identical_rows(parser):
+    if parser == 'lxml':
+        pytest.importorskip('lxml')
+    for fixture in sorted(DATA.glob('*.html')):
+        content = fixture.read_bytes()
+        assert get_parser(parser)(content) == get_parser('soup')(content)
+
+
+def test_transcode(tmp_path):
+    _write_wav(tmp_path / 'source.wav')
+    assert transcode(tmp_path / 'source.wav', tmp_path / 'target.wav', 'wav', frame_rate=4000, channels=1) == \
+        [2, 4000, 2, 1, 'wav', 44 + 2 * 4000 * 2]
+    assert not (tmp_path / 'source.wav').exists()
+    assert transcode(tmp_path / 'target.wav', tmp_path / 'kept.wav', 'wav') == [2, 4000, 2, 1, 'wav', 44 + 2 * 4000 * 2]
+
+
+def test_database_upgrade_schema(tmp_path):
+    conn = sqlite3.connect(tmp_path / 'zeitsprung.db')
+    conn.execute('CREATE TABLE meta (uid INTEGER PRIMARY KEY, published_at DATETIME NOT NULL, '
+                 'modified_at DATETIME NOT NULL, abbreviation TEXT NOT NULL, title TEXT NOT NULL, '
+                 'description TEXT NOT NULL, url_episode TEXT NOT NULL, url_audio TEXT NOT NULL);')
+    conn.execute("INSERT INTO meta VALUES (1, '2020-01-01', '2020-01-01', 'ZS1', 'Title', '', 'url', 'None');")
+    conn.execute("INSERT INTO meta VALUES (3, '2020-01-03', '2020-01-03', 'ZS3', 'Other', '', 'url', 'url.mp3');")
+    conn.execute('CREATE TABLE audio (uid INTEGER PRIMARY KEY, file_path TEXT NOT NULL, duration INTEGER NOT NULL, '
+                 'frame_rate INTEGER NOT NULL, frame_width INTEGER NOT NULL);')
+    conn.execute("INSERT INTO audio VALUES (1, 'audio/001.wav', 60, 44100, 4);")
+    conn.commit()
+    conn.close()
+    db = SQLiteEngine(tmp_path / 'zeitsprung.db', verbose=False)
+    db.upgrade_schema()
+    db.upgrade_schema()
+    audio = db.query_all_audio()
+    assert audio['uid'].tolist() == [1] and audio[['format', 'file_size', 'sha256']].isna().all(axis=None)
+    assert db.query_all_meta()['url_audio'].isna().tolist() == [True, False]
+    assert db.search('title')['uid'].tolist() == [1]
+    assert db.query_job_stages()['indexed'] == 1
+    assert db.query_incomplete_jobs()[['uid', 'stage']].values.tolist() == [[3, 'meta']]
+    date = datetime(2020, 1, 2, tzinfo=timezone.utc)
+    db.insert_meta_row([2, date, date, 'ZS2', 'Title', '', 'url', None])
+
+
+def test_database_open_audio(tmp_path):
+    db = SQLiteEngine(tmp_path / 'zeitsprung.db', verbose=False)
+    db.setup_schema()
+    for uid, seconds in [(1, 3), (2, 2)]:
+        _write_wav(tmp_path / f'{uid:03d}.wav', seconds=seconds)
+        db.insert_audio_row([uid, tmp_path / f'{uid:03d}.wav', seconds, 8000, 4, 2, 'wav', 0, None])
+    samples = db.open_audio(1)
+    assert isinstance(samples, np.memmap) and samples.shape == (3 * 8000, 2) and samples.dtype == np.int16
+    windows = list(db.iter_audio_windows(10000))
+    assert [(uid, start, len(window)) for uid, start, window in windows] == \
+        [(1, 0, 10000), (1, 10000, 10000), (2, 0, 10000)]
+    with pytest.raises(KeyError):
+        db.open_audio(3)
+
+
+def test_scraper_resume(tmp_path, monkeypatch):
+    downloads, failures, transcode_episode_audio = [], [], Scraper.transcode_episode_audio
+
+    def download_episode_audio(self, url, file_name):
+        downloads.append(url)
+        _write_wav(file_name)
+
+    def failing_transcode_episode_audio(self, source, target):
+        if '002' in Path(source).name and not failures:
+            failures.append(source)
+            raise RuntimeError('Transcoding failed.')
+        return transcode_episode_audio(self, source, target)
+
+    monkeypatch.setattr(Scraper, 'get_episode_meta', lambda self, i: Episode(*_meta_row(i)) if i <= 3 else None)
+    monkeypatch.setattr(Scraper, 'download_episode_audio', download_episode_audio)
+    monkeypatch.setattr(Scraper, 'transcode_episode_audio', failing_transcode_episode_audio)
+    s = Scraper(tmp_path / 'data', transcode_workers=1, verbose=False)
+    assert s.update() == 3
+    jobs = s.db.query_incomplete_jobs()
+    assert jobs[['uid', 'stage', 'attempts', 'last_error']].values.tolist() == \
+        [[2, 'downloaded', 1, "RuntimeError('Transcoding failed.')"]]
+    assert s.db.query_all_audio()['uid'].tolist() == [1, 3]
+    assert Scraper(tmp_path / 'data', transcode_workers=1, verbose=False).resume() == 1
+    assert s.db.query_incomplete_jobs().empty
+    assert s.db.query_all_audio()['uid'].tolist() == [1, 2, 3]
+    assert downloads == [f'https://host/{i}.wav' for i in range(1, 4)]
+
+
+def test_database_search(tmp_path):
+    db = SQLiteEngine(tmp_path / 'zeitsprung.db', verbose=False)
+    db.setup_schema()
+    rows = [_meta_row(i) for i in range(1, 4)]
+    rows[0][5] = 'Die Hexe von Köln und der Hexenhammer.'
+    rows[2][4] = 'Hexen in Bamberg'
+    db.insert_meta_rows(rows)
+    assert sorted(db.search('hexe*')['uid']) == [1, 3]
+    assert db.search('koln')['snippet'].tolist() == ['Die Hexe von [Köln] und der Hexenhammer.']
+    rows[0][5] = 'Napoleon'
+    db.insert_meta_rows(rows[:1])
+    assert db.search('koln').empty and db.search('napoleon')['uid'].tolist() == [1]
+
+
+def test_database_query_meta(tmp_path):
+    db = SQLiteEngine(tmp_path / 'zeitsprung.db', verbose=False)
+    db.setup_schema()
+    rows = [_meta_row(i) for i in range(1, 11)]
+    rows[4][1] = datetime.fromisoformat('2020-01-04T01:30:00+02:00')
+    db.insert_meta_rows(rows)
+    df = db.query_meta(columns=['uid', 'published_at'], published_after='2020-01-04', published_before='2020-01-08',
+                       order_by='published_at', ascending=False)
+    assert df.columns.tolist() == ['uid', 'published_at'] and str(df['published_at'].dt.tz) == 'UTC'
+    assert df['uid'].tolist() == [7, 6, 4]
+    assert [len(chunk) for chunk in db.query_meta(columns=['title'], uids=range(2, 9), chunksize=3)] == [3, 3, 1]
+    with pytest.raises(ValueError):
+        db.query_meta(columns=['uid; DROP TABLE meta'])
+
+
+@pytest.mark.parametrize('file_format', ['parquet', 'arrow'])
+def test_catalog_export(tmp_path, file_format):
+    pytest.importorskip('pyarrow')
+    db = SQLiteEngine(tmp_path / 'zeitsprung.db', verbose=False)
+    db.setup_schema()
+    rows = [_meta_row(i) for i in range(1, 5)]
+    rows[3][1] = rows[3][2] = datetime(2021, 1, 1, tzinfo=timezone.utc)
+    db.insert_meta_rows(rows)
+    db.insert_audio_rows([[i, f'{i:03d}.flac', 60, 16000, 2, 1, 'flac', 60000, None] for i in range(1, 4)])
+    exporter = CatalogExporter(db, tmp_path / 'export', file_format=file_format, verbose=False)
+    assert exporter.export() == {'meta': 4, 'audio': 3, 'stats': 4}
+    assert exporter.export() == {'meta': 0, 'audio': 0, 'stats': 0}
+    rows[1][2] = datetime(2021, 2, 1, tzinfo=timezone.utc)
+    rows[1][4] = 'Updated'
+    db.insert_meta_rows(rows[1:2])
+    assert exporter.export() == {'meta': 1, 'audio': 1, 'stats': 1}
+    db.insert_audio_row([3, '003.opus', 60, 16000, 2, 1, 'opus', 30000, 'ab' * 32])
+    assert exporter.export() == {'meta': 0, 'audio': 1, 'stats': 1}
+    assert exporter.load('audio', columns=['format'])['format'].tolist() == ['flac', 'flac', 'opus']
+    meta = exporter.load('meta')
+    assert meta['uid'].tolist() == [1, 2, 3, 4] and meta['year'].tolist() == [2020, 2020, 2020, 2021]
+    assert meta.loc[1, 'title'] == 'Updated' and str(meta['published_at'].dt.tz) == 'UTC'
+    assert exporter.load('audio')['format'].dtype == 'category'
+    assert exporter.load('stats', columns=['uid', 'bitrate_kbps'])['bitrate_kbps'].tolist()[:3] == [8.0, 8.0, 4.0]
+
+
+def test_polling_scheduler():
+    scheduler = PollingScheduler(min_interval=60, max_interval=24*60*60, window=60*60, verbose=False)
+    assert scheduler.next_delay() == 24*60*60
+    releases = [datetime(2020, 1, 1, 6, tzinfo=timezone.utc) + timedelta(weeks=i) for i in range(10)]
+    assert scheduler.fit(releases).release_hours == [2*24 + 6]
+    assert scheduler.next_delay(datetime(2020, 3, 18, 6, 30, tzinfo=timezone.utc)) == 60
+    assert scheduler.next_delay(datetime(2020, 3, 18, 2, tzinfo=timezone.utc)) == 4*60*60
+    assert scheduler.next_delay(datetime(2020, 3, 14, tzinfo=timezone.utc)) == 24*60*60
+    Timer(0.1, scheduler.cancel).start()
+    started = time.monotonic()
+    assert not asyncio.run(scheduler.wait_async())
+    assert time.monotonic() - started < 1
+    assert not scheduler.wait() and not asyncio.run(scheduler.wait_async())
+    scheduler.reset()
+    assert not scheduler.cancelled and scheduler.sleep(0.01)
+
+
+def test_scraper_run_after_stop(tmp_path, monkeypatch):
+    polled = []
+    monkeypatch.setattr(Scraper, 'get_episode_meta', lambda self, i: polled.append(i))
+    s = Scraper(tmp_path / 'data', transcode_workers=1, verbose=False)
+    s.stop()
+    Timer(0.2, s.stop).start()
+    s.run()
+    assert polled[0] == 1 and s.scheduler.cancelled
+
+
+def test_scraper_fetch_failure(tmp_path, monkeypatch):
+    failing = {2}
+
+    def get_episode_meta(self, i):
+        if i in failing:
+            raise requests.ConnectionError('Service unavailable.')
+        return Episode(*_meta_row(i)[:7], None) if i <= 4 else None
+
+    monkeypatch.setattr(Scraper, 'get_episode_meta', get_episode_meta)
+    s = Scraper(tmp_path / 'data', max_workers=2, transcode_workers=1, verbose=False)
+    assert s.update() == 3 and s.current_episode == 4 and s.metrics.counters['episodes_failed'] == 1
+    assert s.db.query_incomplete_jobs()[['uid', 'attempts']].values.tolist() == [[2, 1]]
+    s.enqueue([5])
+    assert s.resume() == 0 and s.db.query_incomplete_jobs()[['uid', 'attempts']].values.tolist() == [[2, 2]]
+    failing.clear()
+    assert s.resume() == 1 and s.db.query_incomplete_jobs().empty
+    assert s.db.query_meta(columns=['uid'])['uid'].tolist() == [1, 2, 3, 4]
+
+
+def test_scraper_update_lookahead(tmp_path, monkeypatch):
+    monkeypatch.setattr(Scraper, 'get_episode_meta', lambda self, i: Episode(*_meta_row(i)) if i in (1, 2, 4, 5) else None)
+    monkeypatch.setattr(Scraper, 'download_episode_audio', lambda self, url, file_name: _write_wav(file_name))
+    s = Scraper(tmp_path / 'data', transcode_workers=1, lookahead=2, verbose=False)
+    assert s.update() == 4
+    assert s.db.query_meta(columns=['uid'])['uid'].tolist() == [1, 2, 4, 5]
+
+
+def test_scraper_index_failure(tmp_path, monkeypatch):
+    monkeypatch.setattr(Scraper, 'get_episode_meta', lambda self, i: Episode(*_meta_row(i)) if i <= 2 else None)
+    monkeypatch.setattr(Scraper, 'download_episode_audio', lambda self, url, file_name: _write_wav(file_name))
+    monkeypatch.setattr('zeitsprung.pipeline.segment_index', lambda file_name: 1 / 0)
+    s = Scraper(tmp_path / 'data', transcode_workers=1, verbose=False)
+    assert s.update() == 2
+    assert s.db.query_audio(columns=['uid'])['uid'].tolist() == [1, 2]
+    assert s.db.query_job_stages()['indexed'] == 2 and s.db.query_segment(1, 0.0) is None
+
+
+def test_scraper_audio_store(tmp_path, http_server, monkeypatch):
+    _write_wav(tmp_path / 'episode.wav')
+    for i in (1, 2):
+        http_server.routes[f'/{i}.wav'] = (200, {'ETag': f'"{i}"'}, (tmp_path / 'episode.wav').read_bytes())
+    meta_rows = [Episode(*_meta_row(i)[:7], f'{http_server.url}/{i}.wav') for i in (1, 2)]
+    monkeypatch.setattr(Scraper, 'get_episode_meta', lambda self, i: meta_rows[i - 1] if i <= 2 else None)
+    s = Scraper(tmp_path / 'data', transcode_workers=1, verbose=False)
+    assert s.update() == 2
+    audio = s.db.query_audio()
+    assert audio['file_path'].nunique() == 1 and audio['sha256'].nunique() == 1
+    assert Path(audio['file_path'][0]).name == f"{audio['sha256'][0]}.wav"
+    assert s.db.query_segment(2, 1.5) == (0.0, 44)
+
+    def failing_transcode_episode_audio(self, source, target):
+        raise RuntimeError('Unchanged audio files are not transcoded again.')
+
+    monkeypatch.setattr(Scraper, 'transcode_episode_audio', failing_transcode_episode_audio)
+    s = Scraper(tmp_path / 'data', reset=True, transcode_workers=1, verbose=False)
+    assert s.update() == 2 and s.db.query_incomplete_jobs().empty
+    assert s.verify()['status'].tolist() == ['ok', 'ok']
+    Path(audio['file_path'][0]).write_bytes(b'corrupt')
+    assert s.verify()['status'].tolist() == ['corrupt', 'corrupt']
+
+
+def test_feature_extraction(tmp_path):
+    db = SQLiteEngine(tmp_path / 'zeitsprung.db', verbose=False)
+    db.setup_schema()
+    frame_rate = 8000
+    tone = (np.sin(2 * np.pi * 1000 * np.arange(frame_rate) / frame_rate) * 10000).astype('<i2')
+    silence = np.zeros(3 * frame_rate, dtype='<i2')
+    with wave.open(str(tmp_path / '001.wav'), 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(frame_rate)
+        f.writeframes(np.concatenate([tone, silence, tone]).tobytes())
+    _write_wav(tmp_path / '002.wav', seconds=1)
+    db.insert_audio_rows([[1, tmp_path / '001.wav', 5, frame_rate, 2, 1, 'wav', 0, None],
+                          [2, tmp_path / '002.wav', 1, frame_rate, 4, 2, 'wav', 0, None]])
+    extractor = FeatureExtractor(db, tmp_path / 'features', window=0.5, max_workers=1, verbose=False)
+    assert extractor.extract() == 2 and extractor.extract() == 0
+    assert db.query_silences(min_duration=2).values.tolist() == [[1, 1.0, 4.0, 3.0]]
+    assert db.query_features(columns=['uid', 'n_windows', 'silence_duration']).values.tolist() == \
+        [[1, 10, 3.0], [2, 2, 1.0]]
+    features = db.open_features(1)
+    assert features['start'].tolist()[:3] == [0.0, 0.5, 1.0]
+    assert abs(features['spectral_centroid'][0] - 1000) < 50 and features['rms_db'][2] < -50
+
+
+def test_logging_null_handler(tmp_path, caplog):
+    db = SQLiteEngine(tmp_path / 'zeitsprung.db', verbose=True)
+    assert [type(handler) for handler in LOGGER.handlers] == [logging.NullHandler] and LOGGER.propagate
+    with caplog.at_level(logging.INFO, logger='zeitsprung'):
+        db.setup_schema()
+    assert 'Setting up SQLite database' in caplog.text
+
+
+def test_scraper_metrics(tmp_path, monkeypatch):
+    monkeypatch.setattr(Scraper, 'get_episode_meta', lambda self, i: Episode(*_meta_row(i)) if i <= 3 else None)
+    monkeypatch.setattr(Scraper, 'download_episode_audio', lambda self, url, file_name: _write_wav(file_name))
+    stream = io.StringIO()
+    configure_logging(logging.DEBUG, json_format=True, stream=stream)
+    try:
+        s = Scraper(tmp_path / 'data', transcode_workers=1, verbose=True)
+        monkeypatch.setattr(s.scheduler, 'wait', lambda: False)
+        server = s.metrics.serve(0)
+        s.run()
+        metrics = requests.get(f'http://127.0.0.1:{server.server_address[1]}/metrics').text
+        server.shutdown()
+    finally:
+        LOGGER.handlers[:] = [logging.NullHandler()]
+        LOGGER.propagate = True
+    summary = json.loads((tmp_path / 'data' / 'run_summary.json').read_text())
+    assert summary['counters']['episodes'] == 3 and summary['counters']['rows_written'] == 6
+    assert summary['timers']['transcode']['count'] == 3 and summary['timers']['db_write']['count'] >= 1
+    assert 'zeitsprung_episodes_total 3' in metrics and 'zeitsprung_transcode_seconds_count 3' in metrics
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert any(record['level'] == 'INFO' and record['message'].startswith('Transcoding') for record in records)
+    assert records[-1]['episodes'] == 3
+
+
+def test_http_client_retries(http_server):
+    http_server.routes['/flaky'] = [(503, {'Retry-After': '0'}, b''), (500, {}, b''), (200, {}, b'ok')]
+    http_server.routes['/down'] = (503, {}, b'')
+    client = HTTPClient(backoff=0.01, retries=2)
+    assert client.get(f'{http_server.url}/flaky').content == b'ok'
+    assert client.get(f'{http_server.url}/missing').status_code == 404
+    assert client.get(f'{http_server.url}/down').status_code == 503
+    assert http_server.requests == ['/flaky'] * 3 + ['/missing'] + ['/down'] * 3
+    assert client.metrics.counters['http_retries'] == 4
+
+
+def test_scraper_download_audio_resume(tmp_path, http_server):
+    body = bytes(range(256)) * 1024
+    http_server.routes['/zs01.mp3'] = [(200, {'ETag': '"a"', 'X-Truncate-At': '100000'}, body),
+                                       (200, {'ETag': '"a"'}, body)]
+    s = Scraper(tmp_path / 'data', chunk_size=1000, verbose=False)
+    s.http.backoff = 0.01
+    file_name = s.download_episode_audio(f'{http_server.url}/zs01.mp3', tmp_path / 'data' / 'audio' / 'zs01.mp3')
+    assert file_name.read_bytes() == body and len(http_server.requests) == 2
+    assert s.metrics.counters['bytes_downloaded'] == len(body)
+    assert s.store.source_digest(f'{http_server.url}/zs01.mp3') == hashlib.sha256(body).hexdigest()
+    # Continue the download of an earlier run, or restart it if the file changed meanwhile.
+    for etag, n_bytes in [('"a"', len(body) - 50000), ('"old"', len(body))]:
+        part = tmp_path / 'data' / 'audio' / f'{etag.strip(chr(34))}.part.mp3'
+        part.write_bytes(body[:50000])
+        part.with_name(part.name + '.etag').write_text(etag)
+        s.metrics.counters.clear()
+        assert s.download_episode_audio(f'{http_server.url}/zs01.mp3', part).read_bytes() == body
+        assert s.metrics.counters['bytes_downloaded'] == n_bytes and not part.with_name(part.name + '.etag').exists()
+
+
+def test_cli_lazy_imports(tmp_path, capsys):
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import zeitsprung.cli'],
+                            capture_output=True, text=True, check=True)
+    modules = {line.split('|')[-1].strip(): int(line.split('|')[1]) for line in result.stderr.splitlines()[1:]}
+    assert not {'pandas', 'numpy', 'pydub', 'bs4', 'requests'} & set(modules)
+    assert modules['zeitsprung.cli'] < 200000
+    for command in ('status', 'resume', 'verify', 'refresh', 'work'):
+        assert main(['-q', command, str(tmp_path / 'data')]) == 2
+    assert not (tmp_path / 'data').exists()
+    (tmp_path / 'data').mkdir()
+    db = SQLiteEngine(tmp_path / 'data' / 'zeitsprung.db', verbose=False)
+    db.setup_schema()
+    date = datetime(2020, 1, 1)
+    db.insert_meta_row([1, date, date, 'ZS1', 'Title', '', 'url', None])
+    db.begin_job(1)
+    assert main(['-q', 'status', str(tmp_path / 'data')]) == 0
+    assert capsys.readouterr().out.splitlines()[:2] == ['last_episode\t1', 'meta\t1']
+    (tmp_path / 'old').mkdir()
+    conn = sqlite3.connect(tmp_path / 'old' / 'zeitsprung.db')
+    conn.execute('CREATE TABLE meta (uid INTEGER PRIMARY KEY, published_at DATETIME NOT NULL, '
+                 'modified_at DATETIME NOT NULL, abbreviation TEXT NOT NULL, title TEXT NOT NULL, '
+                 'description TEXT NOT NULL, url_episode TEXT NOT NULL, url_audio TEXT NOT NULL);')
+    conn.commit()
+    conn.close()
+    assert main(['-q', 'search', str(tmp_path / 'old'), 'title']) == 2
+    assert main(['-q', 'upgrade', str(tmp_path / 'old')]) == 0
+    assert main(['-q', 'search', str(tmp_path / 'old'), 'title']) == 0
+
+
+def _write_flac(file_name, n_frames, block_size=1024, frame_rate=8000):
+    # FLAC file of 16-bit mono frames with a constant subframe, the value of a frame is its number.
+    def crc8(data):
+        crc = 0
+        for byte in data:
+            crc ^= byte
+            for _ in range(8):
+                crc = ((crc << 1) ^ 0x07) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+        return crc
+
+    stream_info = block_size.to_bytes(2, 'big') * 2 + bytes(6) + (frame_rate << 12 | 15 << 4).to_bytes(4, 'big')
+    frames = b''
+    for i in range(n_frames):
+        number = bytes([i]) if i < 0x80 else bytes([0xC0 | i >> 6, 0x80 | i & 0x3F])
+        header = b'\xff\xf8\xa4\x08' + number
+        frames += header + bytes([crc8(header)]) + b'\x00' + i.to_bytes(2, 'big') + bytes(2)
+    file_name.write_bytes(b'fLaC\x80\x00\x00\x22' + stream_info + bytes(20) + frames)
+
+
+def test_clip_extractor(tmp_path):
+    db = SQLiteEngine(tmp_path / 'zeitsprung.db', verbose=False)
+    db.setup_schema()
+    samples = (np.arange(30 * 8000) % 30000).astype('<i2')
+    with wave.open(str(tmp_path / '001.wav'), 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(8000)
+        f.writeframes(samples.tobytes())
+    mp3_frame = b'\xff\xfb\x90\xc0' + bytes(413)
+    (tmp_path / '002.mp3').write_bytes(b'ID3\x04\x00\x00\x00\x00\x00\x02ab' + mp3_frame * 1150)
+    _write_flac(tmp_path / '003.flac', 235)
+    db.insert_audio_rows([[1, tmp_path / '001.wav', 30, 8000, 2, 1, 'wav', 0, None],
+                          [2, tmp_path / '002.mp3', 30, 44100, 2, 1, 'mp3', 0, None],
+                          [3, tmp_path / '003.flac', 30, 8000, 2, 1, 'flac', 0, None]])
+    assert [start for start, _ in segment_index(tmp_path / '001.wav')] == [0, 10, 20, 30]
+    index = segment_index(tmp_path / '002.mp3')
+    assert index[0] == (0, 12) and index[-1][1] == 12 + 1150 * 417
+    assert [round(start) for start, _ in index[:-1]] == [0, 10, 20, 30]
+    clips = ClipExtractor(db, cache_size=2, verbose=False)
+    with wave.open(io.BytesIO(clips.extract_clip(1, 12.5, 13)), 'rb') as f:
+        assert np.array_equal(np.frombuffer(f.readframes(f.getnframes()), '<i2'), samples[100000:104000])
+    clip = clips.extract_clip(2, 12, 13)
+    first, last = int(12 * 44100 / 1152), int(13 * 44100 / 1152)
+    assert clip == mp3_frame * (last - first + 1)
+    clip = clips.extract_clip(3, 12, 13)
+    assert clip[:4] == b'fLaC' and clip[42:44] == b'\xff\xf8'
+    values = [int.from_bytes(clip[i + 7:i + 9], 'big') for i in range(42, len(clip), 11)]
+    assert values == list(range(int(12 * 8000 / 1024), int(13 * 8000 / 1024) + 1))
+    assert b''.join(clips.stream_clip(3, 12, 13, chunk_size=100)) == clip
+    assert clips.metrics.counters == {'clip_cache_misses': 3, 'clip_cache_hits': 1}
+    assert db.query_segment(3, 25) == (157 * 1024 / 8000, 42 + 128 * 11 + 29 * 12) and db.query_segment(1, 5) is None
+
+
+def test_scraper_work_queue(tmp_path, monkeypatch):
+    fetched = []
+
+    def get_episode_meta(self, i):
+        fetched.append(i)
+        return Episode(*_meta_row(i)[:7], None) if i <= 8 else None
+
+    monkeypatch.setattr(Scraper, 'get_episode_meta', get_episode_meta)
+    s = Scraper(tmp_path / 'data', transcode_workers=1, verbose=False)
+    assert s.enqueue(range(1, 11)) == 10 and s.enqueue([10, 11]) == 1
+    assert s.db.claim_jobs('crashed', 2, lease=0.5) == [1, 2]
+    assert s.db.claim_jobs('other', 2) == [3, 4] and s.db.renew_leases('crashed', [1, 2, 3], lease=0.5) == [1, 2]
+    s.db.release_jobs('other', [3, 4])
+    workers = [Scraper(tmp_path / 'data', max_workers=2, transcode_workers=1, verbose=False) for _ in range(2)]
+    with ThreadPoolExecutor(2) as pool:
+        n_done = list(pool.map(lambda worker: worker.work(lease=1), workers))
+    assert sum(n_done) == 8 and sorted(fetched) == list(range(1, 12))
+    assert s.db.query_job_stages() == {'meta': 0, 'downloaded': 0, 'transcoded': 0, 'indexed': 8}
+    assert s.db.query_meta(columns=['uid'])['uid'].tolist() == list(range(1, 9))
+
+
+def _loudness_engine():
+    # Stands in for a speech recognition model, 'transcribes' every chunk by its loudness.
+    return lambda chunks, frame_rate: [[(0.0, len(chunk) / frame_rate, 'laut' if abs(chunk).max() > 0.5 else 'leise')]
+                                       for chunk in chunks]
+
+
+def _silent_engine():
+    return lambda chunks, frame_rate: [[] for _ in chunks]
+
+
+def test_transcriber(tmp_path):
+    db = SQLiteEngine(tmp_path / 'zeitsprung.db', verbose=False)
+    db.setup_schema()
+    samples = np.repeat([3000, 30000], 4 * 8000).astype('<i2')
+    with wave.open(str(tmp_path / '001.wav'), 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(8000)
+        f.writeframes(samples.tobytes())
+    db.insert_audio_rows([[1, tmp_path / '001.wav', 8, 8000, 2, 1, 'wav', 0, None]])
+    transcriber = Transcriber(db, _loudness_engine, chunk_length=2, batch_size=2, max_workers=2, verbose=False)
+    assert transcriber.transcribe() == 1 and transcriber.transcribe() == 0
+    assert db.query_transcripts(columns=['start', 'stop', 'text']).values.tolist() == \
+        [[0, 2, 'leise'], [2, 4, 'leise'], [4, 6, 'laut'], [6, 8, 'laut']]
+    matches = db.search_transcripts('laut')
+    assert sorted(matches['start']) == [4, 6] and matches['text'][0] == '[laut]'
+    db.insert_transcript(1, [(0, 8, 'still')])
+    assert db.search_transcripts('laut').empty and db.search_transcripts('still', uids=[1])['stop'].tolist() == [8]
+    db.insert_audio_rows([[2, tmp_path / '001.wav', 8, 8000, 2, 1, 'wav', 0, None]])
+    transcriber.engine = _silent_engine
+    assert transcriber.transcribe() == 1 and transcriber.transcribe() == 0
+    assert db.query_transcribed_uids() == [1, 2] and db.query_transcripts(uids=[2]).empty
+
+
+def test_scraper_transcribes_written_episodes(tmp_path, monkeypatch):
+    monkeypatch.setattr(Scraper, 'get_episode_meta', lambda self, i: Episode(*_meta_row(i)) if i <= 2 else None)
+    monkeypatch.setattr(Scraper, 'download_episode_audio', lambda self, url, file_name: _write_wav(file_name))
+    s = Scraper(tmp_path / 'data', transcode_workers=1, transcription_engine=_silent_engine, verbose=False)
+    _write_wav(tmp_path / '099.wav')
+    s.db.insert_audio_rows([[99, tmp_path / '099.wav', 2, 8000, 4, 2, 'wav', 0, None]])
+    assert s.update() == 2
+    assert s.db.query_transcribed_uids() == [1, 2]
+
+
+def test_database_catalog(tmp_path):
+    db = SQLiteEngine(tmp_path / 'zeitsprung.db', catalog_size=2, verbose=False)
+    db.setup_schema()
+    db.insert_meta_rows([Episode(*_meta_row(i)) for i in range(1, 4)])
+    db.insert_audio_row([1, tmp_path / '001.wav', 60, 44100, 4, 2, 'wav', 1024, None])
+    episode = db.get_episode(1)
+    assert episode == Episode(*_meta_row(1)) and db.get_episode(1) is episode and db.get_episode(4) is None
+    assert db.get_audio_info(1).file_path == str(tmp_path / '001.wav') and db.query_audio_file(1)[1] == 'wav'
+    assert db.get_episode(2).uid == 2 and db.get_episode(1) is not episode
+    assert db.metrics.counters == {'rows_written': 4, 'catalog_cache_misses': 5, 'catalog_cache_hits': 2}
+    db.insert_meta_row(Episode(*_meta_row(2)[:4], 'Updated', '', 'url', None))
+    assert db.get_episode(2).title == 'Updated' and db.get_episode(2).url_audio is None
+    assert not hasattr(episode, '__dict__') and list(episode) == _meta_row(1)
+    with pytest.raises(AttributeError):
+        episode.title = 'Changed'
+    assert db.get_episode(1).title == 'Title 1' and len({episode, Episode(*_meta_row(1))}) == 1
+    assert pickle.loads(pickle.dumps(episode)) == episode
+
+
+def test_async_scraper(tmp_path, http_server):
+    pytest.importorskip('aiohttp')
+    _write_wav(tmp_path / 'episode.wav')
+    body = (tmp_path / 'episode.wav').read_bytes()
+    for i in (1, 2):
+        http_server.routes[f'/podcast/zs0{i}/'] = (200, {'ETag': f'"{i}"'}, str(i).encode())
+        http_server.routes[f'/{i}.wav'] = [(200, {'ETag': f'"{i}"', 'X-Truncate-At': '1000'}, body),
+                                           (200, {'ETag': f'"{i}"'}, body)]
+
+    def parser(content):
+        return _meta_row(int(content))[1:7] + [f'{http_server.url}/{int(content)}.wav']
+
+    async def scrape():
+        async with AsyncScraper(tmp_path / 'data', parser=parser, transcode_workers=1, base_url=http_server.url,
+                                verbose=False) as s:
+            uids = []
+            async with aclosing(s.episodes()) as episodes:
+                async for episode in episodes:
+                    uids.append(episode.uid)
+                    if len(uids) == 2:
+                        break
+            assert episodes.ag_frame is None
+            assert uids == [1, 2] and (await s.get_episode_meta(1)).url_audio == f'{http_server.url}/1.wav'
+        s = AsyncScraper(tmp_path / 'data', parser=parser, base_url=http_server.url, verbose=False)
+        n_requests = len(http_server.requests)
+        task = asyncio.ensure_future(s.run())
+        while '/podcast/zs05/' not in http_server.requests[n_requests:]:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await s.close()
+        return s
+
+    s = asyncio.run(scrape())
+    assert (tmp_path / 'data' / 'run_summary.json').exists() and s.current_episode == 2
+    assert s.db.query_audio()['file_size'].tolist() == [len(body)] * 2 and s.db.query_incomplete_jobs().empty
+    assert http_server.requests.count('/1.wav') == 2 and http_server.requests.count('/podcast/zs01/') == 2
+
+
+def test_parse_lastmod():
+    assert parse_lastmod('2020') == datetime(2020, 12, 31, 23, 59, 59, 999999, tzinfo=timezone.utc)
+    assert parse_lastmod('2020-02') == datetime(2020, 2, 29, 23, 59, 59, 999999, tzinfo=timezone.utc)
+    assert parse_lastmod(' 2020-09-01 ') == datetime(2020, 9, 1, 23, 59, 59, 999999, tzinfo=timezone.utc)
+    assert parse_lastmod('2020-09-01T10:00Z') == datetime(2020, 9, 1, 10, tzinfo=timezone.utc)
+    assert parse_lastmod('2020-09-01T10:00:30.1234567-02:30') == \
+        datetime(2020, 9, 1, 12, 30, 30, 123456, tzinfo=timezone.utc)
+    for value in ('01/09/2020', '2020-09-01T10:00', '2020-13', ''):
+        with pytest.raises(ValueError):
+            parse_lastmod(value)
+
+
+def test_scraper_refresh(tmp_path, http_server):
+    for i, seconds in ((1, 1), (2, 1), (3, 2)):
+        _write_wav(tmp_path / f'{i}.wav', seconds=seconds)
+        http_server.routes[f'/{i}.wav'] = (200, {'ETag': f'"{i}"'}, (tmp_path / f'{i}.wav').read_bytes())
+    for i in (1, 2, 3):
+        http_server.routes[f'/podcast/zs0{i}/'] = (200, {'ETag': f'"{i}.1"'}, f'{i}:1:{i}'.encode())
+
+    def parser(content):
+        i, version, audio = content.decode().split(':')
+        date = datetime(2020, 1, int(i), tzinfo=timezone.utc)
+        return [date, date + timedelta(days=int(version)), f'ZS{i}', f'Title {i}', f'Version {version}',
+                f'https://host/zs{i}/', f'{http_server.url}/{audio}.wav']
+
+    s = Scraper(tmp_path / 'data', parser=parser, transcode_workers=1, base_url=http_server.url, verbose=False)
+    assert s.update() == 3
+    digests = s.db.query_audio()['sha256'].tolist()
+    http_server.routes['/sitemap.xml'] = (200, {}, b"""<?xml version="1.0" encoding="UTF-8"?>
+        <sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+        <sitemap><loc>%s/podcast-sitemap.xml</loc></sitemap></sitemapindex>""" % http_server.url.encode())
+    http_server.routes['/podcast-sitemap.xml'] = (200, {}, b"""<?xml version="1.0" encoding="UTF-8"?>
+        <urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+        <url><loc>%s/podcast/zs01/</loc><lastmod>2020-01-02T00:00:00+00:00</lastmod></url>
+        <url><loc>%s/podcast/zs02/</loc><lastmod>2020-01-04</lastmod></url>
+        <url><loc>%s/podcast/zs03/</loc><lastmod>01/04/2020</lastmod></url></urlset>""" % ((http_server.url.encode(),) * 3))
+    http_server.routes['/podcast/zs02/'] = (200, {'ETag': '"2.2"'}, b'2:2:2')
+    http_server.routes['/podcast/zs03/'] = (200, {'ETag': '"3.2"'}, b'3:2:1')
+    n_requests = len(http_server.requests)
+    assert s.get_modification_dates() == {1: datetime(2020, 1, 2, tzinfo=timezone.utc),
+                                          2: datetime(2020, 1, 4, 23, 59, 59, 999999, tzinfo=timezone.utc)}
+    assert s.refresh() == 2 and s.metrics.counters['episodes_modified'] == 2
+    requests = http_server.requests[n_requests:]
+    assert '/podcast/zs01/' not in requests and requests.count('/2.wav') == 1 and '/3.wav' not in requests
+    assert s.db.query_meta()['description'].tolist() == ['Version 1', 'Version 2', 'Version 2']
+    assert s.db.query_audio()['sha256'].tolist() == [digests[0], digests[1], digests[0]]
+    assert s.db.create_connection().execute('SELECT uid, stage, attempts FROM job ORDER BY uid').fetchall() == \
+        [(1, 'indexed', 1), (2, 'indexed', 1), (3, 'indexed', 1)]
+    assert 'retries' not in s.metrics.counters
+    assert s.refresh() == 0 and s.refresh(sitemap=None) == 0
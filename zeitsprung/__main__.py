@@ -0,0 +1,4 @@
+from sys import exit
+from zeitsprung.cli import main
+
+exit(main())
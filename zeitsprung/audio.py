@@ -0,0 +1,201 @@
+from __future__ import annotations
+from pathlib import Path
+from shutil import move
+from struct import unpack
+from typing import TYPE_CHECKING, Tuple, Union
+from wave import open as open_wave
+
+if TYPE_CHECKING:
+    from numpy import memmap, ndarray
+
+FORMATS = ('wav', 'flac', 'opus', 'mp3')
+WAV_PCM, WAV_FLOAT, WAV_EXTENSIBLE = 0x0001, 0x0003, 0xFFFE
+
+
+def transcode(source: Union[str, Path], target: Union[str, Path], audio_format: str = 'wav',
+              frame_rate: Union[int, None] = None, channels: Union[int, None] = None) -> list:
+    """
+    Transcodes a downloaded audio file into the given output format. If the source file already has the requested
+    format and no resampling or downmix is requested, the file is moved to the target without decoding it.
+    The function is self-contained, in order to be run in the processes of a process pool.
+
+    Parameters
+    ----------
+    source : str or Path
+        Path to the downloaded audio file.
+    target : str or Path
+        Path to write the transcoded file to.
+    audio_format : str, default 'wav'
+        Output format, one of 'wav', 'flac', 'opus' or 'mp3'.
+    frame_rate : int or None, default None
+        Sample rate of the output in Hz, the rate of the source is kept if None.
+    channels : int or None, default None
+        Number of channels of the output (1 to downmix to mono), the channels of the source are kept if None.
+
+    Returns
+    -------
+    list
+        Duration in seconds, frame rate, frame width, number of channels, format and size in bytes of the output.
+
+    """
+    if audio_format not in FORMATS:
+        raise ValueError(f"Unknown audio format '{audio_format}', use one of {', '.join(FORMATS)}.")
+    source, target = Path(source), Path(target)
+    if source.suffix.lower() == f'.{audio_format}' and frame_rate is None and channels is None:
+        move(str(source), str(target))
+        return audio_info(target)
+    from pydub import AudioSegment
+    audio = AudioSegment.from_file(str(source))
+    if frame_rate is not None:
+        audio = audio.set_frame_rate(frame_rate)
+    if channels is not None:
+        audio = audio.set_channels(channels)
+    audio.export(str(target), format=audio_format)
+    source.unlink()
+    return [round(audio.duration_seconds), audio.frame_rate, audio.frame_width, audio.channels, audio_format,
+            target.stat().st_size]
+
+
+def audio_info(file_name: Union[str, Path]) -> list:
+    """
+    Reads the properties of a stored audio file without decoding it. The format is derived from the file extension.
+
+    Parameters
+    ----------
+    file_name : str or Path
+        Path to the audio file.
+
+    Returns
+    -------
+    list
+        Duration in seconds, frame rate, frame width, number of channels, format and size in bytes of the file.
+
+    """
+    file_name = Path(file_name)
+    audio_format = file_name.suffix[1:].lower()
+    if audio_format == 'wav':
+        with open_wave(str(file_name), 'rb') as f:
+            duration = f.getnframes() / f.getframerate()
+            frame_rate, channels, sample_width = f.getframerate(), f.getnchannels(), f.getsampwidth()
+    else:
+        from pydub.utils import mediainfo
+        info = mediainfo(str(file_name))
+        duration, frame_rate, channels = float(info['duration']), int(info['sample_rate']), int(info['channels'])
+        sample_width = 2
+    return [round(duration), frame_rate, sample_width * channels, channels, audio_format, file_name.stat().st_size]
+
+
+def read_wav_header(file_name: Union[str, Path]) -> Tuple[int, int, int, str, int]:
+    """
+    Reads the RIFF chunks of a WAV file to locate the PCM data.
+
+    Parameters
+    ----------
+    file_name : str or Path
+        Path to the WAV file.
+
+    Returns
+    -------
+    tuple
+        Byte offset and size of the PCM data, number of channels, the NumPy dtype of the samples and the frame rate.
+
+    """
+    with open(file_name, 'rb') as f:
+        riff, _, wave_id = unpack('<4sI4s', f.read(12))
+        if riff != b'RIFF' or wave_id != b'WAVE':
+            raise ValueError(f"'{file_name}' is not a WAV file.")
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f"WAV file '{file_name}' contains no 'data' chunk.")
+            chunk_id, chunk_size = unpack('<4sI', header)
+            if chunk_id == b'fmt ':
+                fmt = unpack('<HHIIHH', f.read(16))
+                f.seek(chunk_size - 16 + chunk_size % 2, 1)
+            elif chunk_id == b'data':
+                if fmt is None:
+                    raise ValueError(f"WAV file '{file_name}' has no 'fmt ' chunk before the data.")
+                offset = f.tell()
+                size = min(chunk_size, Path(file_name).stat().st_size - offset)
+                break
+            else:
+                f.seek(chunk_size + chunk_size % 2, 1)
+    format_tag, channels, frame_rate, _, _, bits = fmt
+    if format_tag in (WAV_PCM, WAV_EXTENSIBLE) and bits in (8, 16, 32):
+        sample_type = {8: 'u1', 16: '<i2', 32: '<i4'}[bits]
+    elif format_tag == WAV_FLOAT and bits in (32, 64):
+        sample_type = f'<f{bits // 8}'
+    else:
+        raise ValueError(f"WAV file '{file_name}' has an unsupported sample format ({format_tag}, {bits} bits).")
+    return offset, size, channels, sample_type, frame_rate
+
+
+def open_wav(file_name: Union[str, Path]) -> memmap:
+    """
+    Maps the PCM data of a WAV file into memory without reading it. Slicing the returned array only loads the touched
+    pages of the file.
+
+    Parameters
+    ----------
+    file_name : str or Path
+        Path to the WAV file.
+
+    Returns
+    -------
+    memmap
+        Read-only array of the samples with shape (frames, channels).
+
+    """
+    from numpy import dtype, memmap
+    offset, size, channels, sample_type, _ = read_wav_header(file_name)
+    frame_width = dtype(sample_type).itemsize * channels
+    return memmap(file_name, dtype=sample_type, mode='r', offset=offset, shape=(size // frame_width, channels))
+
+
+def load_samples(file_name: Union[str, Path]) -> Tuple[ndarray, int]:
+    """
+    Loads the samples of an audio file. '.wav' files are memory-mapped (see 'open_wav'), other formats are decoded.
+
+    Parameters
+    ----------
+    file_name : str or Path
+        Path to the audio file.
+
+    Returns
+    -------
+    tuple of ndarray and int
+        The samples with shape (frames, channels) and the frame rate.
+
+    """
+    file_name = Path(file_name)
+    if file_name.suffix.lower() == '.wav':
+        return open_wav(file_name), read_wav_header(file_name)[4]
+    from numpy import array
+    from pydub import AudioSegment
+    audio = AudioSegment.from_file(str(file_name))
+    return array(audio.get_array_of_samples()).reshape(-1, audio.channels), audio.frame_rate
+
+
+def to_mono(samples: ndarray) -> ndarray:
+    """
+    Mixes samples down to one channel and scales integer samples to floats in [-1, 1].
+
+    Parameters
+    ----------
+    samples : ndarray
+        Samples with shape (frames, channels), as returned by 'load_samples'.
+
+    Returns
+    -------
+    ndarray
+        The mono samples as float64 with shape (frames,).
+
+    """
+    from numpy import float64
+    bits = 8 * samples.itemsize
+    if samples.dtype.kind == 'u':
+        return (samples.astype(float64) - 2 ** (bits - 1)).mean(axis=1) / 2 ** (bits - 1)
+    if samples.dtype.kind == 'i':
+        return samples.astype(float64).mean(axis=1) / 2 ** (bits - 1)
+    return samples.astype(float64).mean(axis=1)
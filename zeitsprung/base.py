@@ -1,4 +1,311 @@
+from __future__ import annotations
+from contextlib import contextmanager
 from datetime import datetime, timezone
+from json import dumps
+from logging import DEBUG, INFO, Formatter, LogRecord, NullHandler, StreamHandler, getLogger
+from math import inf
+from sys import stdout
+from threading import Lock, Thread
+from time import perf_counter
+from typing import TYPE_CHECKING, Iterator, TextIO, Union
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+LOGGER = getLogger('zeitsprung')
+LOGGER.addHandler(NullHandler())
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, inf)
+_RECORD_ATTRIBUTES = set(vars(LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+
+class UTCFormatter(Formatter):
+    """Formatter prefixing the messages with the ISO timestamp in UTC."""
+
+    def format(self, record: LogRecord) -> str:
+        """
+        Formats a log record as '<timestamp> <message>'.
+
+        Parameters
+        ----------
+        record : LogRecord
+            The record to format.
+
+        Returns
+        -------
+        str
+            The formatted record.
+
+        """
+        timestamp = datetime.fromtimestamp(record.created, timezone.utc).replace(microsecond=0).isoformat()
+        return f'{timestamp} {record.getMessage()}'
+
+
+class JSONFormatter(Formatter):
+    """Formatter writing every log record as one JSON object, including the fields passed as 'extra'."""
+
+    def format(self, record: LogRecord) -> str:
+        """
+        Formats a log record as JSON object.
+
+        Parameters
+        ----------
+        record : LogRecord
+            The record to format.
+
+        Returns
+        -------
+        str
+            The formatted record.
+
+        """
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES})
+        return dumps(entry, default=str)
+
+
+def configure_logging(level: int = INFO, json_format: bool = False, stream: Union[TextIO, None] = None) -> None:
+    """
+    Configures the handler of the 'zeitsprung' logger, which writes the messages with a timestamp to stdout by default.
+    The library itself only attaches a NullHandler, the command line interface and 'Scraper.run' call this function if
+    no handler is configured for the logger yet.
+
+    Parameters
+    ----------
+    level : int, default logging.INFO
+        Minimum level of the logged messages, 'logging.DEBUG' includes the messages written for every row.
+    json_format : bool, default False
+        Write the messages as JSON objects, one per line.
+    stream : TextIO or None, default None
+        Stream to write the messages to, stdout if None.
+
+    Returns
+    -------
+    None
+
+    """
+    for handler in list(LOGGER.handlers):
+        LOGGER.removeHandler(handler)
+    handler = StreamHandler(stream or stdout)
+    handler.setFormatter(JSONFormatter() if json_format else UTCFormatter())
+    LOGGER.addHandler(handler)
+    LOGGER.setLevel(level)
+    LOGGER.propagate = False
+
+
+def logging_configured() -> bool:
+    """
+    Checks whether a handler, other than the NullHandler of the package, receives the messages of the 'zeitsprung'
+    logger, either on the logger itself or on one of its ancestors (e.g. set up by 'logging.basicConfig').
+
+    Returns
+    -------
+    bool
+        True if the messages are handled, False otherwise.
+
+    """
+    logger = LOGGER
+    while logger is not None:
+        if any(not isinstance(handler, NullHandler) for handler in logger.handlers):
+            return True
+        if not logger.propagate:
+            break
+        logger = logger.parent
+    return False
+
+
+class Metrics:
+    """Thread-safe registry of counters and latency histograms of the stages of a run."""
+
+    def __init__(self) -> None:
+        """
+        Class constructor for the Metrics class.
+
+        Returns
+        -------
+        None
+
+        """
+        self.started_at = datetime.now(timezone.utc)
+        self.counters = {}
+        self.histograms = {}
+        self._start = perf_counter()
+        self._lock = Lock()
+
+    def inc(self, name: str, value: float = 1) -> None:
+        """
+        Increments a counter.
+
+        Parameters
+        ----------
+        name : str
+            Name of the counter, e.g. 'bytes_downloaded'.
+        value : float, default 1
+            Amount to add.
+
+        Returns
+        -------
+        None
+
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name: str, seconds: float) -> None:
+        """
+        Records the latency of a stage in its histogram.
+
+        Parameters
+        ----------
+        name : str
+            Name of the stage, e.g. 'parse'.
+        seconds : float
+            Duration of the stage in seconds.
+
+        Returns
+        -------
+        None
+
+        """
+        with self._lock:
+            histogram = self.histograms.setdefault(name, {'buckets': [0] * len(BUCKETS), 'sum': 0.0, 'max': 0.0})
+            histogram['buckets'][next(i for i, bound in enumerate(BUCKETS) if seconds <= bound)] += 1
+            histogram['sum'] += seconds
+            histogram['max'] = max(histogram['max'], seconds)
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        """
+        Context manager, which records the duration of the enclosed block in the histogram of a stage.
+
+        Parameters
+        ----------
+        name : str
+            Name of the stage.
+
+        Returns
+        -------
+        Iterator[None]
+
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, perf_counter() - start)
+
+    def summary(self) -> dict:
+        """
+        Summarizes the metrics recorded since the creation of the registry.
+
+        Returns
+        -------
+        dict
+            The start time, elapsed seconds, counters and their rates per second, and the count, total, mean and
+            maximum duration and bucket counts of every stage.
+
+        """
+        with self._lock:
+            elapsed = perf_counter() - self._start
+            timers = {}
+            for name, histogram in self.histograms.items():
+                count = sum(histogram['buckets'])
+                timers[name] = {
+                    'count': count,
+                    'total': histogram['sum'],
+                    'mean': histogram['sum'] / count if count else None,
+                    'max': histogram['max'],
+                    'buckets': {str(bound): n for bound, n in zip(BUCKETS, histogram['buckets'])}
+                }
+            return {
+                'started_at': self.started_at.isoformat(),
+                'elapsed_seconds': elapsed,
+                'counters': dict(self.counters),
+                'rates': {name: value / elapsed for name, value in self.counters.items()},
+                'timers': timers
+            }
+
+    def to_json(self) -> str:
+        """
+        Serializes the summary of the metrics.
+
+        Returns
+        -------
+        str
+            The summary as JSON document.
+
+        """
+        return dumps(self.summary(), indent=2)
+
+    def to_prometheus(self, prefix: str = 'zeitsprung') -> str:
+        """
+        Renders the metrics in the Prometheus text exposition format.
+
+        Parameters
+        ----------
+        prefix : str, default 'zeitsprung'
+            Prefix of the metric names.
+
+        Returns
+        -------
+        str
+            The counters as '<prefix>_<name>_total' and the stages as '<prefix>_<name>_seconds' histograms.
+
+        """
+        lines = []
+        with self._lock:
+            for name, value in sorted(self.counters.items()):
+                lines += [f'# TYPE {prefix}_{name}_total counter', f'{prefix}_{name}_total {value}']
+            for name, histogram in sorted(self.histograms.items()):
+                metric = f'{prefix}_{name}_seconds'
+                lines.append(f'# TYPE {metric} histogram')
+                cumulative = 0
+                for bound, n in zip(BUCKETS, histogram['buckets']):
+                    cumulative += n
+                    lines.append(f'{metric}_bucket{{le="{"+Inf" if bound == inf else bound}"}} {cumulative}')
+                lines += [f'{metric}_sum {histogram["sum"]}', f'{metric}_count {cumulative}']
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port: int = 9100, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+        """
+        Serves the metrics in the Prometheus text format at 'http://<host>:<port>/metrics' from a background thread.
+
+        Parameters
+        ----------
+        port : int, default 9100
+            Port to listen on, 0 picks a free port.
+        host : str, default '127.0.0.1'
+            Address to listen on.
+
+        Returns
+        -------
+        ThreadingHTTPServer
+            The running server, stop it with 'shutdown'.
+
+        """
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                body = metrics.to_prometheus().encode() if self.path == '/metrics' else b''
+                self.send_response(200 if body else 404)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        Thread(target=server.serve_forever, daemon=True).start()
+        return server
 
 
 class Base:
@@ -6,7 +313,8 @@ class Base:
 
     def __init__(self, verbose: bool = True) -> None:
         """
-        Class constructor for the Base class.
+        Class constructor for the Base class. Messages are written to the 'zeitsprung' logger if 'verbose' is True,
+        where they are handled as configured by the application (see 'configure_logging').
 
         Parameters
         ----------
@@ -19,7 +327,11 @@ class Base:
 
         """
         self.verbose = verbose
+        self.metrics = Metrics()
+
+    def _print(self, message: str, level: int = INFO, **fields) -> None:
+        if self.verbose and LOGGER.isEnabledFor(level):
+            LOGGER.log(level, message, extra=fields)
 
-    def _print(self, message: str) -> None:
-        if self.verbose:
-            print(f'{datetime.now(timezone.utc).replace(microsecond=0).isoformat()} {message}')
+    def _debug(self, message: str, **fields) -> None:
+        self._print(message, DEBUG, **fields)
@@ -0,0 +1,394 @@
+"""
+Command line interface of the package, installed as the 'zeitsprung' console script.
+
+The module only imports the standard library, the classes needed by a command are imported when it is run, so short
+invocations like 'zeitsprung status' do not pay for importing pandas, pydub, BeautifulSoup or requests.
+"""
+
+from argparse import ArgumentParser, Namespace
+from pathlib import Path
+from sqlite3 import OperationalError
+from sys import stderr
+from typing import List, Union
+
+DB_FILE = 'zeitsprung.db'
+
+
+def _db_file(args: Namespace) -> Path:
+    db_file = Path(args.data_folder) / DB_FILE
+    if not db_file.exists():
+        raise FileNotFoundError(f"No database found at '{db_file}', run 'zeitsprung scrape' first.")
+    return db_file
+
+
+def _scraper(args: Namespace, create: bool = False, **kwargs):
+    from zeitsprung.scraping import Scraper
+    if not create:
+        _db_file(args)
+    return Scraper(args.data_folder, verbose=not args.quiet, **kwargs)
+
+
+def _db(args: Namespace, upgrade: bool = False):
+    from zeitsprung.database import SQLiteEngine
+    db = SQLiteEngine(_db_file(args), verbose=not args.quiet)
+    if upgrade:
+        db.upgrade_schema()
+    return db
+
+
+def scrape(args: Namespace) -> int:
+    """
+    Resumes incomplete episodes and fetches all new episodes, then keeps polling for new episodes unless '--once' is
+    given.
+
+    Parameters
+    ----------
+    args : Namespace
+        The parsed command line arguments.
+
+    Returns
+    -------
+    int
+        Exit code.
+
+    """
+    s = _scraper(args, create=True, max_workers=args.workers, rate_limit=args.rate_limit,
+                 audio_format=args.audio_format, frame_rate=args.frame_rate, channels=args.channels,
+                 base_url=args.base_url)
+    if args.once:
+        s.resume()
+        s.update()
+    else:
+        s.run(metrics_port=args.metrics_port)
+    return 0
+
+
+def resume(args: Namespace) -> int:
+    """
+    Resumes the incomplete episodes of previous runs.
+
+    Parameters
+    ----------
+    args : Namespace
+        The parsed command line arguments.
+
+    Returns
+    -------
+    int
+        Exit code.
+
+    """
+    _scraper(args).resume(max_attempts=args.max_attempts)
+    return 0
+
+
+def refresh(args: Namespace) -> int:
+    """
+    Fetches the stored episodes again, which were modified on the website after they were scraped.
+
+    Parameters
+    ----------
+    args : Namespace
+        The parsed command line arguments.
+
+    Returns
+    -------
+    int
+        Exit code.
+
+    """
+    s = _scraper(args, max_workers=args.workers, rate_limit=args.rate_limit, audio_format=args.audio_format,
+                 frame_rate=args.frame_rate, channels=args.channels, base_url=args.base_url)
+    print(f'refreshed\t{s.refresh(sitemap=None if args.no_sitemap else args.sitemap)}')
+    return 0
+
+
+def enqueue(args: Namespace) -> int:
+    """
+    Adds a range of episodes to the work queue in the database, e.g. to rebuild the archive with several workers.
+
+    Parameters
+    ----------
+    args : Namespace
+        The parsed command line arguments.
+
+    Returns
+    -------
+    int
+        Exit code.
+
+    """
+    print(f'enqueued\t{_db(args, upgrade=True).enqueue_jobs(range(args.first, args.last + 1))}')
+    return 0
+
+
+def work(args: Namespace) -> int:
+    """
+    Fetches the episodes from the work queue in the database, together with other workers, until it is empty.
+
+    Parameters
+    ----------
+    args : Namespace
+        The parsed command line arguments.
+
+    Returns
+    -------
+    int
+        Exit code.
+
+    """
+    s = _scraper(args, max_workers=args.workers, rate_limit=args.rate_limit, audio_format=args.audio_format,
+                 frame_rate=args.frame_rate, channels=args.channels, base_url=args.base_url)
+    s.work(owner=args.owner, lease=args.lease, max_attempts=args.max_attempts)
+    return 0
+
+
+def status(args: Namespace) -> int:
+    """
+    Prints the last episode in the database and the number of episodes per stage.
+
+    Parameters
+    ----------
+    args : Namespace
+        The parsed command line arguments.
+
+    Returns
+    -------
+    int
+        Exit code.
+
+    """
+    db = _db(args)
+    print(f'last_episode\t{db.query_last_episode_id()}')
+    for stage, n in db.query_job_stages().items():
+        print(f'{stage}\t{n}')
+    return 0
+
+
+def export(args: Namespace) -> int:
+    """
+    Exports the catalog of episodes to Parquet or Arrow IPC files.
+
+    Parameters
+    ----------
+    args : Namespace
+        The parsed command line arguments.
+
+    Returns
+    -------
+    int
+        Exit code.
+
+    """
+    from zeitsprung.export import CatalogExporter
+    exporter = CatalogExporter(_db(args), args.export_folder, file_format=args.format, verbose=not args.quiet)
+    for dataset, n in exporter.export(full=args.full).items():
+        print(f'{dataset}\t{n}')
+    return 0
+
+
+def search(args: Namespace) -> int:
+    """
+    Prints the episodes matching a full-text query, ranked by relevance.
+
+    Parameters
+    ----------
+    args : Namespace
+        The parsed command line arguments.
+
+    Returns
+    -------
+    int
+        Exit code.
+
+    """
+    for row in _db(args).search(args.query, limit=args.limit).itertuples(index=False):
+        print(f'{row.uid}\t{row.title}\t{row.snippet}')
+    return 0
+
+
+def verify(args: Namespace) -> int:
+    """
+    Verifies the integrity of the stored audio files and prints the damaged ones.
+
+    Parameters
+    ----------
+    args : Namespace
+        The parsed command line arguments.
+
+    Returns
+    -------
+    int
+        Exit code, 1 if a file is corrupt or missing.
+
+    """
+    result = _scraper(args).verify(max_workers=args.workers)
+    failed = result[result['status'] != 'ok']
+    for row in failed.itertuples(index=False):
+        print(f'{row.uid}\t{row.status}\t{row.file_path}')
+    return 1 if len(failed) else 0
+
+
+def upgrade(args: Namespace) -> int:
+    """
+    Upgrades the schema of a database created by an earlier version of the package. The commands writing to the
+    database upgrade it on their own, the reading commands 'status', 'export' and 'search' leave it unchanged.
+
+    Parameters
+    ----------
+    args : Namespace
+        The parsed command line arguments.
+
+    Returns
+    -------
+    int
+        Exit code.
+
+    """
+    _db(args, upgrade=True)
+    return 0
+
+
+def transcribe(args: Namespace) -> int:
+    """
+    Transcribes the stored audio files of the episodes, which do not have a transcript yet.
+
+    Parameters
+    ----------
+    args : Namespace
+        The parsed command line arguments.
+
+    Returns
+    -------
+    int
+        Exit code.
+
+    """
+    from functools import partial
+    from zeitsprung.transcription import Transcriber, vosk_engine
+    engine = partial(vosk_engine, args.model) if args.model else args.engine
+    transcriber = Transcriber(_db(args, upgrade=True), engine, chunk_length=args.chunk_length, max_workers=args.workers,
+                              verbose=not args.quiet)
+    print(f'transcribed\t{transcriber.transcribe(overwrite=args.overwrite)}')
+    return 0
+
+
+def _add_scraper_arguments(command: ArgumentParser) -> None:
+    command.add_argument('data_folder', help='Folder of the database and audio files.')
+    command.add_argument('--workers', type=int, default=1, help='Number of episodes fetched concurrently.')
+    command.add_argument('--rate-limit', type=float, help='Maximum number of requests per second.')
+    command.add_argument('--audio-format', default='wav', choices=['wav', 'flac', 'opus', 'mp3'])
+    command.add_argument('--frame-rate', type=int, help='Sample rate of the stored audio files in Hz.')
+    command.add_argument('--channels', type=int, help='Number of channels of the stored audio files.')
+    command.add_argument('--base-url', default='https://www.zeitsprung.fm', help='URL of the website.')
+
+
+def build_parser() -> ArgumentParser:
+    """
+    Builds the parser of the command line arguments.
+
+    Returns
+    -------
+    ArgumentParser
+        The parser with a sub-command per function of the command line interface.
+
+    """
+    parser = ArgumentParser(prog='zeitsprung', description='Scraper for www.zeitsprung.fm, a great history podcast.')
+    parser.add_argument('-q', '--quiet', action='store_true', help='Do not print messages about the progress.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('scrape', help=scrape.__doc__.split('.')[0].strip())
+    _add_scraper_arguments(command)
+    command.add_argument('--metrics-port', type=int, help='Serve Prometheus metrics on this port.')
+    command.add_argument('--once', action='store_true', help='Stop after fetching the new episodes.')
+    command.set_defaults(func=scrape)
+
+    command = commands.add_parser('enqueue', help=enqueue.__doc__.split(',')[0].strip())
+    command.add_argument('data_folder', help='Folder of the database and audio files.')
+    command.add_argument('first', type=int, help='Number of the first episode.')
+    command.add_argument('last', type=int, help='Number of the last episode.')
+    command.set_defaults(func=enqueue)
+
+    command = commands.add_parser('work', help=work.__doc__.split(',')[0].strip())
+    _add_scraper_arguments(command)
+    command.add_argument('--owner', help='Unique name of the worker, derived from host and process if omitted.')
+    command.add_argument('--lease', type=float, default=300, help='Duration of the leases in seconds.')
+    command.add_argument('--max-attempts', type=int, default=3, help='Skip episodes, which failed this many times.')
+    command.set_defaults(func=work)
+
+    command = commands.add_parser('resume', help=resume.__doc__.split('.')[0].strip())
+    command.add_argument('data_folder', help='Folder of the database and audio files.')
+    command.add_argument('--max-attempts', type=int, help='Skip episodes, which failed this many times.')
+    command.set_defaults(func=resume)
+
+    command = commands.add_parser('refresh', help=refresh.__doc__.split(',')[0].strip())
+    _add_scraper_arguments(command)
+    command.add_argument('--sitemap', default='sitemap.xml', help='URL of the sitemap, relative to the base URL.')
+    command.add_argument('--no-sitemap', action='store_true', help='Request all episode pages conditionally.')
+    command.set_defaults(func=refresh)
+
+    command = commands.add_parser('status', help=status.__doc__.split('.')[0].strip())
+    command.add_argument('data_folder', help='Folder of the database and audio files.')
+    command.set_defaults(func=status)
+
+    command = commands.add_parser('export', help=export.__doc__.split('.')[0].strip())
+    command.add_argument('data_folder', help='Folder of the database and audio files.')
+    command.add_argument('export_folder', help='Folder to write the files to.')
+    command.add_argument('--format', default='parquet', choices=['parquet', 'arrow'])
+    command.add_argument('--full', action='store_true', help='Rewrite all files instead of the changed ones.')
+    command.set_defaults(func=export)
+
+    command = commands.add_parser('search', help=search.__doc__.split('.')[0].strip())
+    command.add_argument('data_folder', help='Folder of the database and audio files.')
+    command.add_argument('query', help="FTS5 query, e.g. 'hexe*' or 'title:köln'.")
+    command.add_argument('--limit', type=int, default=10, help='Maximum number of episodes.')
+    command.set_defaults(func=search)
+
+    command = commands.add_parser('transcribe', help=transcribe.__doc__.split(',')[0].strip())
+    command.add_argument('data_folder', help='Folder of the database and audio files.')
+    command.add_argument('--engine', default='vosk', choices=['vosk'], help='Speech recognition engine.')
+    command.add_argument('--model', help='Folder of a Vosk model, the small German model if omitted.')
+    command.add_argument('--chunk-length', type=float, default=30.0, help='Length of the chunks in seconds.')
+    command.add_argument('--workers', type=int, help='Number of worker processes, each loads the model once.')
+    command.add_argument('--overwrite', action='store_true', help='Transcribe episodes with a transcript again.')
+    command.set_defaults(func=transcribe)
+
+    command = commands.add_parser('verify', help=verify.__doc__.split('.')[0].strip())
+    command.add_argument('data_folder', help='Folder of the database and audio files.')
+    command.add_argument('--workers', type=int, help='Number of threads hashing the files.')
+    command.set_defaults(func=verify)
+
+    command = commands.add_parser('upgrade', help=upgrade.__doc__.split('.')[0].strip())
+    command.add_argument('data_folder', help='Folder of the database and audio files.')
+    command.set_defaults(func=upgrade)
+    return parser
+
+
+def main(argv: Union[List[str], None] = None) -> int:
+    """
+    Entry point of the 'zeitsprung' console script.
+
+    Parameters
+    ----------
+    argv : list of str or None, default None
+        Command line arguments, taken from 'sys.argv' if None.
+
+    Returns
+    -------
+    int
+        Exit code.
+
+    """
+    args = build_parser().parse_args(argv)
+    if not args.quiet:
+        from zeitsprung.base import configure_logging, logging_configured
+        if not logging_configured():
+            configure_logging()
+    try:
+        return args.func(args)
+    except (FileNotFoundError, ValueError) as e:
+        print(f'zeitsprung: error: {e}', file=stderr)
+        return 2
+    except OperationalError as e:
+        print(f"zeitsprung: error: {e} (run 'zeitsprung upgrade' for databases of earlier versions)", file=stderr)
+        return 2
@@ -0,0 +1,547 @@
+from __future__ import annotations
+from asyncio import get_running_loop, sleep as async_sleep
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from itertools import count
+from pathlib import Path
+from random import uniform
+from requests import Response, Session
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ChunkedEncodingError, ConnectionError as RequestsConnectionError, Timeout
+from sqlite3 import connect
+from threading import Lock
+from time import monotonic, sleep
+from typing import TYPE_CHECKING, AsyncIterator, Iterator, Tuple, Union
+from urllib.parse import urlsplit
+from zeitsprung.base import LOGGER, Metrics
+
+if TYPE_CHECKING:
+    from aiohttp import ClientResponse, ClientSession
+
+RETRY_STATUS = (429, 500, 502, 503, 504)
+TRANSIENT_ERRORS = (ChunkedEncodingError, RequestsConnectionError, Timeout)
+
+
+def content_range(headers) -> Tuple[int, Union[int, None]]:
+    """
+    Parses the 'Content-Range' header of a partial response (status 206).
+
+    Parameters
+    ----------
+    headers : Mapping
+        Headers of the response.
+
+    Returns
+    -------
+    tuple of int and int or None
+        Position of the first byte of the body and the length of the complete content, or None if it is unknown.
+
+    """
+    value = headers.get('Content-Range', '')
+    if not value.startswith('bytes '):
+        return 0, None
+    span, _, length = value[6:].partition('/')
+    return 0 if span == '*' else int(span.split('-')[0]), None if length in ('', '*') else int(length)
+
+
+class RateLimiter:
+    """Thread-safe limiter, which spaces out the requests sent to the same host."""
+
+    def __init__(self, rate: Union[float, None] = None) -> None:
+        """
+        Class constructor for the RateLimiter class.
+
+        Parameters
+        ----------
+        rate : float or None, default None
+            Maximum number of requests per second and host, no limit is applied if None.
+
+        Returns
+        -------
+        None
+
+        """
+        self.interval = 1 / rate if rate else 0
+        self._next_slot = {}
+        self._lock = Lock()
+
+    def reserve(self, url: str) -> float:
+        """
+        Reserves the next free slot for a request to the host of the given URL.
+
+        Parameters
+        ----------
+        url : str
+            URL that is about to be requested.
+
+        Returns
+        -------
+        float
+            Delay in seconds until the request is allowed.
+
+        """
+        if not self.interval:
+            return 0.0
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        return slot - now
+
+    def wait(self, url: str) -> None:
+        """
+        Blocks the calling thread until a request to the host of the given URL is allowed.
+
+        Parameters
+        ----------
+        url : str
+            URL that is about to be requested.
+
+        Returns
+        -------
+        None
+
+        """
+        delay = self.reserve(url)
+        if delay > 0:
+            sleep(delay)
+
+
+class HTTPCache:
+    """On-disk SQLite store for the validators (ETag, Last-Modified) and the parsed payloads of responses."""
+
+    def __init__(self, cache_file: Union[str, Path]) -> None:
+        """
+        Class constructor for the HTTPCache class.
+
+        Parameters
+        ----------
+        cache_file : str or Path
+            Path to the cache file, which is created if it does not exist.
+
+        Returns
+        -------
+        None
+
+        """
+        self.cache_file = cache_file
+        self._lock = Lock()
+        self._conn = connect(cache_file, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS http_cache (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                payload TEXT
+            );
+            ''')
+
+    def load(self, url: str) -> Union[Tuple[str, str, str], None]:
+        """
+        Loads the cache entry of an URL.
+
+        Parameters
+        ----------
+        url : str
+            The requested URL.
+
+        Returns
+        -------
+        tuple or None
+            The ETag, Last-Modified date and payload of the URL, None if the URL is not cached.
+
+        """
+        with self._lock:
+            return self._conn.execute(
+                'SELECT etag, last_modified, payload FROM http_cache WHERE url = ?', (url,)
+            ).fetchone()
+
+    def store(self, url: str, response: Response, payload: str) -> None:
+        """
+        Stores the validators of a response together with the payload parsed from it. Responses without validators
+        are not cached.
+
+        Parameters
+        ----------
+        url : str
+            The requested URL.
+        response : Response
+            The response to take the ETag and Last-Modified headers from.
+        payload : str
+            The serialized result of parsing the response.
+
+        Returns
+        -------
+        None
+
+        """
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if etag is None and last_modified is None:
+            return
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO http_cache (url, etag, last_modified, payload) VALUES (?, ?, ?, ?)',
+                (url, etag, last_modified, payload)
+            )
+
+    def clear(self) -> None:
+        """
+        Removes all entries from the cache.
+
+        Returns
+        -------
+        None
+
+        """
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM http_cache')
+
+
+class HTTPClient:
+    """
+    HTTP client sharing one pooled keep-alive session for all requests of the package. Requests failing with a
+    connection error, a timeout or a status of 429 or 5xx are retried with exponential backoff and full jitter.
+    """
+
+    def __init__(self, rate_limit: Union[float, None] = None, pool_size: int = 10,
+                 cache: Union[HTTPCache, None] = None, timeout: Tuple[float, float] = (10, 60), retries: int = 5,
+                 backoff: float = 0.5, max_backoff: float = 60, metrics: Union[Metrics, None] = None) -> None:
+        """
+        Class constructor for the HTTPClient class.
+
+        Parameters
+        ----------
+        rate_limit : float or None, default None
+            Maximum number of requests per second sent to a host, unlimited if None.
+        pool_size : int, default 10
+            Number of connections kept alive per host.
+        cache : HTTPCache or None, default None
+            Cache used for conditional requests, revalidation is disabled if None.
+        timeout : tuple, default (10, 60)
+            Connect and read timeout in seconds, used if no timeout is passed to a request.
+        retries : int, default 5
+            Maximum number of retries of a failed request.
+        backoff : float, default 0.5
+            Base delay in seconds, the n-th retry waits a random delay of up to 'backoff * 2**n' seconds. A
+            'Retry-After' header of the response is honoured instead.
+        max_backoff : float, default 60
+            Upper bound of the random delay in seconds.
+        metrics : Metrics or None, default None
+            Registry to count the retries in, as 'http_retries'.
+
+        Returns
+        -------
+        None
+
+        """
+        self.rate_limiter = RateLimiter(rate_limit)
+        self.cache = cache
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.metrics = metrics or Metrics()
+        self.session = Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get(self, url: str, revalidate: bool = False, **kwargs) -> Response:
+        """
+        Sends a GET request using the pooled session and retries it on transient errors. If all retries fail, the last
+        response is returned or the last exception raised.
+
+        Parameters
+        ----------
+        url : str
+            URL to request.
+        revalidate : bool, default False
+            Send a conditional request with the validators cached for the URL, the server answers with status 304 if
+            the resource did not change.
+        **kwargs
+            Further arguments passed to 'requests.Session.get'.
+
+        Returns
+        -------
+        Response
+            The response of the server.
+
+        """
+        if revalidate and self.cache is not None:
+            entry = self.cache.load(url)
+            if entry is not None:
+                headers = dict(kwargs.pop('headers', None) or {})
+                if entry[0] is not None:
+                    headers['If-None-Match'] = entry[0]
+                if entry[1] is not None:
+                    headers['If-Modified-Since'] = entry[1]
+                kwargs['headers'] = headers
+        kwargs.setdefault('timeout', self.timeout)
+        for attempt in count():
+            self.rate_limiter.wait(url)
+            try:
+                response = self.session.get(url, **kwargs)
+            except TRANSIENT_ERRORS as e:
+                if attempt >= self.retries:
+                    raise
+                delay, reason = self._backoff(attempt), repr(e)
+            else:
+                if response.status_code not in RETRY_STATUS or attempt >= self.retries:
+                    return response
+                retry_after = self._retry_after(response)
+                delay = self._backoff(attempt) if retry_after is None else retry_after
+                reason = f'status {response.status_code}'
+                response.close()
+            self.metrics.inc('http_retries')
+            LOGGER.warning(f"Request to {url} failed ({reason}), retrying in {delay:.1f} seconds.")
+            sleep(delay)
+
+    def iter_content(self, response: Response, chunk_size: int = 1024*1024) -> Iterator[bytes]:
+        """
+        Iterates over the body of a streamed response. If the transfer breaks off, the rest of the body is requested
+        with a 'Range' header (and an 'If-Range' header with the ETag of the response), instead of starting from zero.
+
+        Parameters
+        ----------
+        response : Response
+            Response of a request sent with 'stream=True'.
+        chunk_size : int, default 1024*1024
+            Number of bytes per chunk.
+
+        Returns
+        -------
+        Iterator[bytes]
+            The chunks of the body.
+
+        """
+        url, etag = response.url, response.headers.get('ETag')
+        offset = content_range(response.headers)[0] if response.status_code == 206 else 0
+        size = response.headers.get('Content-Length')
+        size = None if size is None or 'Content-Encoding' in response.headers else int(size)
+        received = 0
+        for attempt in count():
+            try:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    received += len(chunk)
+                    yield chunk
+                if size is None or received >= size:
+                    return
+                error = ChunkedEncodingError(f'Received {received} of {size} bytes.')
+            except TRANSIENT_ERRORS as e:
+                error = e
+            finally:
+                if attempt > 0:
+                    response.close()
+            if attempt >= self.retries or size is None:
+                raise error
+            LOGGER.warning(f"Transfer of {url} broke off after {received} bytes ({error!r}), resuming.")
+            self.metrics.inc('http_retries')
+            sleep(self._backoff(attempt))
+            headers = {'Range': f'bytes={offset + received}-'}
+            if etag is not None:
+                headers['If-Range'] = etag
+            response = self.get(url, stream=True, headers=headers)
+            if response.status_code != 206:
+                response.close()
+                raise error
+
+    def _backoff(self, attempt: int) -> float:
+        return uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    @staticmethod
+    def _retry_after(response: Response) -> Union[float, None]:
+        value = response.headers.get('Retry-After')
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+            except (TypeError, ValueError):
+                return None
+
+
+class AsyncHTTPClient:
+    """
+    Asynchronous counterpart of the HTTPClient for use inside an event loop, based on the optional 'aiohttp'
+    package. Waiting for the rate limit and between retries suspends only the calling task.
+    """
+
+    def __init__(self, rate_limit: Union[float, None] = None, pool_size: int = 10,
+                 cache: Union[HTTPCache, None] = None, timeout: Tuple[float, float] = (10, 60), retries: int = 5,
+                 backoff: float = 0.5, max_backoff: float = 60, metrics: Union[Metrics, None] = None) -> None:
+        """
+        Class constructor for the AsyncHTTPClient class. The session is opened on the first request, inside the event
+        loop it is used in.
+
+        Parameters
+        ----------
+        rate_limit : float or None, default None
+            Maximum number of requests per second sent to a host, unlimited if None.
+        pool_size : int, default 10
+            Maximum number of connections per host.
+        cache : HTTPCache or None, default None
+            Cache used for conditional requests, revalidation is disabled if None.
+        timeout : tuple, default (10, 60)
+            Connect and read timeout in seconds.
+        retries : int, default 5
+            Maximum number of retries of a failed request.
+        backoff : float, default 0.5
+            Base delay in seconds, the n-th retry waits a random delay of up to 'backoff * 2**n' seconds. A
+            'Retry-After' header of the response is honoured instead.
+        max_backoff : float, default 60
+            Upper bound of the random delay in seconds.
+        metrics : Metrics or None, default None
+            Registry to count the retries in, as 'http_retries'.
+
+        Returns
+        -------
+        None
+
+        """
+        self.rate_limiter = RateLimiter(rate_limit)
+        self.pool_size = pool_size
+        self.cache = cache
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.metrics = metrics or Metrics()
+        self.session = None
+
+    def _session(self) -> ClientSession:
+        if self.session is None or self.session.closed:
+            from aiohttp import ClientSession, ClientTimeout, TCPConnector
+            self.session = ClientSession(
+                connector=TCPConnector(limit_per_host=self.pool_size),
+                timeout=ClientTimeout(total=None, sock_connect=self.timeout[0], sock_read=self.timeout[1])
+            )
+        return self.session
+
+    @staticmethod
+    def _transient_errors() -> tuple:
+        from asyncio import TimeoutError
+        from aiohttp import ClientConnectionError, ClientPayloadError
+        return ClientConnectionError, ClientPayloadError, TimeoutError
+
+    async def get(self, url: str, revalidate: bool = False, **kwargs) -> ClientResponse:
+        """
+        Sends a GET request and retries it on transient errors. If all retries fail, the last response is returned or
+        the last exception raised. The body of the response is not read, use it as asynchronous context manager or
+        read it to release the connection.
+
+        Parameters
+        ----------
+        url : str
+            URL to request.
+        revalidate : bool, default False
+            Send a conditional request with the validators cached for the URL, the server answers with status 304 if
+            the resource did not change.
+        **kwargs
+            Further arguments passed to 'aiohttp.ClientSession.get'.
+
+        Returns
+        -------
+        ClientResponse
+            The response of the server.
+
+        """
+        if revalidate and self.cache is not None:
+            entry = await get_running_loop().run_in_executor(None, self.cache.load, url)
+            if entry is not None:
+                headers = dict(kwargs.pop('headers', None) or {})
+                if entry[0] is not None:
+                    headers['If-None-Match'] = entry[0]
+                if entry[1] is not None:
+                    headers['If-Modified-Since'] = entry[1]
+                kwargs['headers'] = headers
+        transient_errors = self._transient_errors()
+        for attempt in count():
+            await async_sleep(self.rate_limiter.reserve(url))
+            try:
+                response = await self._session().get(url, **kwargs)
+            except transient_errors as e:
+                if attempt >= self.retries:
+                    raise
+                delay, reason = self._backoff(attempt), repr(e)
+            else:
+                if response.status not in RETRY_STATUS or attempt >= self.retries:
+                    return response
+                retry_after = HTTPClient._retry_after(response)
+                delay = self._backoff(attempt) if retry_after is None else retry_after
+                reason = f'status {response.status}'
+                response.release()
+            self.metrics.inc('http_retries')
+            LOGGER.warning(f"Request to {url} failed ({reason}), retrying in {delay:.1f} seconds.")
+            await async_sleep(delay)
+
+    async def iter_content(self, response: ClientResponse, chunk_size: int = 1024*1024) -> AsyncIterator[bytes]:
+        """
+        Iterates over the body of a response. If the transfer breaks off, the rest of the body is requested with a
+        'Range' header (and an 'If-Range' header with the ETag of the response), instead of starting from zero.
+
+        Parameters
+        ----------
+        response : ClientResponse
+            Response of a request, whose body is not yet read.
+        chunk_size : int, default 1024*1024
+            Maximum number of bytes per chunk.
+
+        Returns
+        -------
+        AsyncIterator[bytes]
+            The chunks of the body.
+
+        """
+        from aiohttp import ClientPayloadError
+        transient_errors = self._transient_errors()
+        url, etag = str(response.url), response.headers.get('ETag')
+        offset = content_range(response.headers)[0] if response.status == 206 else 0
+        size = response.headers.get('Content-Length')
+        size = None if size is None or 'Content-Encoding' in response.headers else int(size)
+        received = 0
+        for attempt in count():
+            try:
+                async for chunk in response.content.iter_chunked(chunk_size):
+                    received += len(chunk)
+                    yield chunk
+                if size is None or received >= size:
+                    return
+                error = ClientPayloadError(f'Received {received} of {size} bytes.')
+            except transient_errors as e:
+                error = e
+            finally:
+                if attempt > 0:
+                    response.release()
+            if attempt >= self.retries or size is None:
+                raise error
+            LOGGER.warning(f"Transfer of {url} broke off after {received} bytes ({error!r}), resuming.")
+            self.metrics.inc('http_retries')
+            await async_sleep(self._backoff(attempt))
+            headers = {'Range': f'bytes={offset + received}-'}
+            if etag is not None:
+                headers['If-Range'] = etag
+            response = await self.get(url, headers=headers)
+            if response.status != 206:
+                response.release()
+                raise error
+
+    async def close(self) -> None:
+        """
+        Closes the session and its connections, a new session is opened on the next request.
+
+        Returns
+        -------
+        None
+
+        """
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def _backoff(self, attempt: int) -> float:
+        return uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
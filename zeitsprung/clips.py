@@ -0,0 +1,425 @@
+from __future__ import annotations
+from collections import OrderedDict
+from io import BytesIO
+from math import ceil, floor
+from pathlib import Path
+from struct import pack
+from threading import Lock
+from typing import BinaryIO, Iterator, List, Tuple, Union
+from zeitsprung.audio import read_wav_header
+from zeitsprung.base import Base
+from zeitsprung.database import SQLiteEngine
+
+SEGMENT_INTERVAL = 10.0
+SEGMENT_FORMATS = ('wav', 'flac', 'mp3')
+READ_SIZE = 64*1024
+MP3_BITRATES = {
+    3: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    0: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160)
+}
+MP3_FRAME_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+FLAC_BLOCK_SIZES = (0, 192, 576, 1152, 2304, 4608, 0, 0, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+
+def _id3_size(f: BinaryIO) -> int:
+    f.seek(0)
+    header = f.read(10)
+    if len(header) < 10 or header[:3] != b'ID3':
+        return 0
+    size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+    return 10 + size + (10 if header[5] & 0x10 else 0)
+
+
+def _mp3_frames(f: BinaryIO, offset: int) -> Iterator[Tuple[int, int, int, int]]:
+    # Yields offset, length, number of samples and frame rate of the MPEG Layer III frames, skipping invalid bytes.
+    # The samples of a Xing/Info header frame are not counted, as decoders do not output them.
+    size = f.seek(0, 2)
+    while offset + 4 <= size:
+        f.seek(offset)
+        header = f.read(44)
+        version, layer = (header[1] >> 3) & 3, (header[1] >> 1) & 3
+        bitrate_index, rate_index = header[2] >> 4, (header[2] >> 2) & 3
+        if header[0] != 0xFF or header[1] & 0xE0 != 0xE0 or version == 1 or layer != 1 or bitrate_index in (0, 15) \
+                or rate_index == 3:
+            offset += 1
+            continue
+        frame_rate = MP3_FRAME_RATES[version][rate_index]
+        samples = 1152 if version == 3 else 576
+        length = samples * MP3_BITRATES[version][bitrate_index] * 125 // frame_rate + ((header[2] >> 1) & 1)
+        if b'Xing' in header[4:] or b'Info' in header[4:]:
+            samples = 0
+        yield offset, length, samples, frame_rate
+        offset += length
+
+
+def _crc8(data: bytes) -> int:
+    crc = 0
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x07) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+    return crc
+
+
+def _flac_stream_info(f: BinaryIO) -> Tuple[bytes, int]:
+    # Returns the STREAMINFO block and the offset of the first frame.
+    f.seek(_id3_size(f))
+    if f.read(4) != b'fLaC':
+        raise ValueError(f"'{f.name}' is not a FLAC file.")
+    stream_info, is_last = None, False
+    while not is_last:
+        header = f.read(4)
+        if len(header) < 4:
+            raise ValueError(f"FLAC file '{f.name}' has no audio frames.")
+        is_last, block_type, length = header[0] & 0x80, header[0] & 0x7F, int.from_bytes(header[1:], 'big')
+        block = f.read(length)
+        if block_type == 0:
+            stream_info = block
+    if stream_info is None:
+        raise ValueError(f"FLAC file '{f.name}' has no STREAMINFO block.")
+    return stream_info, f.tell()
+
+
+def _flac_frame(header: bytes, stream_info: bytes) -> Union[Tuple[int, int], None]:
+    # Parses a frame header, returns the first sample and the number of samples of the frame or None if the bytes are
+    # not a valid header (checked by its CRC-8).
+    if len(header) < 6 or header[1] & 0xFE != 0xF8 or header[3] & 0x01:
+        return None
+    block_code, rate_code = header[2] >> 4, header[2] & 0x0F
+    if block_code == 0 or rate_code == 15 or header[3] >> 4 > 10:
+        return None
+    n_bytes = 0
+    while n_bytes < 8 and header[4] & (0x80 >> n_bytes):
+        n_bytes += 1
+    if n_bytes == 0:
+        number, end = header[4], 5
+    elif 2 <= n_bytes <= 7:
+        number = header[4] & (0x7F >> n_bytes)
+        for byte in header[5:4 + n_bytes]:
+            if byte & 0xC0 != 0x80:
+                return None
+            number = (number << 6) | (byte & 0x3F)
+        end = 4 + n_bytes
+    else:
+        return None
+    block_size = FLAC_BLOCK_SIZES[block_code]
+    if block_code in (6, 7):
+        block_size = int.from_bytes(header[end:end + block_code - 5], 'big') + 1
+        end += block_code - 5
+    end += {12: 1, 13: 2, 14: 2}.get(rate_code, 0)
+    if end >= len(header) or _crc8(header[:end]) != header[end]:
+        return None
+    if header[1] & 0x01:
+        return number, block_size
+    return number * int.from_bytes(stream_info[2:4], 'big'), block_size
+
+
+def _flac_frames(f: BinaryIO, offset: int, stream_info: bytes) -> Iterator[Tuple[int, int, int]]:
+    # Yields offset, first sample and number of samples of the FLAC frames, found by their sync code and header CRC.
+    f.seek(offset)
+    min_frame_size = max(int.from_bytes(stream_info[4:7], 'big'), 1)
+    data, base, position, is_eof = b'', offset, 0, False
+    while True:
+        if len(data) - position < 16 and not is_eof:
+            chunk = f.read(READ_SIZE)
+            is_eof = not chunk
+            data, base, position = data[position:] + chunk, base + position, 0
+            continue
+        position = data.find(b'\xff', position)
+        if position < 0:
+            if is_eof:
+                return
+            position = len(data)
+            continue
+        if len(data) - position < 16 and not is_eof:
+            continue
+        frame = _flac_frame(data[position:position + 16], stream_info)
+        if frame is not None:
+            yield (base + position,) + frame
+            position += min_frame_size
+        else:
+            position += 1
+
+
+def _stream_info_header(stream_info: bytes) -> bytes:
+    # FLAC stream header for a clip, with unknown total samples and MD5 signature.
+    stream_info = bytearray(stream_info[:34])
+    stream_info[13] &= 0xF0
+    stream_info[14:34] = bytes(20)
+    return b'fLaC' + bytes([0x80]) + len(stream_info).to_bytes(3, 'big') + bytes(stream_info)
+
+
+def _wav_header(channels: int, sample_type: str, frame_rate: int, size: int) -> bytes:
+    sample_width = int(sample_type[-1])
+    frame_width = sample_width * channels
+    return pack('<4sI4s4sIHHIIHH4sI', b'RIFF', 36 + size, b'WAVE', b'fmt ', 16, 3 if 'f' in sample_type else 1,
+                channels, frame_rate, frame_rate * frame_width, frame_width, 8 * sample_width, b'data', size)
+
+
+def segment_index(file_name: Union[str, Path], interval: float = SEGMENT_INTERVAL) -> List[Tuple[float, int]]:
+    """
+    Builds the segment index of an audio file, the byte offsets of the first frame at or after every 'interval'
+    seconds. For '.wav' files the offsets are computed from the header, '.mp3' and '.flac' files are scanned for
+    their frame headers without decoding them. Other formats have no index.
+
+    Parameters
+    ----------
+    file_name : str or Path
+        Path to the audio file.
+    interval : float, default 10.0
+        Distance between the entries of the index in seconds.
+
+    Returns
+    -------
+    list
+        Start time in seconds and byte offset of the indexed frames, the last entry marks the end of the audio data.
+
+    """
+    file_name = Path(file_name)
+    audio_format = file_name.suffix[1:].lower()
+    if audio_format == 'wav':
+        offset, size, channels, sample_type, frame_rate = read_wav_header(file_name)
+        frame_width = int(sample_type[-1]) * channels
+        n_frames = size // frame_width
+        frames = sorted({min(round(k * interval * frame_rate), n_frames)
+                         for k in range(ceil(n_frames / frame_rate / interval) + 1)})
+        return [(frame / frame_rate, offset + frame * frame_width) for frame in frames]
+    index, boundary = [], 0.0
+    with open(file_name, 'rb') as f:
+        if audio_format == 'mp3':
+            time, end = 0.0, 0
+            for offset, length, samples, frame_rate in _mp3_frames(f, _id3_size(f)):
+                if samples and time >= boundary:
+                    index.append((time, offset))
+                    boundary = (floor(time / interval) + 1) * interval
+                time, end = time + samples / frame_rate, offset + length
+        elif audio_format == 'flac':
+            stream_info, offset = _flac_stream_info(f)
+            frame_rate = int.from_bytes(stream_info[10:13], 'big') >> 4
+            time, end = 0.0, f.seek(0, 2)
+            for offset, sample, samples in _flac_frames(f, offset, stream_info):
+                if sample / frame_rate >= boundary:
+                    index.append((sample / frame_rate, offset))
+                    boundary = (floor(sample / frame_rate / interval) + 1) * interval
+                time = (sample + samples) / frame_rate
+        else:
+            return []
+    return index + [(time, end)] if index else []
+
+
+def locate_clip(file_name: Union[str, Path], start: float, end: float,
+                segment: Union[Tuple[float, int], None] = None) -> Tuple[bytes, int, int]:
+    """
+    Locates the bytes of a clip in an audio file. In '.wav' files the offsets are computed from the header, '.mp3' and
+    '.flac' files are searched from the entry of the segment index before the clip, so the time to locate a clip does
+    not depend on the length of the file. These clips are cut at the boundaries of the frames containing start and end.
+
+    Parameters
+    ----------
+    file_name : str or Path
+        Path to the audio file, a '.wav', '.mp3' or '.flac' file.
+    start : float
+        Start of the clip in seconds.
+    end : float
+        End of the clip in seconds.
+    segment : tuple or None, default None
+        Entry of the segment index at or before the start, the file is searched from the first frame if None.
+
+    Returns
+    -------
+    tuple
+        The header to write before the bytes of the clip and the byte range of the clip in the file.
+
+    """
+    file_name = Path(file_name)
+    audio_format = file_name.suffix[1:].lower()
+    if audio_format == 'wav':
+        offset, size, channels, sample_type, frame_rate = read_wav_header(file_name)
+        frame_width = int(sample_type[-1]) * channels
+        n_frames = size // frame_width
+        first, last = min(floor(start * frame_rate), n_frames), min(ceil(end * frame_rate), n_frames)
+        header = _wav_header(channels, sample_type, frame_rate, (last - first) * frame_width)
+        return header, offset + first * frame_width, offset + last * frame_width
+    byte_start = byte_stop = None
+    with open(file_name, 'rb') as f:
+        if audio_format == 'mp3':
+            header = b''
+            time, offset = segment if segment is not None else (0.0, _id3_size(f))
+            for offset, length, samples, frame_rate in _mp3_frames(f, offset):
+                if time >= end:
+                    byte_stop = offset
+                    break
+                time += samples / frame_rate
+                if byte_start is None and time > start:
+                    byte_start = offset
+                byte_stop = offset + length
+        elif audio_format == 'flac':
+            stream_info, offset = _flac_stream_info(f)
+            header = _stream_info_header(stream_info)
+            frame_rate = int.from_bytes(stream_info[10:13], 'big') >> 4
+            byte_stop = f.seek(0, 2)
+            for offset, sample, samples in _flac_frames(f, offset if segment is None else segment[1], stream_info):
+                if sample / frame_rate >= end:
+                    byte_stop = offset
+                    break
+                if byte_start is None and (sample + samples) / frame_rate > start:
+                    byte_start = offset
+        else:
+            raise ValueError(f"Clips can only be located in {', '.join(SEGMENT_FORMATS)} files, not '{file_name}'.")
+    if byte_start is None:
+        byte_start = byte_stop = byte_stop or 0
+    return header, byte_start, byte_stop
+
+
+class ClipExtractor(Base):
+    """Class to serve short clips of the stored audio files, by seeking to the bytes of the clip."""
+
+    def __init__(self, db: SQLiteEngine, cache_size: int = 64, interval: float = SEGMENT_INTERVAL,
+                 verbose: bool = True) -> None:
+        """
+        Class constructor for the ClipExtractor class.
+
+        Parameters
+        ----------
+        db : SQLiteEngine
+            Database with the 'audio' and 'segment' relations of the episodes.
+        cache_size : int, default 64
+            Number of recently served clips kept in memory.
+        interval : float, default 10.0
+            Distance between the entries in seconds, if the segment index of an episode is built on first use.
+        verbose : bool, default True
+            Print messages about the activities conducted by a class instance.
+
+        Returns
+        -------
+        None
+
+        """
+        super().__init__(verbose)
+        self.db = db
+        self.cache_size = cache_size
+        self.interval = interval
+        self.verbose = verbose
+        self._cache = OrderedDict()
+        self._lock = Lock()
+
+    def __str__(self) -> str:
+        """
+        Print function of the class.
+
+        Returns
+        -------
+        str
+            A string, which describes the class instance.
+
+        """
+        return f"Clip extractor with db connection to '{self.db.db_file}', caching {len(self._cache)} clips."
+
+    def extract_clip(self, uid: int, start: float, end: float) -> bytes:
+        """
+        Extracts a clip from the stored audio file of an episode. Only the bytes of the clip are read, the result is
+        kept in a cache of the recently served clips. Clips of '.opus' files are decoded with seeking instead.
+
+        Parameters
+        ----------
+        uid : int
+            Number of the episode.
+        start : float
+            Start of the clip in seconds.
+        end : float
+            End of the clip in seconds.
+
+        Returns
+        -------
+        bytes
+            The clip as a file in the format of the stored audio file.
+
+        """
+        file_path, audio_format = self.db.query_audio_file(uid)
+        key = (file_path, float(start), float(end))
+        with self._lock:
+            clip = self._cache.get(key)
+            if clip is not None:
+                self._cache.move_to_end(key)
+        if clip is not None:
+            self.metrics.inc('clip_cache_hits')
+            return clip
+        self.metrics.inc('clip_cache_misses')
+        with self.metrics.timer('clip'):
+            if audio_format in SEGMENT_FORMATS:
+                clip = b''.join(self._iter_bytes(uid, file_path, audio_format, start, end, READ_SIZE))
+            else:
+                clip = self._decode_clip(file_path, audio_format, start, end)
+        with self._lock:
+            self._cache[key] = clip
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return clip
+
+    def stream_clip(self, uid: int, start: float, end: float, chunk_size: int = READ_SIZE) -> Iterator[bytes]:
+        """
+        Streams a clip from the stored audio file of an episode in chunks, without holding it in memory. Cached clips
+        are served from the cache.
+
+        Parameters
+        ----------
+        uid : int
+            Number of the episode.
+        start : float
+            Start of the clip in seconds.
+        end : float
+            End of the clip in seconds.
+        chunk_size : int, default 64*1024
+            Maximum size of the chunks in bytes.
+
+        Returns
+        -------
+        Iterator[bytes]
+            The chunks of the clip.
+
+        """
+        file_path, audio_format = self.db.query_audio_file(uid)
+        with self._lock:
+            clip = self._cache.get((file_path, float(start), float(end)))
+        if clip is not None:
+            self.metrics.inc('clip_cache_hits')
+        elif audio_format not in SEGMENT_FORMATS:
+            clip = self.extract_clip(uid, start, end)
+        if clip is not None:
+            for i in range(0, len(clip), chunk_size):
+                yield clip[i:i + chunk_size]
+            return
+        yield from self._iter_bytes(uid, file_path, audio_format, start, end, chunk_size)
+
+    def _iter_bytes(self, uid: int, file_path: str, audio_format: str, start: float, end: float,
+                    chunk_size: int) -> Iterator[bytes]:
+        if start < 0 or end <= start:
+            raise ValueError(f"Invalid clip from {start} to {end} seconds.")
+        segment = None
+        if audio_format != 'wav':
+            segment = self.db.query_segment(uid, start)
+            if segment is None:
+                self._print(f"Building the segment index of episode {uid}.")
+                self.db.insert_segments(uid, segment_index(file_path, self.interval))
+                segment = self.db.query_segment(uid, start)
+        header, byte_start, byte_stop = locate_clip(file_path, start, end, segment)
+        if header:
+            yield header
+        with open(file_path, 'rb') as f:
+            f.seek(byte_start)
+            while byte_start < byte_stop:
+                chunk = f.read(min(chunk_size, byte_stop - byte_start))
+                if not chunk:
+                    break
+                byte_start += len(chunk)
+                yield chunk
+
+    @staticmethod
+    def _decode_clip(file_path: str, audio_format: str, start: float, end: float) -> bytes:
+        if start < 0 or end <= start:
+            raise ValueError(f"Invalid clip from {start} to {end} seconds.")
+        from pydub import AudioSegment
+        buffer = BytesIO()
+        AudioSegment.from_file(file_path, start_second=start, duration=end - start).export(buffer, format=audio_format)
+        return buffer.getvalue()
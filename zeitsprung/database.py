@@ -1,22 +1,193 @@
-from pandas import DataFrame, to_datetime
-from typing import Union
+from __future__ import annotations
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path, PurePath
+from typing import TYPE_CHECKING, Any, Iterable, Iterator, List, Tuple, Union
 from sqlite3 import connect, Connection
-from unicodedata import normalize
-from zeitsprung.base import Base
+from threading import RLock
+from time import perf_counter, time
+from uuid import uuid4
+from zeitsprung.base import LOGGER, Base
+from zeitsprung.records import AudioInfo, Episode, Record
+
+if TYPE_CHECKING:
+    from numpy import memmap, ndarray
+    from pandas import DataFrame
+
+META_COLUMNS = list(Episode.__slots__)
+AUDIO_COLUMNS = list(AudioInfo.__slots__)
+FEATURE_COLUMNS = ['uid', 'file_path', 'window_length', 'n_windows', 'rms_db', 'spectral_centroid',
+                   'silence_duration']
+SILENCE_COLUMNS = ['uid', 'start', 'stop', 'duration']
+TRANSCRIPT_COLUMNS = ['uid', 'start', 'stop', 'text']
+META_DTYPES = {'uid': 'int64'}
+AUDIO_DTYPES = {'uid': 'int64', 'duration': 'int64', 'frame_rate': 'int64', 'frame_width': 'int64',
+                'channels': 'Int64', 'format': 'category', 'file_size': 'Int64'}
+FEATURE_DTYPES = {'uid': 'int64', 'window_length': 'float64', 'n_windows': 'int64', 'rms_db': 'float64',
+                  'spectral_centroid': 'float64', 'silence_duration': 'float64'}
+SILENCE_DTYPES = {'uid': 'int64', 'start': 'float64', 'stop': 'float64', 'duration': 'float64'}
+TRANSCRIPT_DTYPES = {'uid': 'int64', 'start': 'float64', 'stop': 'float64', 'text': 'str'}
+DATE_COLUMNS = ['published_at', 'modified_at']
+JOB_STAGES = ['meta', 'downloaded', 'transcoded', 'indexed']
+SCHEMA = {
+    'meta': '''
+    CREATE TABLE IF NOT EXISTS meta (
+        uid INTEGER PRIMARY KEY,
+        published_at DATETIME NOT NULL,
+        modified_at DATETIME NOT NULL,
+        abbreviation TEXT NOT NULL,
+        title TEXT NOT NULL,
+        description TEXT NOT NULL,
+        url_episode TEXT NOT NULL,
+        url_audio TEXT
+    );
+    ''',
+    'audio': '''
+    CREATE TABLE IF NOT EXISTS audio (
+        uid INTEGER PRIMARY KEY,
+        file_path TEXT NOT NULL,
+        duration INTEGER NOT NULL,
+        frame_rate INTEGER NOT NULL,
+        frame_width INTEGER NOT NULL,
+        channels INTEGER,
+        format TEXT,
+        file_size INTEGER,
+        sha256 TEXT
+    );
+    ''',
+    'job': '''
+    CREATE TABLE IF NOT EXISTS job (
+        uid INTEGER PRIMARY KEY,
+        stage TEXT NOT NULL,
+        attempts INTEGER NOT NULL,
+        last_error TEXT,
+        updated_at DATETIME NOT NULL,
+        lease_owner TEXT,
+        lease_expires_at REAL
+    );
+    ''',
+    'features': '''
+    CREATE TABLE IF NOT EXISTS features (
+        uid INTEGER PRIMARY KEY,
+        file_path TEXT NOT NULL,
+        window_length REAL NOT NULL,
+        n_windows INTEGER NOT NULL,
+        rms_db REAL,
+        spectral_centroid REAL,
+        silence_duration REAL NOT NULL
+    );
+    ''',
+    'silence': '''
+    CREATE TABLE IF NOT EXISTS silence (
+        uid INTEGER NOT NULL,
+        start REAL NOT NULL,
+        stop REAL NOT NULL,
+        duration REAL NOT NULL
+    );
+    ''',
+    'segment': '''
+    CREATE TABLE IF NOT EXISTS segment (
+        uid INTEGER NOT NULL,
+        start REAL NOT NULL,
+        byte_offset INTEGER NOT NULL,
+        PRIMARY KEY (uid, start)
+    );
+    ''',
+    'transcript': '''
+    CREATE TABLE IF NOT EXISTS transcript (
+        uid INTEGER NOT NULL,
+        start REAL NOT NULL,
+        stop REAL NOT NULL,
+        text TEXT NOT NULL
+    );
+    ''',
+    'transcribed': '''
+    CREATE TABLE IF NOT EXISTS transcribed (
+        uid INTEGER PRIMARY KEY,
+        n_segments INTEGER NOT NULL,
+        transcribed_at DATETIME NOT NULL
+    );
+    ''',
+    'meta_fts': '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS meta_fts USING fts5(
+        title,
+        description,
+        content='meta',
+        content_rowid='uid'
+    );
+    ''',
+    'transcript_fts': '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS transcript_fts USING fts5(
+        text,
+        content='transcript',
+        content_rowid='rowid'
+    );
+    '''
+}
+TRIGGERS = [
+    '''
+    CREATE TRIGGER IF NOT EXISTS meta_fts_insert AFTER INSERT ON meta BEGIN
+        INSERT INTO meta_fts (rowid, title, description) VALUES (new.uid, new.title, new.description);
+    END;
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS meta_fts_delete AFTER DELETE ON meta BEGIN
+        INSERT INTO meta_fts (meta_fts, rowid, title, description) VALUES ('delete', old.uid, old.title, old.description);
+    END;
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS meta_fts_update AFTER UPDATE ON meta BEGIN
+        INSERT INTO meta_fts (meta_fts, rowid, title, description) VALUES ('delete', old.uid, old.title, old.description);
+        INSERT INTO meta_fts (rowid, title, description) VALUES (new.uid, new.title, new.description);
+    END;
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS transcript_fts_insert AFTER INSERT ON transcript BEGIN
+        INSERT INTO transcript_fts (rowid, text) VALUES (new.rowid, new.text);
+    END;
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS transcript_fts_delete AFTER DELETE ON transcript BEGIN
+        INSERT INTO transcript_fts (transcript_fts, rowid, text) VALUES ('delete', old.rowid, old.text);
+    END;
+    '''
+]
+INDICES = [
+    'CREATE INDEX IF NOT EXISTS meta_published_at ON meta (julianday(published_at));',
+    'CREATE INDEX IF NOT EXISTS silence_uid ON silence (uid);',
+    'CREATE INDEX IF NOT EXISTS silence_duration ON silence (duration);',
+    'CREATE INDEX IF NOT EXISTS transcript_uid ON transcript (uid, start);'
+]
+ADDED_COLUMNS = [
+    ('audio', 'channels', 'INTEGER'),
+    ('audio', 'format', 'TEXT'),
+    ('audio', 'file_size', 'INTEGER'),
+    ('audio', 'sha256', 'TEXT'),
+    ('job', 'lease_owner', 'TEXT'),
+    ('job', 'lease_expires_at', 'REAL')
+]
 
 
 class SQLiteEngine(Base):
     """Class to set up and access a SQLite database to store the data from the 'zeitsprung.fm' website."""
 
-    def __init__(self, db_file: str, verbose: bool = True) -> None:
+    def __init__(self, db_file: str, synchronous: str = 'NORMAL', cache_size: int = -64000,
+                 catalog_size: int = 1024, verbose: bool = True) -> None:
         """
-        Class constructor for the Scraper class.
+        Class constructor for the SQLiteEngine class.
 
         Parameters
         ----------
         db_file : str
             Path to the 'zeitsprung.db' file.
             Hint: The database is created inside the data folder, specified in the constructor of 'Scrape'.
+        synchronous : str, default 'NORMAL'
+            Value of the 'synchronous' pragma ('OFF', 'NORMAL', 'FULL' or 'EXTRA'), 'NORMAL' is safe in WAL mode.
+        cache_size : int, default -64000
+            Value of the 'cache_size' pragma, negative values are in KiB, positive values in pages.
+        catalog_size : int, default 1024
+            Maximum number of records kept in the catalog cache of 'get_episode' and 'get_audio_info', 0 disables it.
         verbose : bool, default True
             Print messages about the activities conducted by a class instance.
 
@@ -26,8 +197,17 @@ class SQLiteEngine(Base):
 
         """
         super().__init__(verbose)
+        if synchronous.upper() not in ('OFF', 'NORMAL', 'FULL', 'EXTRA'):
+            raise ValueError(f"Invalid value '{synchronous}' for the 'synchronous' pragma.")
         self.db_file = db_file
+        self.synchronous = synchronous.upper()
+        self.cache_size = int(cache_size)
+        self.catalog_size = catalog_size
         self.verbose = verbose
+        self._conn = None
+        self._lock = RLock()
+        self._depth = 0
+        self._catalog = OrderedDict()
 
     def __str__(self) -> str:
         """
@@ -43,7 +223,8 @@ class SQLiteEngine(Base):
 
     def create_connection(self) -> Connection:
         """
-        Creates a connection object using the provided credentials in instance creation.
+        Returns the long-lived connection of the instance. The connection is opened on first use in WAL journal mode
+        with the configured 'synchronous' and 'cache_size' pragmas and can be shared between threads.
 
         Returns
         -------
@@ -51,16 +232,66 @@ class SQLiteEngine(Base):
             A object for connecting to the database.
 
         """
-        conn = None
-        try:
-            conn = connect(self.db_file)
-        except BaseException as e:
-            print(e)
-        return conn
+        with self._lock:
+            if self._conn is None:
+                try:
+                    conn = connect(self.db_file, timeout=30, check_same_thread=False)
+                    conn.execute('PRAGMA journal_mode=WAL;')
+                    conn.execute(f'PRAGMA synchronous={self.synchronous};')
+                    conn.execute(f'PRAGMA cache_size={self.cache_size};')
+                    self._conn = conn
+                except BaseException as e:
+                    LOGGER.error(f"Failed to connect to '{self.db_file}': {e!r}")
+            return self._conn
+
+    def close(self) -> None:
+        """
+        Closes the long-lived connection, it is reopened on the next access to the database.
+
+        Returns
+        -------
+        None
+
+        """
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    @contextmanager
+    def transaction(self) -> Iterator[Connection]:
+        """
+        Context manager, which groups all statements executed inside of it into one transaction. The transaction is
+        committed on exit or rolled back if an exception is raised. Nested transactions are merged into the outermost
+        one, whose duration is recorded in the 'db_write' histogram of the metrics.
+
+        Returns
+        -------
+        Iterator[Connection]
+            The connection to execute the statements with.
+
+        """
+        with self._lock:
+            conn = self.create_connection()
+            self._depth += 1
+            start = perf_counter()
+            try:
+                yield conn
+            except BaseException:
+                self._depth -= 1
+                if self._depth == 0:
+                    conn.rollback()
+                    self._catalog.clear()
+                raise
+            self._depth -= 1
+            if self._depth == 0:
+                conn.commit()
+                self.metrics.observe('db_write', perf_counter() - start)
 
     def setup_schema(self) -> None:
         """
-        Creates the schema with 'meta' and 'audio' relations in the 'zeitsprung.db' database.
+        Creates the schema with 'meta', 'audio', 'job', 'features', 'silence', 'segment', 'transcript' and 'transcribed'
+        relations and the full-text indices 'meta_fts' and 'transcript_fts' in the 'zeitsprung.db' database.
 
         Returns
         -------
@@ -68,41 +299,73 @@ class SQLiteEngine(Base):
 
         """
         self._print(f"Setting up SQLite database at '{self.db_file}'.")
-        conn = self.create_connection()
-        cur = conn.cursor()
-        cur.execute('DROP TABLE IF EXISTS meta;')
-        cur.execute('''
-        CREATE TABLE meta (
-            uid INTEGER PRIMARY KEY,
-            published_at DATETIME NOT NULL,
-            modified_at DATETIME NOT NULL,
-            abbreviation TEXT NOT NULL,
-            title TEXT NOT NULL,
-            description TEXT NOT NULL,
-            url_episode TEXT NOT NULL,
-            url_audio TEXT NOT NULL
-        );
-        ''')
-        cur.execute('DROP TABLE IF EXISTS audio;')
-        cur.execute('''
-        CREATE TABLE audio (
-            uid INTEGER PRIMARY KEY,
-            file_path TEXT NOT NULL,
-            duration INTEGER NOT NULL,
-            frame_rate INTEGER NOT NULL,
-            frame_width INTEGER NOT NULL
-        );
-        ''')
-        conn.commit()
-        conn.close()
-
-    def insert_meta_row(self, row: list) -> None:
-        """
-        Inserts a record row into the 'meta' relation.
-
-        Parameters
-        ----------
-        row : list
+        self.clear_catalog()
+        with self.transaction() as conn:
+            for table, statement in SCHEMA.items():
+                conn.execute(f'DROP TABLE IF EXISTS {table};')
+                conn.execute(statement)
+            for statement in TRIGGERS + INDICES:
+                conn.execute(statement)
+
+    def upgrade_schema(self) -> None:
+        """
+        Upgrades the schema of a database created by an earlier version of the package, by creating the missing
+        relations and indices, adding the missing columns to the existing relations and allowing episodes without
+        audio URL in the 'meta' relation. Episodes scraped before the 'job' relation existed are added to it, as
+        'indexed' if their audio is stored (or they have none) and at stage 'meta' otherwise, so 'resume' picks them up.
+        Episodes with a transcript are marked as transcribed in the 'transcribed' relation.
+
+        Returns
+        -------
+        None
+
+        """
+        self.clear_catalog()
+        with self.transaction() as conn:
+            tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table';")]
+            rebuild_meta = [info[3] for info in conn.execute('PRAGMA table_info(meta);') if info[1] == 'url_audio'] == [1]
+            if rebuild_meta:
+                self._print("Allowing missing audio URLs in table 'meta'.")
+                conn.execute('ALTER TABLE meta RENAME TO meta_old;')
+                conn.execute(SCHEMA['meta'])
+                conn.execute(f"""
+                INSERT INTO meta ({', '.join(META_COLUMNS)})
+                SELECT {', '.join(META_COLUMNS[:-1])}, NULLIF(url_audio, 'None') FROM meta_old;
+                """)
+                conn.execute('DROP TABLE meta_old;')
+            for statement in SCHEMA.values():
+                conn.execute(statement)
+            for table, column, data_type in ADDED_COLUMNS:
+                if column not in [info[1] for info in conn.execute(f'PRAGMA table_info({table});')]:
+                    self._print(f"Adding column '{column}' to table '{table}'.")
+                    conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {data_type};')
+            for statement in TRIGGERS + INDICES:
+                conn.execute(statement)
+            n_before = conn.total_changes
+            conn.execute('''
+            INSERT INTO job (uid, stage, attempts, last_error, updated_at)
+            SELECT m.uid, CASE WHEN a.uid IS NULL AND m.url_audio IS NOT NULL THEN ? ELSE ? END, 0, NULL, ?
+            FROM meta m LEFT JOIN audio a USING (uid) WHERE true
+            ON CONFLICT(uid) DO NOTHING;
+            ''', (JOB_STAGES[0], JOB_STAGES[-1], self._now()))
+            if conn.total_changes > n_before:
+                self._print(f"Added {conn.total_changes - n_before} existing episodes to table 'job'.")
+            conn.execute('''
+            INSERT INTO transcribed (uid, n_segments, transcribed_at)
+            SELECT uid, count(*), ? FROM transcript GROUP BY uid
+            ON CONFLICT(uid) DO NOTHING;
+            ''', (self._now(),))
+            if 'meta_fts' not in tables or rebuild_meta:
+                self._print("Building full-text index 'meta_fts'.")
+                conn.execute("INSERT INTO meta_fts (meta_fts) VALUES ('rebuild');")
+
+    def insert_meta_row(self, row: Union[list, Episode]) -> None:
+        """
+        Inserts a record row into the 'meta' relation, or updates the existing row of the episode.
+
+        Parameters
+        ----------
+        row : list or Episode
             Values to insert.
 
         Returns
@@ -110,24 +373,37 @@ class SQLiteEngine(Base):
         None
 
         """
-        self._print(f"Writing row for '{row[0]}' to table 'meta'.")
-        conn = self.create_connection()
-        cur = conn.cursor()
-        cur.execute(f"""
-        INSERT INTO meta (uid, published_at, modified_at, abbreviation, title, description, url_episode, url_audio)
-        VALUES('{row[0]}', '{row[1]}', '{row[2]}', '{row[3]}', '{normalize("NFKD", row[4]).replace("'", '')}',
-            '{normalize("NFKD", row[5]).replace("'", '')}', '{row[6]}', '{row[7]}');
-        """)
-        conn.commit()
-        conn.close()
+        row = list(row)
+        self._debug(f"Writing row for '{row[0]}' to table 'meta'.", uid=row[0])
+        self._upsert('meta', META_COLUMNS, [row])
 
-    def insert_audio_row(self, row: list) -> None:
+    def insert_meta_rows(self, rows: Union[Iterable[Union[list, Episode]], DataFrame]) -> int:
         """
-        Inserts a record row into the 'audio' relation.
+        Inserts many record rows into the 'meta' relation in one transaction. Rows of already existing episodes are
+        updated in place.
 
         Parameters
         ----------
-        row : list
+        rows : iterable of lists or Episodes, or DataFrame
+            Values to insert, either as rows in the order of the columns or as a DataFrame with the named columns.
+
+        Returns
+        -------
+        int
+            Number of inserted or updated rows.
+
+        """
+        n = self._upsert('meta', META_COLUMNS, rows)
+        self._print(f"Wrote {n} rows to table 'meta'.")
+        return n
+
+    def insert_audio_row(self, row: Union[list, AudioInfo]) -> None:
+        """
+        Inserts a record row into the 'audio' relation, or updates the existing row of the episode.
+
+        Parameters
+        ----------
+        row : list or AudioInfo
             Values to insert.
 
         Returns
@@ -135,15 +411,501 @@ class SQLiteEngine(Base):
         None
 
         """
-        self._print(f"Writing row for '{row[0]}' to table 'audio'.")
-        conn = self.create_connection()
-        cur = conn.cursor()
-        cur.execute(f"""
-        INSERT INTO audio (uid, file_path, duration, frame_rate, frame_width)
-        VALUES('{row[0]}', '{row[1]}', '{row[2]}', '{row[3]}', '{row[4]}');
-        """)
-        conn.commit()
-        conn.close()
+        row = list(row)
+        self._debug(f"Writing row for '{row[0]}' to table 'audio'.", uid=row[0])
+        self._upsert('audio', AUDIO_COLUMNS, [row])
+
+    def insert_audio_rows(self, rows: Union[Iterable[Union[list, AudioInfo]], DataFrame]) -> int:
+        """
+        Inserts many record rows into the 'audio' relation in one transaction. Rows of already existing episodes are
+        updated in place.
+
+        Parameters
+        ----------
+        rows : iterable of lists or AudioInfos, or DataFrame
+            Values to insert, either as rows in the order of the columns or as a DataFrame with the named columns.
+
+        Returns
+        -------
+        int
+            Number of inserted or updated rows.
+
+        """
+        n = self._upsert('audio', AUDIO_COLUMNS, rows)
+        self._print(f"Wrote {n} rows to table 'audio'.")
+        return n
+
+    def insert_feature_rows(self, rows: Union[Iterable[list], DataFrame]) -> int:
+        """
+        Inserts many record rows into the 'features' relation in one transaction. Rows of already existing episodes are
+        updated in place.
+
+        Parameters
+        ----------
+        rows : iterable of lists or DataFrame
+            Values to insert, either as rows in the order of the columns or as a DataFrame with the named columns.
+
+        Returns
+        -------
+        int
+            Number of inserted or updated rows.
+
+        """
+        n = self._upsert('features', FEATURE_COLUMNS, rows)
+        self._print(f"Wrote {n} rows to table 'features'.")
+        return n
+
+    def insert_silences(self, uid: int, segments: Iterable[Tuple[float, float]]) -> int:
+        """
+        Replaces the silence segments of an episode in the 'silence' relation.
+
+        Parameters
+        ----------
+        uid : int
+            Number of the episode.
+        segments : iterable of tuples
+            Start and stop in seconds of the silence segments.
+
+        Returns
+        -------
+        int
+            Number of inserted segments.
+
+        """
+        values = [(uid, float(start), float(stop), float(stop) - float(start)) for start, stop in segments]
+        with self.transaction() as conn:
+            conn.execute('DELETE FROM silence WHERE uid = ?', (uid,))
+            conn.executemany(f"""
+            INSERT INTO silence ({', '.join(SILENCE_COLUMNS)}) VALUES ({', '.join('?' * len(SILENCE_COLUMNS))});
+            """, values)
+        self._print(f"Wrote {len(values)} silence segments of '{uid}' to table 'silence'.")
+        return len(values)
+
+    def insert_transcript(self, uid: int, segments: Iterable[Tuple[float, float, str]]) -> int:
+        """
+        Replaces the transcript of an episode in the 'transcript' relation, the full-text index 'transcript_fts' is
+        updated by triggers. The episode is marked as transcribed in the 'transcribed' relation, also if no speech was
+        recognized.
+
+        Parameters
+        ----------
+        uid : int
+            Number of the episode.
+        segments : iterable of tuples
+            Start and stop in seconds and the text of the transcribed segments.
+
+        Returns
+        -------
+        int
+            Number of inserted segments.
+
+        """
+        values = [(uid, float(start), float(stop), str(text)) for start, stop, text in segments]
+        with self.transaction() as conn:
+            conn.execute('DELETE FROM transcript WHERE uid = ?', (uid,))
+            conn.executemany(f"""
+            INSERT INTO transcript ({', '.join(TRANSCRIPT_COLUMNS)})
+            VALUES ({', '.join('?' * len(TRANSCRIPT_COLUMNS))});
+            """, values)
+            conn.execute('''
+            INSERT INTO transcribed (uid, n_segments, transcribed_at) VALUES (?, ?, ?)
+            ON CONFLICT(uid) DO UPDATE SET n_segments = excluded.n_segments, transcribed_at = excluded.transcribed_at;
+            ''', (uid, len(values), self._now()))
+        self._print(f"Wrote {len(values)} transcript segments of '{uid}' to table 'transcript'.")
+        return len(values)
+
+    def insert_segments(self, uid: int, segments: Iterable[Tuple[float, int]]) -> int:
+        """
+        Replaces the segment index of the audio file of an episode in the 'segment' relation.
+
+        Parameters
+        ----------
+        uid : int
+            Number of the episode.
+        segments : iterable of tuples
+            Start time in seconds and byte offset of the indexed frames (see 'zeitsprung.clips.segment_index').
+
+        Returns
+        -------
+        int
+            Number of inserted entries.
+
+        """
+        values = [(uid, float(start), int(offset)) for start, offset in segments]
+        with self.transaction() as conn:
+            conn.execute('DELETE FROM segment WHERE uid = ?', (uid,))
+            conn.executemany('INSERT INTO segment (uid, start, byte_offset) VALUES (?, ?, ?);', values)
+        self._debug(f"Wrote {len(values)} index entries of '{uid}' to table 'segment'.", uid=uid)
+        return len(values)
+
+    def _upsert(self, table: str, columns: list, rows: Union[Iterable[list], DataFrame]) -> int:
+        if hasattr(rows, 'itertuples'):
+            rows = rows[columns].astype(object)
+            rows = rows.where(rows.notna(), None).itertuples(index=False, name=None)
+        values = [tuple(self._adapt(value) for value in row) for row in rows]
+        updates = ', '.join(f'{column} = excluded.{column}' for column in columns[1:])
+        with self.transaction() as conn:
+            conn.executemany(f"""
+            INSERT INTO {table} ({', '.join(columns)})
+            VALUES ({', '.join('?' * len(columns))})
+            ON CONFLICT(uid) DO UPDATE SET {updates};
+            """, values)
+            for value in values:
+                self._catalog.pop((table, value[0]), None)
+        self.metrics.inc('rows_written', len(values))
+        return len(values)
+
+    @staticmethod
+    def _adapt(value: Any) -> Any:
+        if isinstance(value, (datetime, PurePath)):
+            return str(value)
+        if hasattr(value, 'item'):
+            return value.item()
+        return value
+
+    def search(self, query: str, limit: int = 10) -> DataFrame:
+        """
+        Searches the titles and descriptions of the episodes using the full-text index 'meta_fts'.
+
+        Parameters
+        ----------
+        query : str
+            Full-text query in the FTS5 syntax, e.g. 'Köln', 'hexe*' or 'title:napoleon'.
+        limit : int, default 10
+            Maximum number of episodes returned.
+
+        Returns
+        -------
+        DataFrame
+            The matching episodes with title and a snippet of the description, ordered by relevance.
+
+        """
+        with self._lock:
+            rows = self.create_connection().execute('''
+            SELECT meta.uid, meta.title, snippet(meta_fts, 1, '[', ']', '...', 12), bm25(meta_fts)
+            FROM meta_fts JOIN meta ON meta.uid = meta_fts.rowid
+            WHERE meta_fts MATCH ?
+            ORDER BY bm25(meta_fts)
+            LIMIT ?;
+            ''', (query, limit)).fetchall()
+        from pandas import DataFrame
+        return DataFrame([list(row) for row in rows], columns=['uid', 'title', 'snippet', 'rank'])
+
+    def search_transcripts(self, query: str, uids: Union[Iterable[int], None] = None, limit: int = 10) -> DataFrame:
+        """
+        Searches the transcripts of the episodes using the full-text index 'transcript_fts', the matches are located
+        by the start and stop of their segments.
+
+        Parameters
+        ----------
+        query : str
+            Full-text query in the FTS5 syntax, e.g. 'Köln', 'hexe*' or '"dreißigjähriger krieg"'.
+        uids : iterable of int or None, default None
+            Numbers of the episodes to search, all episodes if None.
+        limit : int, default 10
+            Maximum number of segments returned.
+
+        Returns
+        -------
+        DataFrame
+            The number of the episode, start and stop in seconds and the text with highlighted matches of the matching
+            segments, ordered by relevance.
+
+        """
+        where, params = self._uid_filter(uids)
+        where = ''.join(f' AND transcript.{condition}' for condition in where)
+        with self._lock:
+            rows = self.create_connection().execute(f'''
+            SELECT transcript.uid, transcript.start, transcript.stop, highlight(transcript_fts, 0, '[', ']'),
+                bm25(transcript_fts)
+            FROM transcript_fts JOIN transcript ON transcript.rowid = transcript_fts.rowid
+            WHERE transcript_fts MATCH ?{where}
+            ORDER BY bm25(transcript_fts)
+            LIMIT ?;
+            ''', [query] + params + [limit]).fetchall()
+        from pandas import DataFrame
+        return DataFrame([list(row) for row in rows], columns=['uid', 'start', 'stop', 'text', 'rank'])
+
+    def begin_job(self, uid: int) -> Union[str, None]:
+        """
+        Registers a new attempt to process an episode in the 'job' relation. An episode which was already indexed, e.g.
+        because it is refreshed, starts a new job with a single attempt.
+
+        Parameters
+        ----------
+        uid : int
+            Number of the episode.
+
+        Returns
+        -------
+        str or None
+            The stage reached by the previous attempts, None if the episode is processed for the first time (also if it
+            was queued by 'enqueue_jobs') or was already indexed.
+
+        """
+        with self.transaction() as conn:
+            row = conn.execute('SELECT stage, attempts FROM job WHERE uid = ?', (uid,)).fetchone()
+            conn.execute('''
+            INSERT INTO job (uid, stage, attempts, last_error, updated_at) VALUES (?, ?, 1, NULL, ?)
+            ON CONFLICT(uid) DO UPDATE SET
+                stage = CASE WHEN stage = ? THEN excluded.stage ELSE stage END,
+                attempts = CASE WHEN stage = ? THEN 1 ELSE attempts + 1 END,
+                updated_at = excluded.updated_at;
+            ''', (uid, JOB_STAGES[0], self._now(), JOB_STAGES[-1], JOB_STAGES[-1]))
+        return None if row is None or row[1] == 0 or row[0] == JOB_STAGES[-1] else row[0]
+
+    def advance_jobs(self, uids: Iterable[int], stage: str) -> None:
+        """
+        Records the stage reached by episodes in the 'job' relation and clears their last error.
+
+        Parameters
+        ----------
+        uids : iterable of int
+            Numbers of the episodes.
+        stage : str
+            The reached stage, one of 'meta', 'downloaded', 'transcoded' or 'indexed'.
+
+        Returns
+        -------
+        None
+
+        """
+        if stage not in JOB_STAGES:
+            raise ValueError(f"Unknown stage '{stage}', use one of {', '.join(JOB_STAGES)}.")
+        now = self._now()
+        with self.transaction() as conn:
+            conn.executemany('''
+            INSERT INTO job (uid, stage, attempts, last_error, updated_at) VALUES (?, ?, 1, NULL, ?)
+            ON CONFLICT(uid) DO UPDATE SET stage = excluded.stage, last_error = NULL, updated_at = excluded.updated_at;
+            ''', [(uid, stage, now) for uid in uids])
+
+    def fail_job(self, uid: int, error: str, new_attempt: bool = False) -> None:
+        """
+        Records the error of a failed attempt to process an episode in the 'job' relation.
+
+        Parameters
+        ----------
+        uid : int
+            Number of the episode.
+        error : str
+            Description of the error.
+        new_attempt : bool, default False
+            Count a new attempt, for attempts which failed before 'begin_job' was called, e.g. while requesting the
+            meta data. The episode is added to the 'job' relation if it is not yet in it.
+
+        Returns
+        -------
+        None
+
+        """
+        with self.transaction() as conn:
+            if new_attempt:
+                conn.execute('''
+                INSERT INTO job (uid, stage, attempts, last_error, updated_at) VALUES (?, ?, 1, ?, ?)
+                ON CONFLICT(uid) DO UPDATE SET attempts = attempts + 1, last_error = excluded.last_error,
+                    updated_at = excluded.updated_at;
+                ''', (uid, JOB_STAGES[0], error, self._now()))
+            else:
+                conn.execute('UPDATE job SET last_error = ?, updated_at = ? WHERE uid = ?', (error, self._now(), uid))
+
+    def enqueue_jobs(self, uids: Iterable[int]) -> int:
+        """
+        Adds episodes as tasks to the work queue in the 'job' relation, which can be claimed by workers with
+        'claim_jobs'. Episodes already in the 'job' relation are kept as they are.
+
+        Parameters
+        ----------
+        uids : iterable of int
+            Numbers of the episodes.
+
+        Returns
+        -------
+        int
+            Number of added tasks.
+
+        """
+        now = self._now()
+        with self.transaction() as conn:
+            n_before = conn.total_changes
+            conn.executemany('''
+            INSERT INTO job (uid, stage, attempts, last_error, updated_at) VALUES (?, ?, 0, NULL, ?)
+            ON CONFLICT(uid) DO NOTHING;
+            ''', [(int(uid), JOB_STAGES[0], now) for uid in uids])
+            n_added = conn.total_changes - n_before
+        self._print(f"Added {n_added} episodes to the work queue.")
+        return n_added
+
+    def claim_jobs(self, owner: str, n: int = 1, lease: float = 300,
+                   max_attempts: Union[int, None] = None) -> List[int]:
+        """
+        Claims incomplete episodes from the work queue by taking a lease on them. Episodes leased by other workers are
+        skipped until their lease expires, e.g. because the worker crashed. The episodes are marked with a unique token
+        of the claim and read back in the same transaction, so workers in several processes on the same host never
+        claim the same episode. The database runs in WAL mode, which needs shared memory between the processes, so it
+        must not be shared over a network file system.
+
+        Parameters
+        ----------
+        owner : str
+            Unique name of the worker.
+        n : int, default 1
+            Maximum number of episodes to claim.
+        lease : float, default 300
+            Duration of the lease in seconds, renew it with 'renew_leases' while working on the episodes.
+        max_attempts : int or None, default None
+            Skip episodes, which already failed this many times, no limit if None.
+
+        Returns
+        -------
+        list
+            Numbers of the claimed episodes in ascending order.
+
+        """
+        now, token = time(), f'claim:{uuid4().hex}'
+        with self.transaction() as conn:
+            conn.execute('''
+            UPDATE job SET lease_owner = ?, lease_expires_at = ? WHERE uid IN (
+                SELECT uid FROM job
+                WHERE stage != ? AND (lease_expires_at IS NULL OR lease_expires_at < ?)
+                AND (? IS NULL OR attempts < ?)
+                ORDER BY uid LIMIT ?
+            );
+            ''', (token, now + lease, JOB_STAGES[-1], now, max_attempts, max_attempts, n))
+            uids = [row[0] for row in conn.execute('SELECT uid FROM job WHERE lease_owner = ? ORDER BY uid', (token,))]
+            conn.execute('UPDATE job SET lease_owner = ? WHERE lease_owner = ?', (owner, token))
+        self._debug(f"Worker '{owner}' claimed {len(uids)} episodes.", owner=owner, uids=uids)
+        return uids
+
+    def renew_leases(self, owner: str, uids: Iterable[int], lease: float = 300) -> List[int]:
+        """
+        Extends the leases of a worker on episodes (heartbeat).
+
+        Parameters
+        ----------
+        owner : str
+            Unique name of the worker.
+        uids : iterable of int
+            Numbers of the episodes.
+        lease : float, default 300
+            New duration of the leases in seconds, counted from now.
+
+        Returns
+        -------
+        list
+            Numbers of the episodes still leased by the worker. Leases which expired and were claimed by another worker
+            in the meantime are lost.
+
+        """
+        uids = [int(uid) for uid in uids]
+        placeholders = ', '.join('?' * len(uids))
+        with self.transaction() as conn:
+            conn.execute(f'UPDATE job SET lease_expires_at = ? WHERE lease_owner = ? AND uid IN ({placeholders});',
+                         [time() + lease, owner] + uids)
+            return [row[0] for row in conn.execute(
+                f'SELECT uid FROM job WHERE lease_owner = ? AND uid IN ({placeholders}) ORDER BY uid', [owner] + uids
+            )]
+
+    def release_jobs(self, owner: str, uids: Iterable[int]) -> None:
+        """
+        Releases the leases of a worker on episodes, after they are completed or failed.
+
+        Parameters
+        ----------
+        owner : str
+            Unique name of the worker.
+        uids : iterable of int
+            Numbers of the episodes.
+
+        Returns
+        -------
+        None
+
+        """
+        with self.transaction() as conn:
+            conn.executemany(
+                'UPDATE job SET lease_owner = NULL, lease_expires_at = NULL WHERE uid = ? AND lease_owner = ?',
+                [(int(uid), owner) for uid in uids]
+            )
+
+    def remove_jobs(self, uids: Iterable[int]) -> None:
+        """
+        Removes episodes from the 'job' relation, e.g. queued episodes which are not published.
+
+        Parameters
+        ----------
+        uids : iterable of int
+            Numbers of the episodes.
+
+        Returns
+        -------
+        None
+
+        """
+        with self.transaction() as conn:
+            conn.executemany('DELETE FROM job WHERE uid = ?', [(int(uid),) for uid in uids])
+
+    def query_next_lease_expiry(self, max_attempts: Union[int, None] = None) -> Union[float, None]:
+        """
+        Queries when the next lease on an incomplete episode expires.
+
+        Parameters
+        ----------
+        max_attempts : int or None, default None
+            Skip episodes, which already failed this many times, no limit if None.
+
+        Returns
+        -------
+        float or None
+            Expiry of the lease as Unix timestamp, None if no incomplete episode is leased.
+
+        """
+        with self._lock:
+            return self.create_connection().execute(
+                'SELECT min(lease_expires_at) FROM job WHERE stage != ? AND (? IS NULL OR attempts < ?)',
+                (JOB_STAGES[-1], max_attempts, max_attempts)
+            ).fetchone()[0]
+
+    def query_incomplete_jobs(self, max_attempts: Union[int, None] = None) -> DataFrame:
+        """
+        Queries the episodes from the 'job' relation, which have not reached the 'indexed' stage.
+
+        Parameters
+        ----------
+        max_attempts : int or None, default None
+            Skip episodes, which already failed this many times, no limit if None.
+
+        Returns
+        -------
+        DataFrame
+            The incomplete jobs ordered by episode.
+
+        """
+        with self._lock:
+            rows = self.create_connection().execute(
+                'SELECT uid, stage, attempts, last_error, updated_at FROM job '
+                'WHERE stage != ? AND (? IS NULL OR attempts < ?) ORDER BY uid',
+                (JOB_STAGES[-1], max_attempts, max_attempts)
+            ).fetchall()
+        from pandas import DataFrame
+        return DataFrame([list(row) for row in rows], columns=['uid', 'stage', 'attempts', 'last_error', 'updated_at'])
+
+    def query_job_stages(self) -> dict:
+        """
+        Counts the episodes per stage in the 'job' relation, without loading the jobs into a DataFrame.
+
+        Returns
+        -------
+        dict
+            Number of episodes per stage, in the order of the stages.
+
+        """
+        with self._lock:
+            counts = dict(self.create_connection().execute('SELECT stage, count(*) FROM job GROUP BY stage'))
+        return {stage: counts.get(stage, 0) for stage in JOB_STAGES}
+
+    @staticmethod
+    def _now() -> str:
+        return str(datetime.now(timezone.utc).replace(microsecond=0))
 
     def query_last_episode_id(self) -> Union[int, None]:
         """
@@ -155,12 +917,188 @@ class SQLiteEngine(Base):
             The id of the last episode.
 
         """
-        conn = self.create_connection()
-        cur = conn.cursor()
-        cur.execute('SELECT max(uid) FROM meta')
-        uid = cur.fetchall()[0][0]
+        with self._lock:
+            uid = self.create_connection().execute('SELECT max(uid) FROM meta').fetchall()[0][0]
         return 0 if uid is None else uid
 
+    def query_meta(self, columns: Union[List[str], None] = None, uids: Union[Iterable[int], None] = None,
+                   published_after: Union[datetime, str, None] = None,
+                   published_before: Union[datetime, str, None] = None, order_by: str = 'uid',
+                   ascending: bool = True, limit: Union[int, None] = None,
+                   chunksize: Union[int, None] = None) -> Union[DataFrame, Iterator[DataFrame]]:
+        """
+        Queries the 'meta' relation. Projection, filters, ordering and limit are pushed down into the SQL query, the
+        date filters and the ordering by publication date use the index on 'published_at'.
+
+        Parameters
+        ----------
+        columns : list of str or None, default None
+            Columns to query, all columns if None.
+        uids : iterable of int or None, default None
+            Numbers of the episodes to query, all episodes if None.
+        published_after : datetime, str or None, default None
+            Only query episodes published at or after this date.
+        published_before : datetime, str or None, default None
+            Only query episodes published before this date.
+        order_by : str, default 'uid'
+            Column to order the rows by.
+        ascending : bool, default True
+            Sort in ascending order.
+        limit : int or None, default None
+            Maximum number of rows, no limit if None.
+        chunksize : int or None, default None
+            Return an iterator of DataFrames with this number of rows instead of a single DataFrame.
+
+        Returns
+        -------
+        DataFrame or Iterator[DataFrame]
+            The queried rows with typed columns, dates are converted to UTC.
+
+        """
+        where, params = self._uid_filter(uids)
+        if published_after is not None:
+            where.append('julianday(published_at) >= julianday(?)')
+            params.append(self._adapt(published_after))
+        if published_before is not None:
+            where.append('julianday(published_at) < julianday(?)')
+            params.append(self._adapt(published_before))
+        return self._query('meta', META_COLUMNS, META_DTYPES, columns, where, params, order_by, ascending, limit,
+                           chunksize)
+
+    def query_audio(self, columns: Union[List[str], None] = None, uids: Union[Iterable[int], None] = None,
+                    order_by: str = 'uid', ascending: bool = True, limit: Union[int, None] = None,
+                    chunksize: Union[int, None] = None) -> Union[DataFrame, Iterator[DataFrame]]:
+        """
+        Queries the 'audio' relation. Projection, filters, ordering and limit are pushed down into the SQL query.
+
+        Parameters
+        ----------
+        columns : list of str or None, default None
+            Columns to query, all columns if None.
+        uids : iterable of int or None, default None
+            Numbers of the episodes to query, all episodes if None.
+        order_by : str, default 'uid'
+            Column to order the rows by.
+        ascending : bool, default True
+            Sort in ascending order.
+        limit : int or None, default None
+            Maximum number of rows, no limit if None.
+        chunksize : int or None, default None
+            Return an iterator of DataFrames with this number of rows instead of a single DataFrame.
+
+        Returns
+        -------
+        DataFrame or Iterator[DataFrame]
+            The queried rows with typed columns.
+
+        """
+        where, params = self._uid_filter(uids)
+        return self._query('audio', AUDIO_COLUMNS, AUDIO_DTYPES, columns, where, params, order_by, ascending, limit,
+                           chunksize)
+
+    def query_features(self, columns: Union[List[str], None] = None, uids: Union[Iterable[int], None] = None,
+                       order_by: str = 'uid', ascending: bool = True,
+                       limit: Union[int, None] = None) -> DataFrame:
+        """
+        Queries the 'features' relation, which summarizes the extracted features per episode.
+
+        Parameters
+        ----------
+        columns : list of str or None, default None
+            Columns to query, all columns if None.
+        uids : iterable of int or None, default None
+            Numbers of the episodes to query, all episodes if None.
+        order_by : str, default 'uid'
+            Column to order the rows by.
+        ascending : bool, default True
+            Sort in ascending order.
+        limit : int or None, default None
+            Maximum number of rows, no limit if None.
+
+        Returns
+        -------
+        DataFrame
+            The queried rows with typed columns.
+
+        """
+        where, params = self._uid_filter(uids)
+        return self._query('features', FEATURE_COLUMNS, FEATURE_DTYPES, columns, where, params, order_by, ascending,
+                           limit, None)
+
+    def query_silences(self, min_duration: Union[float, None] = None, uids: Union[Iterable[int], None] = None,
+                       order_by: str = 'uid', ascending: bool = True, limit: Union[int, None] = None) -> DataFrame:
+        """
+        Queries the silence segments of the episodes from the 'silence' relation, without accessing the audio files.
+        The filter on the duration uses the index on 'duration'.
+
+        Parameters
+        ----------
+        min_duration : float or None, default None
+            Only query segments lasting at least this number of seconds.
+        uids : iterable of int or None, default None
+            Numbers of the episodes to query, all episodes if None.
+        order_by : str, default 'uid'
+            Column to order the rows by.
+        ascending : bool, default True
+            Sort in ascending order.
+        limit : int or None, default None
+            Maximum number of rows, no limit if None.
+
+        Returns
+        -------
+        DataFrame
+            The number of the episode, start, stop and duration in seconds of the segments.
+
+        """
+        where, params = self._uid_filter(uids)
+        if min_duration is not None:
+            where.append('duration >= ?')
+            params.append(float(min_duration))
+        return self._query('silence', SILENCE_COLUMNS, SILENCE_DTYPES, None, where, params, order_by, ascending,
+                           limit, None)
+
+    def query_transcripts(self, columns: Union[List[str], None] = None, uids: Union[Iterable[int], None] = None,
+                          order_by: str = 'uid', ascending: bool = True, limit: Union[int, None] = None) -> DataFrame:
+        """
+        Queries the transcribed segments of the episodes from the 'transcript' relation.
+
+        Parameters
+        ----------
+        columns : list of str or None, default None
+            Columns to select, all columns if None.
+        uids : iterable of int or None, default None
+            Numbers of the episodes, all episodes if None.
+        order_by : str, default 'uid'
+            Column to order the rows by.
+        ascending : bool, default True
+            Sort in ascending order.
+        limit : int or None, default None
+            Maximum number of rows, no limit if None.
+
+        Returns
+        -------
+        DataFrame
+            The number of the episode, start and stop in seconds and the text of the segments.
+
+        """
+        where, params = self._uid_filter(uids)
+        return self._query('transcript', TRANSCRIPT_COLUMNS, TRANSCRIPT_DTYPES, columns, where, params, order_by,
+                           ascending, limit, None)
+
+    def query_transcribed_uids(self) -> List[int]:
+        """
+        Queries the episodes marked as transcribed in the 'transcribed' relation, including episodes without any
+        recognized speech.
+
+        Returns
+        -------
+        list of int
+            Numbers of the transcribed episodes in ascending order.
+
+        """
+        with self._lock:
+            return [row[0] for row in self.create_connection().execute('SELECT uid FROM transcribed ORDER BY uid')]
+
     def query_all_meta(self) -> DataFrame:
         """
         Queries the complete record from the 'meta' relation and parses it into a DataFrame object.
@@ -172,17 +1110,7 @@ class SQLiteEngine(Base):
 
         """
         self._print("Querying all rows from table 'meta'.")
-        conn = self.create_connection()
-        cur = conn.cursor()
-        cur.execute('SELECT * FROM meta')
-        rows = cur.fetchall()
-        conn.close()
-        df = DataFrame([list(row) for row in rows],
-                       columns=['uid', 'published_at', 'modified_at', 'abbreviation',
-                                'title', 'description', 'url_episode', 'url_audio'])
-        df['published_at'] = to_datetime(df['published_at'])
-        df['modified_at'] = to_datetime(df['modified_at'])
-        return df
+        return self.query_meta()
 
     def query_all_audio(self) -> DataFrame:
         """
@@ -195,11 +1123,244 @@ class SQLiteEngine(Base):
 
         """
         self._print("Querying all rows from table 'audio'.")
-        conn = self.create_connection()
-        cur = conn.cursor()
-        cur.execute('SELECT * FROM audio')
-        rows = cur.fetchall()
-        conn.close()
-        df = DataFrame([list(row) for row in rows],
-                       columns=['uid', 'file_path', 'duration', 'frame_rate', 'frame_width'])
-        return df
+        return self.query_audio()
+
+    @staticmethod
+    def _uid_filter(uids: Union[Iterable[int], None]) -> Tuple[list, list]:
+        if uids is None:
+            return [], []
+        uids = [int(uid) for uid in uids]
+        return [f"uid IN ({', '.join('?' * len(uids))})"], uids
+
+    def _query(self, table: str, table_columns: list, dtypes: dict, columns: Union[List[str], None], where: list,
+               params: list, order_by: str, ascending: bool, limit: Union[int, None],
+               chunksize: Union[int, None]) -> Union[DataFrame, Iterator[DataFrame]]:
+        columns = table_columns if columns is None else list(columns)
+        unknown = [column for column in columns + [order_by] if column not in table_columns]
+        if unknown:
+            raise ValueError(f"Unknown columns {unknown} in table '{table}'.")
+        sql = f"SELECT {', '.join(columns)} FROM {table}"
+        if where:
+            sql += f" WHERE {' AND '.join(where)}"
+        order = f'julianday({order_by})' if order_by in DATE_COLUMNS else order_by
+        sql += f" ORDER BY {order} {'ASC' if ascending else 'DESC'}"
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params = params + [int(limit)]
+        dtype = {column: dtypes[column] for column in columns if column in dtypes}
+        parse_dates = {column: {'utc': True} for column in columns if column in DATE_COLUMNS}
+        if chunksize is None:
+            from pandas import read_sql_query
+            with self._lock:
+                return read_sql_query(sql, self.create_connection(), params=params, dtype=dtype,
+                                      parse_dates=parse_dates)
+        return self._query_chunks(sql, params, dtype, parse_dates, chunksize)
+
+    def _query_chunks(self, sql: str, params: list, dtype: dict, parse_dates: dict,
+                      chunksize: int) -> Iterator[DataFrame]:
+        from pandas import read_sql_query
+        conn = connect(self.db_file, timeout=30)
+        try:
+            yield from read_sql_query(sql, conn, params=params, dtype=dtype, parse_dates=parse_dates,
+                                      chunksize=chunksize)
+        finally:
+            conn.close()
+
+    def get_episode(self, uid: int) -> Union[Episode, None]:
+        """
+        Looks up the meta data of an episode in the catalog cache, the row is read from the 'meta' relation on a miss.
+
+        Parameters
+        ----------
+        uid : int
+            Number of the episode.
+
+        Returns
+        -------
+        Episode or None
+            The meta data of the episode, None if it is not in the database.
+
+        """
+        return self._lookup('meta', Episode, uid)
+
+    def get_audio_info(self, uid: int) -> Union[AudioInfo, None]:
+        """
+        Looks up the stored audio file of an episode in the catalog cache, the row is read from the 'audio' relation on
+        a miss.
+
+        Parameters
+        ----------
+        uid : int
+            Number of the episode.
+
+        Returns
+        -------
+        AudioInfo or None
+            The audio file of the episode, None if it is not in the database.
+
+        """
+        return self._lookup('audio', AudioInfo, uid)
+
+    def clear_catalog(self) -> None:
+        """
+        Empties the catalog cache. Rows written through the instance are invalidated automatically, rows written by
+        other processes are only seen after clearing the cache (episodes missing in the database are never cached).
+
+        Returns
+        -------
+        None
+
+        """
+        with self._lock:
+            self._catalog.clear()
+
+    def _lookup(self, table: str, record_type: type, uid: int) -> Union[Record, None]:
+        key = (table, int(uid))
+        with self._lock:
+            record = self._catalog.get(key)
+            if record is not None:
+                self._catalog.move_to_end(key)
+                self.metrics.inc('catalog_cache_hits')
+                return record
+            self.metrics.inc('catalog_cache_misses')
+            row = self.create_connection().execute(
+                f"SELECT {', '.join(record_type.__slots__)} FROM {table} WHERE uid = ?", key[1:]
+            ).fetchone()
+            if row is None:
+                return None
+            record = record_type.from_row(row)
+            if self.catalog_size > 0:
+                self._catalog[key] = record
+                if len(self._catalog) > self.catalog_size:
+                    self._catalog.popitem(last=False)
+            return record
+
+    def query_audio_file(self, uid: int) -> Tuple[str, str]:
+        """
+        Looks up the stored audio file of an episode in the catalog cache, without the overhead of a DataFrame.
+
+        Parameters
+        ----------
+        uid : int
+            Number of the episode.
+
+        Returns
+        -------
+        tuple
+            Path and format of the audio file.
+
+        """
+        audio = self.get_audio_info(uid)
+        if audio is None:
+            raise KeyError(f"No audio file stored for episode '{uid}'.")
+        return audio.file_path, audio.format or Path(audio.file_path).suffix[1:].lower()
+
+    def query_segment(self, uid: int, time: float) -> Union[Tuple[float, int], None]:
+        """
+        Looks up the last entry of the segment index of an episode at or before a time.
+
+        Parameters
+        ----------
+        uid : int
+            Number of the episode.
+        time : float
+            Time in seconds.
+
+        Returns
+        -------
+        tuple or None
+            Start time in seconds and byte offset of the indexed frame, None if the episode has no index.
+
+        """
+        with self._lock:
+            row = self.create_connection().execute(
+                'SELECT start, byte_offset FROM segment WHERE uid = ? AND start <= ? ORDER BY start DESC LIMIT 1',
+                (uid, float(time))
+            ).fetchone()
+        return None if row is None else (row[0], row[1])
+
+    def open_audio(self, uid: int) -> memmap:
+        """
+        Maps the PCM data of the stored audio file of an episode into memory, without copying it. Only episodes stored
+        as '.wav' files can be opened.
+
+        Parameters
+        ----------
+        uid : int
+            Number of the episode.
+
+        Returns
+        -------
+        memmap
+            Read-only array of the samples with shape (frames, channels), sampled at the 'frame_rate' of the episode.
+
+        """
+        with self._lock:
+            row = self.create_connection().execute(
+                'SELECT file_path, frame_rate, frame_width, format FROM audio WHERE uid = ?', (uid,)
+            ).fetchone()
+        if row is None:
+            raise KeyError(f"No audio file stored for episode '{uid}'.")
+        file_path, frame_rate, frame_width, audio_format = row
+        if audio_format not in (None, 'wav'):
+            raise ValueError(f"Audio of episode '{uid}' is stored as '{audio_format}', only 'wav' can be mapped.")
+        from zeitsprung.audio import open_wav
+        samples = open_wav(file_path)
+        if samples.itemsize * samples.shape[1] != frame_width:
+            raise ValueError(f"Frame width of '{file_path}' does not match the 'audio' table.")
+        return samples
+
+    def open_features(self, uid: int) -> ndarray:
+        """
+        Maps the features extracted per window from the audio of an episode into memory.
+
+        Parameters
+        ----------
+        uid : int
+            Number of the episode.
+
+        Returns
+        -------
+        ndarray
+            Read-only structured array with the fields 'start', 'rms_db', 'spectral_centroid', 'spectral_bandwidth' and
+            'spectral_flatness' per window.
+
+        """
+        with self._lock:
+            row = self.create_connection().execute('SELECT file_path FROM features WHERE uid = ?', (uid,)).fetchone()
+        if row is None:
+            raise KeyError(f"No features extracted for episode '{uid}'.")
+        from numpy import load
+        return load(row[0], mmap_mode='r')
+
+    def iter_audio_windows(self, window_size: int, uids: Union[Iterable[int], None] = None,
+                           drop_last: bool = True) -> Iterator[Tuple[int, int, memmap]]:
+        """
+        Iterates over fixed-size windows of the stored audio of many episodes, e.g. for feature extraction. The windows
+        are views on the memory-mapped files, only the pages of the current window are read.
+
+        Parameters
+        ----------
+        window_size : int
+            Number of frames per window.
+        uids : iterable of int or None, default None
+            Numbers of the episodes, all episodes stored as '.wav' files if None.
+        drop_last : bool, default True
+            Skip the last window of an episode, if it is shorter than 'window_size'.
+
+        Returns
+        -------
+        Iterator[Tuple[int, int, memmap]]
+            The number of the episode, the index of the first frame and the samples of the window.
+
+        """
+        if uids is None:
+            with self._lock:
+                uids = [row[0] for row in self.create_connection().execute(
+                    "SELECT uid FROM audio WHERE format IS NULL OR format = 'wav' ORDER BY uid"
+                )]
+        for uid in uids:
+            samples = self.open_audio(uid)
+            end = len(samples) - window_size + 1 if drop_last else len(samples)
+            for start in range(0, max(end, 0), window_size):
+                yield uid, start, samples[start:start + window_size]
@@ -0,0 +1,181 @@
+from pandas import DataFrame, concat, read_parquet
+from pandas.util import hash_pandas_object
+from pathlib import Path
+from shutil import rmtree
+from typing import Union
+from zeitsprung.base import Base
+from zeitsprung.database import SQLiteEngine
+
+FILE_FORMATS = ('parquet', 'arrow')
+DATASETS = ('meta', 'audio', 'stats')
+CATEGORICAL_COLUMNS = ('format', 'weekday')
+
+
+class CatalogExporter(Base):
+    """Class to export the catalog of episodes from the database to columnar Parquet or Arrow IPC files."""
+
+    def __init__(self, db: SQLiteEngine, export_folder: Union[str, Path], file_format: str = 'parquet',
+                 verbose: bool = True) -> None:
+        """
+        Class constructor for the CatalogExporter class. Requires the optional 'pyarrow' package.
+
+        Parameters
+        ----------
+        db : SQLiteEngine
+            Database to export the 'meta' and 'audio' relations from.
+        export_folder : str or Path
+            Folder to write the datasets to, every dataset is partitioned by the year of publication, e.g.
+            'meta/year=2020/part.parquet'.
+        file_format : str, default 'parquet'
+            Format of the files, 'parquet' or 'arrow' (Arrow IPC files, which can be memory-mapped).
+        verbose : bool, default True
+            Print messages about the activities conducted by a class instance.
+
+        Returns
+        -------
+        None
+
+        """
+        super().__init__(verbose)
+        if file_format not in FILE_FORMATS:
+            raise ValueError(f"Unknown file format '{file_format}', use one of {', '.join(FILE_FORMATS)}.")
+        self.db = db
+        self.export_folder = Path(export_folder)
+        self.file_format = file_format
+        self.verbose = verbose
+
+    def __str__(self) -> str:
+        """
+        Print function of the class.
+
+        Returns
+        -------
+        str
+            A string, which describes the class instance.
+
+        """
+        return f"Catalog exporter writing {self.file_format} files to '{self.export_folder}'."
+
+    def export(self, full: bool = False) -> dict:
+        """
+        Exports the 'meta' and 'audio' relations and the derived per-episode statistics. Incremental exports only
+        rewrite the partitions containing episodes, which are new or whose row in the dataset changed, e.g. by a new
+        'modified_at' date or a replaced audio file. The rows are compared to the exported rows by a hash of all
+        columns.
+
+        Parameters
+        ----------
+        full : bool, default False
+            Remove the existing files and export all episodes.
+
+        Returns
+        -------
+        dict
+            Number of exported episodes per dataset.
+
+        """
+        meta = self.db.query_meta()
+        meta['year'] = meta['published_at'].dt.year
+        audio = self.db.query_audio().merge(meta[['uid', 'modified_at', 'year']], on='uid')
+        datasets = {'meta': meta, 'audio': audio, 'stats': self.episode_stats(meta, audio)}
+        return {name: self._export_dataset(name, df, full) for name, df in datasets.items()}
+
+    @staticmethod
+    def episode_stats(meta: DataFrame, audio: DataFrame) -> DataFrame:
+        """
+        Derives statistics per episode from the 'meta' and 'audio' relations.
+
+        Parameters
+        ----------
+        meta : DataFrame
+            The 'meta' relation.
+        audio : DataFrame
+            The 'audio' relation.
+
+        Returns
+        -------
+        DataFrame
+            Publication weekday and hour, days since the previous episode, length of title and description, duration,
+            file size and bit rate of the episodes.
+
+        """
+        stats = meta[['uid', 'year', 'published_at', 'modified_at']].sort_values('uid').copy()
+        stats['weekday'] = stats['published_at'].dt.day_name()
+        stats['hour'] = stats['published_at'].dt.hour
+        stats['days_since_previous'] = stats['published_at'].diff().dt.total_seconds() / (24 * 60 * 60)
+        stats['title_length'] = meta['title'].str.len()
+        stats['description_words'] = meta['description'].str.split().str.len()
+        stats = stats.merge(audio[['uid', 'duration', 'file_size']], on='uid', how='left')
+        stats['bitrate_kbps'] = stats['file_size'] * 8 / stats['duration'] / 1000
+        return stats
+
+    def load(self, dataset: str, columns: Union[list, None] = None) -> DataFrame:
+        """
+        Loads an exported dataset. Arrow IPC files are memory-mapped.
+
+        Parameters
+        ----------
+        dataset : str
+            Name of the dataset, 'meta', 'audio' or 'stats'.
+        columns : list or None, default None
+            Columns to load, all columns if None.
+
+        Returns
+        -------
+        DataFrame
+            The dataset with the partition column 'year'.
+
+        """
+        if dataset not in DATASETS:
+            raise ValueError(f"Unknown dataset '{dataset}', use one of {', '.join(DATASETS)}.")
+        parts = []
+        for file in sorted((self.export_folder / dataset).glob(f'year=*/part.{self.file_format}')):
+            part = self._read(file, columns)
+            part['year'] = int(file.parent.name.split('=')[1])
+            parts.append(part)
+        if not parts:
+            return DataFrame(columns=(columns or []) + ['year'])
+        return self._categorize(concat(parts, ignore_index=True))
+
+    def _export_dataset(self, name: str, df: DataFrame, full: bool) -> int:
+        folder = self.export_folder / name
+        if full and folder.exists():
+            rmtree(folder)
+        exported = self.load(name)
+        if not set(df.columns) <= set(exported.columns):
+            exported = df.iloc[:0]
+        digests = hash_pandas_object(df, index=False)
+        changed = df[~digests.isin(hash_pandas_object(exported[df.columns], index=False)).to_numpy()]
+        years = set(changed['year']) | set(exported.loc[exported['uid'].isin(changed['uid']), 'year'])
+        for year in sorted(years):
+            file = folder / f'year={year}' / f'part.{self.file_format}'
+            part = changed[changed['year'] == year].drop(columns='year')
+            if file.exists():
+                existing = self._read(file)
+                part = concat([existing[~existing['uid'].isin(changed['uid'])], part], ignore_index=True)
+            self._write(self._categorize(part.sort_values('uid').reset_index(drop=True)), file)
+        self._print(f"Exported {len(changed)} episodes to dataset '{name}' in {len(years)} partitions.")
+        return len(changed)
+
+    def _read(self, file: Path, columns: Union[list, None] = None) -> DataFrame:
+        if self.file_format == 'parquet':
+            return read_parquet(file, columns=columns)
+        from pyarrow.feather import read_table
+        return read_table(file, columns=columns, memory_map=True).to_pandas()
+
+    def _write(self, df: DataFrame, file: Path) -> None:
+        file.parent.mkdir(parents=True, exist_ok=True)
+        if df.empty:
+            if file.exists():
+                file.unlink()
+        elif self.file_format == 'parquet':
+            df.to_parquet(file, index=False)
+        else:
+            df.to_feather(file)
+
+    @staticmethod
+    def _categorize(df: DataFrame) -> DataFrame:
+        for column in CATEGORICAL_COLUMNS:
+            if column in df:
+                df[column] = df[column].astype('category')
+        return df
@@ -0,0 +1,212 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from logging import WARNING
+from multiprocessing import get_context
+from numpy import absolute, array, divide, empty, exp, flatnonzero, hanning, log, log10, maximum, ndarray, \
+    save, sqrt, zeros
+from numpy.fft import rfft, rfftfreq
+from pathlib import Path
+from typing import Iterable, List, Tuple, Union
+from zeitsprung.audio import load_samples, to_mono
+from zeitsprung.base import Base
+from zeitsprung.database import SQLiteEngine
+
+FEATURES = ('rms_db', 'spectral_centroid', 'spectral_bandwidth', 'spectral_flatness')
+FEATURE_DTYPE = [('start', '<f4')] + [(feature, '<f4') for feature in FEATURES]
+BLOCK_SIZE = 1024
+EPS = 1e-10
+
+
+def window_features(windows: ndarray, frame_rate: int) -> ndarray:
+    """
+    Computes the features of a block of windows at once.
+
+    Parameters
+    ----------
+    windows : ndarray
+        Mono samples scaled to [-1, 1] with shape (windows, frames per window).
+    frame_rate : int
+        Sample rate of the samples in Hz.
+
+    Returns
+    -------
+    ndarray
+        Array with shape (windows, 4) containing the RMS loudness in dBFS, the spectral centroid and bandwidth in Hz
+        and the spectral flatness of every window.
+
+    """
+    rms_db = 20 * log10(maximum(sqrt((windows ** 2).mean(axis=1)), EPS))
+    spectrum = absolute(rfft(windows * hanning(windows.shape[1]), axis=1))
+    frequencies = rfftfreq(windows.shape[1], 1 / frame_rate)
+    total = spectrum.sum(axis=1)
+    centroid = divide((spectrum * frequencies).sum(axis=1), total, out=zeros(len(total)), where=total > 0)
+    spread = (spectrum * (frequencies - centroid[:, None]) ** 2).sum(axis=1)
+    bandwidth = sqrt(divide(spread, total, out=zeros(len(total)), where=total > 0))
+    flatness = exp(log(spectrum + EPS).mean(axis=1)) / (spectrum.mean(axis=1) + EPS)
+    return array([rms_db, centroid, bandwidth, flatness]).T
+
+
+def silence_segments(rms_db: ndarray, window: float, threshold: float) -> List[Tuple[float, float]]:
+    """
+    Merges consecutive windows quieter than the threshold into silence segments.
+
+    Parameters
+    ----------
+    rms_db : ndarray
+        RMS loudness of the windows in dBFS.
+    window : float
+        Length of the windows in seconds.
+    threshold : float
+        Loudness in dBFS, below which a window is silent.
+
+    Returns
+    -------
+    list
+        Start and stop in seconds of the silence segments.
+
+    """
+    is_silent = zeros(len(rms_db) + 2, dtype=bool)
+    is_silent[1:-1] = rms_db < threshold
+    edges = flatnonzero(is_silent[1:] != is_silent[:-1])
+    return [(float(start * window), float(stop * window)) for start, stop in zip(edges[::2], edges[1::2])]
+
+
+def extract_features(file_name: Union[str, Path], target: Union[str, Path], window: float = 0.1,
+                     silence_threshold: float = -50.0) -> Tuple[list, List[Tuple[float, float]]]:
+    """
+    Extracts the features of an audio file per window of fixed length and saves them as structured NumPy array with
+    the fields 'start', 'rms_db', 'spectral_centroid', 'spectral_bandwidth' and 'spectral_flatness'. '.wav' files are
+    memory-mapped and processed in blocks of windows, other formats are decoded. An incomplete last window is dropped.
+    The function is self-contained, in order to be run in the processes of a process pool.
+
+    Parameters
+    ----------
+    file_name : str or Path
+        Path to the audio file.
+    target : str or Path
+        Path to the '.npy' file to write the features to.
+    window : float, default 0.1
+        Length of the windows in seconds.
+    silence_threshold : float, default -50.0
+        Loudness in dBFS, below which a window is silent.
+
+    Returns
+    -------
+    tuple
+        The summary of the episode (path of the features, window length, number of windows, mean loudness, mean
+        spectral centroid and total duration of silence) and the start and stop in seconds of the silence segments.
+
+    """
+    samples, frame_rate = load_samples(Path(file_name))
+    frames_per_window = max(1, round(window * frame_rate))
+    window = frames_per_window / frame_rate
+    n_windows = len(samples) // frames_per_window
+    features = empty(n_windows, dtype=FEATURE_DTYPE)
+    features['start'] = [i * window for i in range(n_windows)]
+    for start in range(0, n_windows, BLOCK_SIZE):
+        stop = min(start + BLOCK_SIZE, n_windows)
+        block = to_mono(samples[start * frames_per_window:stop * frames_per_window])
+        values = window_features(block.reshape(stop - start, frames_per_window), frame_rate)
+        for j, feature in enumerate(FEATURES):
+            features[feature][start:stop] = values[:, j]
+    save(target, features)
+    silences = silence_segments(features['rms_db'], window, silence_threshold)
+    summary = [str(target), window, n_windows,
+               float(features['rms_db'].mean()) if n_windows else None,
+               float(features['spectral_centroid'].mean()) if n_windows else None,
+               sum(stop - start for start, stop in silences)]
+    return summary, silences
+
+
+class FeatureExtractor(Base):
+    """Class to extract features from the stored audio files of the episodes in a pool of processes."""
+
+    def __init__(self, db: SQLiteEngine, feature_folder: Union[str, Path], window: float = 0.1,
+                 silence_threshold: float = -50.0, max_workers: Union[int, None] = None, verbose: bool = True) -> None:
+        """
+        Class constructor for the FeatureExtractor class.
+
+        Parameters
+        ----------
+        db : SQLiteEngine
+            Database with the 'audio' relation of the episodes, the results are written to the 'features' and
+            'silence' relations.
+        feature_folder : str or Path
+            Folder to write the '.npy' files with the features per window to.
+        window : float, default 0.1
+            Length of the windows in seconds.
+        silence_threshold : float, default -50.0
+            Loudness in dBFS, below which a window is silent.
+        max_workers : int or None, default None
+            Number of processes extracting features, defaults to the number of CPUs.
+        verbose : bool, default True
+            Print messages about the activities conducted by a class instance.
+
+        Returns
+        -------
+        None
+
+        """
+        super().__init__(verbose)
+        self.db = db
+        self.feature_folder = Path(feature_folder)
+        self.window = window
+        self.silence_threshold = silence_threshold
+        self.max_workers = max_workers
+        self.verbose = verbose
+
+    def __str__(self) -> str:
+        """
+        Print function of the class.
+
+        Returns
+        -------
+        str
+            A string, which describes the class instance.
+
+        """
+        return f"Feature extractor writing windows of {self.window} seconds to '{self.feature_folder}'."
+
+    def extract(self, uids: Union[Iterable[int], None] = None, overwrite: bool = False) -> int:
+        """
+        Extracts the features of the episodes in a pool of processes. The results are written to the database by the
+        calling thread as soon as an episode is finished.
+
+        Parameters
+        ----------
+        uids : iterable of int or None, default None
+            Numbers of the episodes, all episodes with audio files if None.
+        overwrite : bool, default False
+            Extract the features of episodes again, which already have features.
+
+        Returns
+        -------
+        int
+            Number of processed episodes.
+
+        """
+        audio = self.db.query_audio(columns=['uid', 'file_path'], uids=uids)
+        if not overwrite:
+            audio = audio[~audio['uid'].isin(self.db.query_features(columns=['uid'])['uid'])]
+        self.feature_folder.mkdir(parents=True, exist_ok=True)
+        self._print(f"Extracting features of {len(audio)} episodes.")
+        n_done = 0
+        with ProcessPoolExecutor(self.max_workers, mp_context=get_context('spawn')) as pool:
+            futures = {
+                pool.submit(extract_features, file_path, self.feature_folder / f'{uid:03d}.npy', self.window,
+                            self.silence_threshold): uid
+                for uid, file_path in zip(audio['uid'].tolist(), audio['file_path'])
+            }
+            for future in as_completed(futures):
+                uid = futures[future]
+                try:
+                    summary, silences = future.result()
+                except Exception as e:
+                    self._print(f"Failed to extract the features of episode {uid}: {e!r}", WARNING, uid=uid,
+                                error=repr(e))
+                    continue
+                with self.db.transaction():
+                    self.db.insert_feature_rows([[uid] + summary])
+                    self.db.insert_silences(uid, silences)
+                n_done += 1
+        self._print(f"Extracted features of {n_done} episodes.")
+        return n_done
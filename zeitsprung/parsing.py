@@ -0,0 +1,222 @@
+from bs4 import BeautifulSoup, SoupStrainer
+from calendar import monthrange
+from datetime import datetime, timedelta, timezone
+from json import loads
+import re
+from typing import Any, Callable, Dict, Iterable, List, Tuple, Union
+from xml.etree.ElementTree import fromstring
+
+EPISODE_TAGS = SoupStrainer(['script', 'title', 'meta', 'ul'])
+W3C_DATETIME = re.compile(r'(\d{4})(?:-(\d{2})(?:-(\d{2})(?:T(\d{2}):(\d{2})(?::(\d{2})(?:\.(\d+))?)?'
+                          r'(Z|[+-]\d{2}:\d{2}))?)?)?')
+
+
+def search_key(key: str, dict_obj: Iterable[dict]) -> Any:
+    """
+    Looks up a key in the entries of a JSON-LD '@graph', as embedded in the episode pages.
+
+    Parameters
+    ----------
+    key : str
+        The key to look up, e.g. 'datePublished'.
+    dict_obj : iterable of dict
+        The entries of the graph.
+
+    Returns
+    -------
+    Any
+        The value of the first entry containing the key, None if no entry contains it.
+
+    """
+    for entry in dict_obj:
+        if key in entry:
+            return entry[key]
+
+
+def _to_fields(script: str, title: str, description: str, url: str, url_audio: Union[str, None]) -> list:
+    graph = loads(script)['@graph']
+    title = title.split(":")
+    return [
+        datetime.fromisoformat(search_key('datePublished', graph)),
+        datetime.fromisoformat(search_key('dateModified', graph)),
+        title[0],
+        title[1][1:],
+        description,
+        url,
+        url_audio
+    ]
+
+
+def _soup_fields(soup: BeautifulSoup) -> list:
+    download_list = soup.find("ul", {"class": "episode_download_list"})
+    return _to_fields(
+        soup.find("script").contents[0],
+        soup.find('title').get_text(strip=True),
+        soup.find("meta", {"property": "og:description"}).get('content'),
+        soup.find("meta", {"property": "og:url"}).get('content'),
+        None if download_list is None else download_list.find_all('a')[0].get('href')
+    )
+
+
+def parse_episode_soup(content: bytes) -> list:
+    """
+    Extracts the meta data of an episode from the full tree of the page built by BeautifulSoup's 'html.parser'.
+
+    Parameters
+    ----------
+    content : bytes
+        HTML document of the episode page.
+
+    Returns
+    -------
+    list
+        Publication and modification date, abbreviation, title, description, episode URL and audio URL.
+
+    """
+    return _soup_fields(BeautifulSoup(content, 'html.parser'))
+
+
+def parse_episode_strainer(content: bytes) -> list:
+    """
+    Extracts the meta data of an episode using BeautifulSoup's 'html.parser', but only builds the tree of the
+    'script', 'title', 'meta' and 'ul' tags.
+
+    Parameters
+    ----------
+    content : bytes
+        HTML document of the episode page.
+
+    Returns
+    -------
+    list
+        Publication and modification date, abbreviation, title, description, episode URL and audio URL.
+
+    """
+    return _soup_fields(BeautifulSoup(content, 'html.parser', parse_only=EPISODE_TAGS))
+
+
+def parse_episode_lxml(content: bytes) -> list:
+    """
+    Extracts the meta data of an episode with targeted XPath queries on a tree built by 'lxml'.
+    Requires the optional 'lxml' package.
+
+    Parameters
+    ----------
+    content : bytes
+        HTML document of the episode page.
+
+    Returns
+    -------
+    list
+        Publication and modification date, abbreviation, title, description, episode URL and audio URL.
+
+    """
+    from lxml.html import fromstring
+    doc = fromstring(content)
+    download_link = doc.xpath(
+        "((//ul[contains(concat(' ', normalize-space(@class), ' '), ' episode_download_list ')])[1]//a)[1]/@href"
+    )
+    return _to_fields(
+        doc.xpath('(//script)[1]')[0].text,
+        doc.xpath('(//title)[1]')[0].text_content().strip(),
+        str(doc.xpath('(//meta[@property="og:description"])[1]/@content')[0]),
+        str(doc.xpath('(//meta[@property="og:url"])[1]/@content')[0]),
+        str(download_link[0]) if download_link else None
+    )
+
+
+def parse_lastmod(value: str) -> datetime:
+    """
+    Parses a W3C datetime as used in the 'lastmod' tags of sitemaps. Years, months and days without time are taken as
+    the end of the period and dates without timezone as UTC, so a modification is never missed.
+
+    Parameters
+    ----------
+    value : str
+        The date, e.g. '2020', '2020-09', '2020-09-01', '2020-09-01T10:00Z' or '2020-09-01T10:00:00.5+02:00'.
+
+    Returns
+    -------
+    datetime
+        The timezone-aware date.
+
+    Raises
+    ------
+    ValueError
+        If the value is no valid W3C datetime.
+
+    """
+    match = W3C_DATETIME.fullmatch(value.strip())
+    if match is None:
+        raise ValueError(f"Invalid W3C datetime: {value!r}")
+    year, month, day, hour, minute, second, fraction, tz = match.groups()
+    if month is None:
+        return datetime(int(year), 12, 31, 23, 59, 59, 999999, timezone.utc)
+    if day is None:
+        return datetime(int(year), int(month), monthrange(int(year), int(month))[1], 23, 59, 59, 999999, timezone.utc)
+    if hour is None:
+        return datetime(int(year), int(month), int(day), 23, 59, 59, 999999, timezone.utc)
+    if tz == 'Z':
+        tzinfo = timezone.utc
+    else:
+        offset = timedelta(hours=int(tz[1:3]), minutes=int(tz[4:6]))
+        tzinfo = timezone(-offset if tz[0] == '-' else offset)
+    return datetime(int(year), int(month), int(day), int(hour), int(minute), int(second or 0),
+                    int((fraction or '0')[:6].ljust(6, '0')), tzinfo)
+
+
+def parse_sitemap(content: bytes) -> Tuple[List[str], Dict[str, str]]:
+    """
+    Extracts the nested sitemaps and the modification dates of the pages from a sitemap or sitemap index.
+
+    Parameters
+    ----------
+    content : bytes
+        XML document of the sitemap.
+
+    Returns
+    -------
+    tuple
+        The URLs of the nested sitemaps and a dict mapping the URLs of the pages to their unparsed 'lastmod' dates,
+        which can be parsed with 'parse_lastmod', pages without date are skipped.
+
+    """
+    sitemaps, lastmod = [], {}
+    for entry in fromstring(content):
+        fields = {child.tag.rsplit('}', 1)[-1]: (child.text or '').strip() for child in entry}
+        tag = entry.tag.rsplit('}', 1)[-1]
+        if tag == 'sitemap' and fields.get('loc'):
+            sitemaps.append(fields['loc'])
+        elif tag == 'url' and fields.get('loc') and fields.get('lastmod'):
+            lastmod[fields['loc']] = fields['lastmod']
+    return sitemaps, lastmod
+
+
+PARSERS = {
+    'soup': parse_episode_soup,
+    'strainer': parse_episode_strainer,
+    'lxml': parse_episode_lxml
+}
+
+
+def get_parser(parser: Union[str, Callable[[bytes], list]]) -> Callable[[bytes], list]:
+    """
+    Resolves the parser backend used to extract the meta data from episode pages.
+
+    Parameters
+    ----------
+    parser : str or callable
+        Name of a built-in parser ('soup', 'strainer' or 'lxml') or a custom callable, which takes the HTML document
+        and returns the same fields as the built-in parsers.
+
+    Returns
+    -------
+    callable
+        The parser function.
+
+    """
+    if callable(parser):
+        return parser
+    if parser not in PARSERS:
+        raise ValueError(f"Unknown parser '{parser}', use one of {', '.join(PARSERS)}.")
+    return PARSERS[parser]
@@ -0,0 +1,551 @@
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from hashlib import sha256
+from logging import WARNING
+from multiprocessing import get_context
+from pathlib import Path
+from time import perf_counter
+from typing import Callable, Tuple, Union
+from urllib.parse import urlsplit
+from zeitsprung.audio import audio_info, transcode
+from zeitsprung.base import Base
+from zeitsprung.clips import segment_index
+from zeitsprung.client import content_range
+from zeitsprung.database import SQLiteEngine
+from zeitsprung.records import AudioInfo, Episode
+from zeitsprung.storage import AudioStore
+
+
+class AudioDownload(Base):
+    """
+    Class to keep track of a streamed audio download, independent of the HTTP client sending the request. The bytes are
+    hashed on the fly and written to a '.part' file, whose ETag is saved next to it, so a download broken off in an
+    earlier run can be resumed.
+    """
+
+    def __init__(self, store: AudioStore, url: str, file_name: Union[str, Path], variant: str,
+                 chunk_size: int = 1024*1024, verbose: bool = True) -> None:
+        """
+        Class constructor for the AudioDownload class. Looks up earlier downloads from the URL in the audio store and
+        the beginning of the file left by an earlier run, to build the headers of a conditional or resumed request.
+
+        Parameters
+        ----------
+        store : AudioStore
+            Audio store to look up and record the downloads in.
+        url : str
+            URL to download the audio from.
+        file_name : str or Path
+            File name with path, where the downloaded file should be saved to.
+        variant : str
+            Format, sample rate and channels of the stored audio files, as '<format>/<frame rate>/<channels>'.
+        chunk_size : int, default 1024*1024
+            Number of bytes read at once, when the beginning of the file is hashed again.
+        verbose : bool, default True
+            Print messages about the activities conducted by a class instance.
+
+        Returns
+        -------
+        None
+
+        """
+        super().__init__(verbose)
+        self.store = store
+        self.url = url
+        self.file_name = Path(file_name)
+        self.chunk_size = chunk_size
+        self.known = store.lookup(url, variant)
+        self.etag = None
+        self.offset, self.size = 0, None
+        self._etag_file = self.file_name.with_name(f'{self.file_name.name}.etag')
+        self.headers = {'If-None-Match': self.known[0]} if self.known is not None and self.known[0] is not None else {}
+        if self._etag_file.exists() and self.file_name.exists() and self.file_name.stat().st_size > 0:
+            self.headers.update({'Range': f'bytes={self.file_name.stat().st_size}-',
+                                 'If-Range': self._etag_file.read_text()})
+        self._digest = sha256()
+        self._file = None
+        self._start = perf_counter()
+
+    def is_unchanged(self, status: int, headers) -> bool:
+        """
+        Reads the ETag, size and offset of the response and checks, whether the audio file did not change since it was
+        downloaded and stored, so the download can be skipped.
+
+        Parameters
+        ----------
+        status : int
+            Status code of the response.
+        headers : Mapping
+            Headers of the response.
+
+        Returns
+        -------
+        bool
+            True if the download can be skipped.
+
+        """
+        self.etag = headers.get('ETag')
+        if status == 206:
+            self.offset, self.size = content_range(headers)
+        elif headers.get('Content-Length') is not None:
+            self.size = int(headers['Content-Length'])
+        if self.known is None or not (status == 304 or self._matches(*self.known)):
+            return False
+        self._print(f"Audio file at {self.url} did not change, skipping the download.")
+        self.metrics.inc('downloads_skipped')
+        return True
+
+    def _matches(self, etag: Union[str, None], size: Union[int, None]) -> bool:
+        if etag is not None and self.etag is not None:
+            return etag == self.etag
+        return size is not None and size == self.size
+
+    def open(self) -> None:
+        """
+        Opens the file to write the response to. A resumed download is appended to the file, after hashing its
+        beginning, a new download saves the ETag of the response next to the file.
+
+        Returns
+        -------
+        None
+
+        """
+        self._print(f"Resuming the download of {self.url} at byte {self.offset}." if self.offset else
+                    f"Downloading audio file from {self.url}")
+        if self.offset:
+            with open(self.file_name, 'rb') as f:
+                for block in iter(partial(f.read, self.chunk_size), b''):
+                    self._digest.update(block)
+        elif self.etag is not None and not self.etag.startswith('W/'):
+            self._etag_file.write_text(self.etag)
+        elif self._etag_file.exists():
+            self._etag_file.unlink()
+        self._file = open(self.file_name, 'ab' if self.offset else 'wb')
+
+    def write(self, chunk: bytes) -> None:
+        """
+        Hashes a chunk of the response and writes it to the file.
+
+        Parameters
+        ----------
+        chunk : bytes
+            The chunk of the response.
+
+        Returns
+        -------
+        None
+
+        """
+        self._digest.update(chunk)
+        self._file.write(chunk)
+        self.metrics.inc('bytes_downloaded', len(chunk))
+
+    def close(self) -> None:
+        """
+        Closes the file, also if the download was broken off.
+
+        Returns
+        -------
+        None
+
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def finish(self) -> Path:
+        """
+        Completes the download: removes the saved ETag and records the digest of the file in the audio store.
+
+        Returns
+        -------
+        Path
+            Path to the downloaded file.
+
+        """
+        self.metrics.observe('download', perf_counter() - self._start)
+        if self._etag_file.exists():
+            self._etag_file.unlink()
+        self.store.record_source(self.url, self.etag, self.size, self._digest.hexdigest())
+        return self.file_name
+
+
+class EpisodePipeline(Base):
+    """
+    Class with the steps of processing an episode, shared by the Scraper and the AsyncScraper, which only send the
+    requests and schedule the steps: downloads, transcoding and storage of the audio files, the segment index, the
+    progress in the 'job' relation and writing the finished episodes in order.
+    """
+
+    def __init__(self, db: SQLiteEngine, store: AudioStore, audio_folder: Union[str, Path], audio_format: str = 'wav',
+                 frame_rate: Union[int, None] = None, channels: Union[int, None] = None,
+                 transcode_workers: Union[int, None] = None, chunk_size: int = 1024*1024, lookahead: int = 2,
+                 verbose: bool = True) -> None:
+        """
+        Class constructor for the EpisodePipeline class.
+
+        Parameters
+        ----------
+        db : SQLiteEngine
+            Database to record the jobs and write the episodes to.
+        store : AudioStore
+            Audio store to keep the audio files in.
+        audio_folder : str or Path
+            Folder to download and transcode the audio files in.
+        audio_format : str, default 'wav'
+            Format of the stored audio files, see 'zeitsprung.audio.FORMATS'.
+        frame_rate : int or None, default None
+            Sample rate in Hz of the stored audio files, the original rate is kept if None.
+        channels : int or None, default None
+            Number of channels of the stored audio files, the original channels are kept if None.
+        transcode_workers : int or None, default None
+            Number of processes transcoding the downloaded audio files, defaults to the number of CPUs.
+        chunk_size : int, default 1024*1024
+            Size in bytes of the chunks, in which audio files are streamed to disk.
+        lookahead : int, default 2
+            Number of episodes probed after the next unpublished episode, in case the numbering skips an episode.
+        verbose : bool, default True
+            Print messages about the activities conducted by a class instance.
+
+        Returns
+        -------
+        None
+
+        """
+        super().__init__(verbose)
+        self.db = db
+        self.store = store
+        self.audio_folder = Path(audio_folder)
+        self.audio_format = audio_format
+        self.frame_rate = frame_rate
+        self.channels = channels
+        self.transcode_workers = transcode_workers
+        self.chunk_size = chunk_size
+        self.lookahead = lookahead
+        self.variant = f'{audio_format}/{frame_rate}/{channels}'
+        self.current_episode = db.query_last_episode_id()
+        self._transcoder = None
+
+    def parse(self, i: int, content: bytes, parser: Callable[[bytes], list]) -> Episode:
+        """
+        Parses the page of an episode, the time is recorded in the 'parse' histogram of the metrics.
+
+        Parameters
+        ----------
+        i : int
+            Number of the episode.
+        content : bytes
+            HTML document of the episode page.
+        parser : callable
+            Parser backend, see 'zeitsprung.parsing.get_parser'.
+
+        Returns
+        -------
+        Episode
+            The meta data of the episode.
+
+        """
+        with self.metrics.timer('parse'):
+            return Episode(i, *parser(content))
+
+    def download(self, url: str, file_name: Union[str, Path]) -> AudioDownload:
+        """
+        Prepares the download of an audio file, see 'AudioDownload'.
+
+        Parameters
+        ----------
+        url : str
+            URL to download the audio from.
+        file_name : str or Path
+            File name with path, where the downloaded file should be saved to.
+
+        Returns
+        -------
+        AudioDownload
+            The download, whose 'headers' are to be sent with the request.
+
+        """
+        download = AudioDownload(self.store, url, file_name, self.variant, self.chunk_size, verbose=self.verbose)
+        download.metrics = self.metrics
+        return download
+
+    def start_transcoder(self) -> bool:
+        """
+        Starts the process pool of 'transcode_workers' processes, which transcodes the audio files, unless it is
+        already running.
+
+        Returns
+        -------
+        bool
+            True if the pool was started by this call and has to be stopped by the caller.
+
+        """
+        if self._transcoder is not None:
+            return False
+        self._transcoder = ProcessPoolExecutor(self.transcode_workers, mp_context=get_context('spawn'))
+        return True
+
+    def stop_transcoder(self) -> None:
+        """
+        Stops the process pool transcoding the audio files, after the running jobs are done.
+
+        Returns
+        -------
+        None
+
+        """
+        transcoder, self._transcoder = self._transcoder, None
+        if transcoder is not None:
+            transcoder.shutdown()
+
+    def transcode(self, source: Union[str, Path], target: Union[str, Path]) -> list:
+        """
+        Transcodes a downloaded audio file into the configured format, sample rate and channels, in the process pool
+        if it is running, otherwise in the calling thread.
+
+        Parameters
+        ----------
+        source : str or Path
+            Path to the downloaded audio file.
+        target : str or Path
+            Path to write the transcoded file to.
+
+        Returns
+        -------
+        list
+            Duration in seconds, frame rate, frame width, number of channels, format and size in bytes of the output.
+
+        """
+        self._print(f"Transcoding audio file '{source}' to '{target}'")
+        args = (source, target, self.audio_format, self.frame_rate, self.channels)
+        with self.metrics.timer('transcode'):
+            if self._transcoder is None:
+                return transcode(*args)
+            return self._transcoder.submit(transcode, *args).result()
+
+    def begin(self, i: int) -> Union[str, None]:
+        """
+        Registers a new attempt to process an episode, see 'SQLiteEngine.begin_job', and counts it as retry if an
+        earlier attempt did not finish.
+
+        Parameters
+        ----------
+        i : int
+            Number of the episode.
+
+        Returns
+        -------
+        str or None
+            The stage reached by the previous attempts, None if the episode is processed from the start.
+
+        """
+        stage = self.db.begin_job(i)
+        if stage is not None:
+            self.metrics.inc('retries')
+        return stage
+
+    def audio_paths(self, i: int, url: str, stage: Union[str, None] = None) -> Tuple[Path, Path, Union[str, None]]:
+        """
+        Builds the paths of the downloaded and the transcoded audio file of an episode and checks, which of the stages
+        reached by previous attempts can be skipped, because their files still exist.
+
+        Parameters
+        ----------
+        i : int
+            Number of the episode.
+        url : str
+            URL of the audio file.
+        stage : str or None, default None
+            The stage reached by the previous attempts, see 'begin'.
+
+        Returns
+        -------
+        tuple
+            Path of the download, path of the transcoded file and the stage to continue after: 'transcoded' (only store
+            the file), 'downloaded' (transcode and store the file) or None (download the file first).
+
+        """
+        suffix = Path(urlsplit(url).path).suffix or '.mp3'
+        source = self.audio_folder / f'{str(i).zfill(3)}.part{suffix}'
+        target = self.audio_folder / f'{str(i).zfill(3)}.{self.audio_format}'
+        if stage == 'transcoded' and target.exists():
+            return source, target, stage
+        if stage == 'downloaded' and source.exists():
+            return source, target, stage
+        return source, target, None
+
+    def store_audio(self, i: int, url: str, source: Path, target: Path, transcoded: bool = False,
+                    transcoder: Union[Callable[[Path, Path], list], None] = None) -> AudioInfo:
+        """
+        Transcodes a downloaded audio file and stores it in the audio store. If the same download was transcoded to the
+        same variant before, the stored file is reused.
+
+        Parameters
+        ----------
+        i : int
+            Number of the episode.
+        url : str
+            URL of the audio file.
+        source : Path
+            Path of the downloaded file.
+        target : Path
+            Path to write the transcoded file to.
+        transcoded : bool, default False
+            The target was already transcoded by an earlier attempt, only store it.
+        transcoder : callable or None, default None
+            Function transcoding the source into the target, 'transcode' if None.
+
+        Returns
+        -------
+        AudioInfo
+            The 'audio' row of the episode.
+
+        """
+        if transcoded:
+            digest, blob = self.store.put(target)
+            return AudioInfo(i, blob, *audio_info(blob), digest)
+        source_digest = self.store.source_digest(url)
+        blob = self.store.find(source_digest, self.variant)
+        if blob is not None:
+            self._print(f"Reusing stored audio file '{blob}' for episode {i}.")
+            if source.exists():
+                source.unlink()
+            info, digest = audio_info(blob), blob.stem
+        else:
+            is_moved = source.suffix.lower() == target.suffix and self.frame_rate is None and self.channels is None
+            info = (transcoder or self.transcode)(source, target)
+            digest, blob = self.store.put(target, source_digest, self.variant,
+                                          digest=source_digest if is_moved else None)
+        self.db.advance_jobs([i], 'transcoded')
+        return AudioInfo(i, blob, *info, digest)
+
+    def audio_failed(self, episode: Episode, error: Exception) -> Tuple[Episode, None, None]:
+        """
+        Records the error of fetching the audio of an episode, which is stored without 'audio' row to be retried.
+
+        Parameters
+        ----------
+        episode : Episode
+            The meta data of the episode.
+        error : Exception
+            The error.
+
+        Returns
+        -------
+        tuple
+            The meta data of the episode without audio file and segment index.
+
+        """
+        self._print(f"Failed to fetch the audio of episode {episode.uid}: {error!r}", WARNING, uid=episode.uid,
+                    error=repr(error))
+        self.metrics.inc('episodes_failed')
+        self.db.fail_job(episode.uid, repr(error))
+        return episode, None, None
+
+    def index(self, i: int, file_path: Path) -> Union[list, None]:
+        """
+        Builds the segment index of a stored audio file. Failures are logged, the index is then built by
+        'ClipExtractor' when it is needed.
+
+        Parameters
+        ----------
+        i : int
+            Number of the episode.
+        file_path : Path
+            Path of the stored audio file.
+
+        Returns
+        -------
+        list or None
+            The segment index, None if building it failed.
+
+        """
+        try:
+            with self.metrics.timer('index'):
+                return segment_index(file_path)
+        except Exception as e:
+            self._print(f"Failed to index the audio of episode {i}, it is indexed when clips are extracted: {e!r}",
+                        WARNING, uid=i, error=repr(e))
+            return None
+
+    def accept(self, i: int, result: Union[tuple, Exception, None], batch: list, stop_unpublished: bool,
+               on_unpublished: Union[Callable[[int], None], None] = None) -> bool:
+        """
+        Handles the result of fetching an episode, in order of the episodes. The rows of a fetched episode are added to
+        the batch, an episode failing after all retries is recorded in the 'job' relation with a new attempt.
+
+        Parameters
+        ----------
+        i : int
+            Number of the episode.
+        result : tuple, Exception or None
+            The rows of the episode, the raised error or None if the episode is not yet published.
+        batch : list
+            Rows of the episodes to write next.
+        stop_unpublished : bool
+            Stop at an unpublished or failing episode.
+        on_unpublished : callable or None, default None
+            Called with the number of an unpublished episode, if the processing does not stop.
+
+        Returns
+        -------
+        bool
+            False if the processing stops.
+
+        """
+        if isinstance(result, Exception):
+            self._print(f"Failed to fetch episode {i}: {result!r}", WARNING, uid=i, error=repr(result))
+            self.metrics.inc('episodes_failed')
+            self.db.fail_job(i, repr(result), new_attempt=True)
+        elif result is not None:
+            batch.append(result)
+            return True
+        elif on_unpublished is not None and not stop_unpublished:
+            on_unpublished(i)
+        return not stop_unpublished
+
+    def write(self, batch: list, written: Union[list, None] = None) -> int:
+        """
+        Writes the rows of fetched episodes to the database in one transaction and marks them as indexed.
+
+        Parameters
+        ----------
+        batch : list
+            Meta data, audio file and segment index of the episodes.
+        written : list or None, default None
+            List to append the numbers of the written episodes to.
+
+        Returns
+        -------
+        int
+            Number of written episodes.
+
+        """
+        if not batch:
+            return 0
+        with self.db.transaction():
+            self.db.insert_meta_rows(episode for episode, _, _ in batch)
+            self.db.insert_audio_rows(audio for _, audio, _ in batch if audio is not None)
+            for episode, audio, segments in batch:
+                if audio is not None:
+                    self.db.insert_segments(episode.uid, segments or [])
+            self.db.advance_jobs((episode.uid for episode, audio, _ in batch
+                                  if audio is not None or episode.url_audio is None), 'indexed')
+        self.current_episode = max(self.current_episode, batch[-1][0].uid)
+        self.metrics.inc('episodes', len(batch))
+        if written is not None:
+            written.extend(episode.uid for episode, _, _ in batch)
+        return len(batch)
+
+    def lookahead_uids(self) -> range:
+        """
+        Numbers of the episodes to probe after the next unpublished episode, in case the numbering skips an episode.
+
+        Returns
+        -------
+        range
+            The numbers of the episodes.
+
+        """
+        return range(self.current_episode + 2, self.current_episode + 2 + self.lookahead)
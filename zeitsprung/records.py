@@ -0,0 +1,222 @@
+from __future__ import annotations
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Union
+
+
+class Record:
+    """
+    Base class for the records of the episodes, fixed sets of fields stored in '__slots__' instead of a dict. Records
+    are read-only, so they can be shared by the catalog cache of the database engine.
+    """
+
+    __slots__ = ()
+
+    def _set_fields(self, *values: Any) -> None:
+        for field, value in zip(self.__slots__, values):
+            object.__setattr__(self, field, value)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        """
+        Prevents changing the fields of the record after its creation.
+
+        Parameters
+        ----------
+        name : str
+            Name of the field.
+        value : Any
+            New value of the field.
+
+        Returns
+        -------
+        None
+
+        """
+        raise AttributeError(f"{type(self).__name__} records are read-only, create a new record instead.")
+
+    def __delattr__(self, name: str) -> None:
+        """
+        Prevents deleting the fields of the record.
+
+        Parameters
+        ----------
+        name : str
+            Name of the field.
+
+        Returns
+        -------
+        None
+
+        """
+        raise AttributeError(f"{type(self).__name__} records are read-only, create a new record instead.")
+
+    def __iter__(self) -> Iterator[Any]:
+        """
+        Iterates over the values of the fields, in the order of the columns of the relation.
+
+        Returns
+        -------
+        Iterator[Any]
+
+        """
+        return (getattr(self, field) for field in self.__slots__)
+
+    def __eq__(self, other: Any) -> bool:
+        """
+        Compares the record with another object.
+
+        Parameters
+        ----------
+        other : Any
+            Object to compare with.
+
+        Returns
+        -------
+        bool
+            True if the other object is a record of the same type with equal values of all fields.
+
+        """
+        return type(self) is type(other) and tuple(self) == tuple(other)
+
+    def __hash__(self) -> int:
+        """
+        Hashes the values of the fields, consistently with '__eq__'.
+
+        Returns
+        -------
+        int
+            The hash of the record.
+
+        """
+        return hash((type(self), tuple(self)))
+
+    def __reduce__(self) -> tuple:
+        """
+        Pickles the record by its constructor arguments, as the fields cannot be set after its creation.
+
+        Returns
+        -------
+        tuple
+            The type and the values of the fields.
+
+        """
+        return type(self), tuple(self)
+
+    def __repr__(self) -> str:
+        fields = ', '.join(f'{field}={getattr(self, field)!r}' for field in self.__slots__)
+        return f'{type(self).__name__}({fields})'
+
+    @classmethod
+    def from_row(cls, row: Iterable[Any]) -> Record:
+        """
+        Creates a record from a row, e.g. as returned by the database.
+
+        Parameters
+        ----------
+        row : iterable
+            Values of the fields, in the order of the columns of the relation.
+
+        Returns
+        -------
+        Record
+            The record.
+
+        """
+        return cls(*row)
+
+    def to_dict(self) -> dict:
+        """
+        Converts the record into a dictionary.
+
+        Returns
+        -------
+        dict
+            The fields and their values.
+
+        """
+        return {field: getattr(self, field) for field in self.__slots__}
+
+
+class Episode(Record):
+    """Meta data of an episode, a row of the 'meta' relation."""
+
+    __slots__ = ('uid', 'published_at', 'modified_at', 'abbreviation', 'title', 'description', 'url_episode',
+                 'url_audio')
+
+    def __init__(self, uid: int, published_at: Union[datetime, str], modified_at: Union[datetime, str],
+                 abbreviation: str, title: str, description: str, url_episode: str,
+                 url_audio: Union[str, None]) -> None:
+        """
+        Class constructor for the Episode class. Dates given as ISO strings, as stored in the database, are parsed.
+
+        Parameters
+        ----------
+        uid : int
+            Number of the episode.
+        published_at : datetime or str
+            Date of the publication.
+        modified_at : datetime or str
+            Date of the last modification.
+        abbreviation : str
+            Abbreviation of the episode, e.g. 'ZS1'.
+        title : str
+            Title of the episode.
+        description : str
+            Description of the episode.
+        url_episode : str
+            URL of the episode page.
+        url_audio : str or None
+            URL of the audio file, None if no audio file is available.
+
+        Returns
+        -------
+        None
+
+        """
+        self._set_fields(
+            uid,
+            datetime.fromisoformat(published_at) if isinstance(published_at, str) else published_at,
+            datetime.fromisoformat(modified_at) if isinstance(modified_at, str) else modified_at,
+            abbreviation, title, description, url_episode, url_audio
+        )
+
+
+class AudioInfo(Record):
+    """Stored audio file of an episode, a row of the 'audio' relation."""
+
+    __slots__ = ('uid', 'file_path', 'duration', 'frame_rate', 'frame_width', 'channels', 'format', 'file_size',
+                 'sha256')
+
+    def __init__(self, uid: int, file_path: Union[str, Path], duration: int, frame_rate: int, frame_width: int,
+                 channels: Union[int, None], format: Union[str, None], file_size: Union[int, None],
+                 sha256: Union[str, None]) -> None:
+        """
+        Class constructor for the AudioInfo class.
+
+        Parameters
+        ----------
+        uid : int
+            Number of the episode.
+        file_path : str or Path
+            Path to the audio file.
+        duration : int
+            Duration in seconds.
+        frame_rate : int
+            Sample rate in Hz.
+        frame_width : int
+            Number of bytes per frame.
+        channels : int or None
+            Number of channels.
+        format : str or None
+            Format of the audio file, e.g. 'wav'.
+        file_size : int or None
+            Size of the file in bytes.
+        sha256 : str or None
+            SHA-256 digest of the file content.
+
+        Returns
+        -------
+        None
+
+        """
+        self._set_fields(uid, file_path, duration, frame_rate, frame_width, channels, format, file_size, sha256)
@@ -0,0 +1,212 @@
+from asyncio import Event as AsyncEvent, TimeoutError as AsyncTimeoutError, get_running_loop, wait_for
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from threading import Event, Lock
+from typing import Iterable, Union
+from zeitsprung.base import Base
+
+
+class PollingScheduler(Base):
+    """Class to schedule the polling for new episodes based on the publication history of the podcast."""
+
+    def __init__(self, min_interval: float = 15*60, max_interval: float = 24*60*60, window: float = 3*60*60,
+                 history: int = 50, min_share: float = 0.1, verbose: bool = True) -> None:
+        """
+        Class constructor for the PollingScheduler class.
+
+        Parameters
+        ----------
+        min_interval : float, default 15*60
+            Interval in seconds between polls around expected release times.
+        max_interval : float, default 24*60*60
+            Maximum interval in seconds between polls, also used if no release times are known.
+        window : float, default 3*60*60
+            Duration in seconds after the start of an expected release hour, in which is polled every 'min_interval'.
+        history : int, default 50
+            Number of most recent episodes to learn the release times from.
+        min_share : float, default 0.1
+            Minimum share of the recent episodes published in an hour of the week, to expect a release in this hour.
+        verbose : bool, default True
+            Print messages about the activities conducted by a class instance.
+
+        Returns
+        -------
+        None
+
+        """
+        super().__init__(verbose)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.window = window
+        self.history = history
+        self.min_share = min_share
+        self.release_hours = []
+        self.verbose = verbose
+        self._cancelled = Event()
+        self._async_waiters = set()
+        self._lock = Lock()
+
+    def __str__(self) -> str:
+        """
+        Print function of the class.
+
+        Returns
+        -------
+        str
+            A string, which describes the class instance.
+
+        """
+        hours = ', '.join(f'{["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"][h // 24]} {h % 24:02d}:00'
+                          for h in self.release_hours)
+        return f"Polling scheduler expecting releases at [{hours}] (UTC)."
+
+    def fit(self, published_at: Iterable[datetime]) -> 'PollingScheduler':
+        """
+        Learns the hours of the week, in which episodes are usually released.
+
+        Parameters
+        ----------
+        published_at : iterable of datetime
+            Timezone-aware publication dates of the episodes, e.g. the column 'published_at' of the 'meta' relation.
+
+        Returns
+        -------
+        PollingScheduler
+            The fitted instance.
+
+        """
+        dates = sorted(date.astimezone(timezone.utc) for date in published_at)[-self.history:]
+        counts = Counter(date.weekday() * 24 + date.hour for date in dates)
+        self.release_hours = sorted(hour for hour, n in counts.items() if n >= self.min_share * len(dates))
+        self._print(str(self))
+        return self
+
+    def next_delay(self, now: Union[datetime, None] = None) -> float:
+        """
+        Computes the delay until the next poll: 'min_interval' inside of a release window, otherwise the time until the
+        next release window starts, bounded by 'min_interval' and 'max_interval'.
+
+        Parameters
+        ----------
+        now : datetime or None, default None
+            Timezone-aware reference time, the current time if None.
+
+        Returns
+        -------
+        float
+            Delay in seconds.
+
+        """
+        if not self.release_hours:
+            return self.max_interval
+        now = (now or datetime.now(timezone.utc)).astimezone(timezone.utc)
+        week_start = (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+        delays = []
+        for week in (-1, 0, 1):
+            for hour in self.release_hours:
+                start = week_start + timedelta(weeks=week, hours=hour)
+                if start <= now < start + timedelta(seconds=self.window):
+                    return self.min_interval
+                if start > now:
+                    delays.append((start - now).total_seconds())
+        return min(max(min(delays), self.min_interval), self.max_interval)
+
+    def wait(self, now: Union[datetime, None] = None) -> bool:
+        """
+        Blocks until the next poll is due or the scheduler is cancelled.
+
+        Parameters
+        ----------
+        now : datetime or None, default None
+            Timezone-aware reference time, the current time if None.
+
+        Returns
+        -------
+        bool
+            False if the scheduler was cancelled, True otherwise.
+
+        """
+        delay = self.next_delay(now)
+        self._print(f"Next poll in {delay / 60:.0f} minutes.")
+        return not self._cancelled.wait(delay)
+
+    def sleep(self, seconds: float) -> bool:
+        """
+        Blocks for a fixed time or until the scheduler is cancelled.
+
+        Parameters
+        ----------
+        seconds : float
+            Time to wait in seconds.
+
+        Returns
+        -------
+        bool
+            False if the scheduler was cancelled, True otherwise.
+
+        """
+        return not self._cancelled.wait(max(seconds, 0))
+
+    async def wait_async(self, now: Union[datetime, None] = None) -> bool:
+        """
+        Waits inside an event loop until the next poll is due or the scheduler is cancelled. The waiting task can
+        also be cancelled directly.
+
+        Parameters
+        ----------
+        now : datetime or None, default None
+            Timezone-aware reference time, the current time if None.
+
+        Returns
+        -------
+        bool
+            False if the scheduler was cancelled, True otherwise.
+
+        """
+        delay = self.next_delay(now)
+        self._print(f"Next poll in {delay / 60:.0f} minutes.")
+        waiter = (get_running_loop(), AsyncEvent())
+        with self._lock:
+            self._async_waiters.add(waiter)
+        try:
+            if not self._cancelled.is_set():
+                await wait_for(waiter[1].wait(), delay)
+        except AsyncTimeoutError:
+            pass
+        finally:
+            with self._lock:
+                self._async_waiters.discard(waiter)
+        return not self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        """
+        Cancels the current and all following waits until 'reset' is called. Can be called from any thread, waits in
+        event loops are woken up through their loop.
+
+        Returns
+        -------
+        None
+
+        """
+        self._cancelled.set()
+        with self._lock:
+            waiters = list(self._async_waiters)
+        for loop, event in waiters:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(event.set)
+
+    def reset(self) -> None:
+        """
+        Clears the cancellation, so the scheduler can be waited on again, e.g. when a stopped scraper is run again.
+
+        Returns
+        -------
+        None
+
+        """
+        self._cancelled.clear()
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether the scheduler was cancelled."""
+        return self._cancelled.is_set()
@@ -1,21 +1,80 @@
-from bs4 import BeautifulSoup
+from __future__ import annotations
+from asyncio import ensure_future, gather, get_running_loop
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
 from datetime import datetime, timezone
-from io import BytesIO
-from json import loads
+from functools import partial
+from itertools import count
+from json import dumps, loads
+from logging import WARNING
+from os import close, getpid, remove
 from pathlib import Path
-from pydub import AudioSegment
-from requests import get
-from time import sleep
-from typing import Union
-from zeitsprung.base import Base
+import re
+from requests.exceptions import HTTPError, RequestException
+from socket import gethostname
+from tempfile import mkstemp
+from threading import Event, Thread
+from time import time
+from typing import TYPE_CHECKING, AsyncGenerator, AsyncIterator, Callable, Dict, Iterable, Iterator, Tuple, Union
+from urllib.parse import urljoin, urlsplit
+from uuid import uuid4
+from warnings import warn
+from xml.etree.ElementTree import ParseError
+from zeitsprung.audio import FORMATS
+from zeitsprung.base import Base, configure_logging, logging_configured
+from zeitsprung.client import AsyncHTTPClient, HTTPCache, HTTPClient
 from zeitsprung.database import SQLiteEngine
+from zeitsprung.parsing import get_parser, parse_lastmod, parse_sitemap, search_key
+from zeitsprung.pipeline import EpisodePipeline
+from zeitsprung.records import AudioInfo, Episode
+from zeitsprung.scheduling import PollingScheduler
+from zeitsprung.storage import AudioStore
+from zeitsprung.transcription import Transcriber
+
+if TYPE_CHECKING:
+    from pandas import DataFrame
+    from pydub import AudioSegment
+
+EPISODE_PATH = re.compile(r'/podcast/zs(\d+)/?$')
+
+
+@asynccontextmanager
+async def aclosing(generator: AsyncGenerator) -> AsyncIterator[AsyncGenerator]:
+    """
+    Asynchronous context manager, which closes an asynchronous generator on exit, like 'contextlib.aclosing' (Python
+    3.10). Leaving an 'async for' loop over a generator with 'break' or an exception does not close the generator,
+    its 'finally' blocks only run when it is garbage collected. Closing it explicitly cancels the pending downloads of
+    the iterators of 'AsyncScraper' and writes the already fetched episodes right away.
+
+    Parameters
+    ----------
+    generator : AsyncGenerator
+        The generator to close, e.g. 'AsyncScraper.episodes()'.
+
+    Returns
+    -------
+    AsyncIterator[AsyncGenerator]
+        The generator.
+
+    """
+    try:
+        yield generator
+    finally:
+        await generator.aclose()
 
 
 class Scraper(Base):
     """Class for scraping and preprocessing the data from the 'www.zeitsprung.fm' website."""
 
     def __init__(self, data_folder: str, update_interval: int = 24*60*60,
-                 reset: bool = False, verbose: bool = True) -> None:
+                 reset: bool = False, max_workers: int = 1, rate_limit: Union[float, None] = None,
+                 chunk_size: int = 1024*1024, parser: Union[str, Callable[[bytes], list]] = 'strainer',
+                 audio_format: str = 'wav', frame_rate: Union[int, None] = None, channels: Union[int, None] = None,
+                 transcode_workers: Union[int, None] = None, lookahead: int = 2,
+                 base_url: str = 'https://www.zeitsprung.fm', timeout: Tuple[float, float] = (10, 60),
+                 retries: int = 5, transcription_engine: Union[str, Callable, None] = None,
+                 verbose: bool = True) -> None:
         """
         Class constructor for the Scraper class.
 
@@ -24,9 +83,40 @@ class Scraper(Base):
         data_folder : str
             Folder to store the database and audio files. Is created or if existing, the files will bind to this.
         update_interval : int, default 24*60*60
-            Interval to wait for updating after the last episode is fetched.
+            Maximum interval to wait for updating after the last episode is fetched. Around the expected release times
+            learned from the publication history, the scraper polls more often.
         reset : bool, default False
             Ignore and reset an existing database.?
+        max_workers : int, default 1
+            Number of episodes fetched, decoded and exported concurrently during a backfill.
+        rate_limit : float or None, default None
+            Maximum number of requests per second sent to a host, unlimited if None.
+        chunk_size : int, default 1024*1024
+            Size in bytes of the chunks, in which audio files are streamed to disk.
+        parser : str or callable, default 'strainer'
+            Backend to extract the meta data from the episode pages: 'strainer' (BeautifulSoup limited to the relevant
+            tags), 'soup' (full BeautifulSoup tree), 'lxml' (requires the 'lxml' package) or a custom callable.
+        audio_format : str, default 'wav'
+            Format of the stored audio files: 'wav', 'flac', 'opus' or 'mp3' (keeps the original MP3 file).
+        frame_rate : int or None, default None
+            Sample rate in Hz of the stored audio files, the original rate is kept if None.
+        channels : int or None, default None
+            Number of channels of the stored audio files (1 to downmix to mono), the original channels are kept if None.
+        transcode_workers : int or None, default None
+            Number of processes transcoding the downloaded audio files, defaults to the number of CPUs.
+        lookahead : int, default 2
+            Number of episodes probed after the next unpublished episode, in case the numbering skips an episode.
+        base_url : str, default 'https://www.zeitsprung.fm'
+            URL of the website, the episode pages are requested from '<base_url>/podcast/zs<number>/'.
+        timeout : tuple, default (10, 60)
+            Connect and read timeout of the requests in seconds.
+        retries : int, default 5
+            Maximum number of retries of requests failing with a connection error, a timeout or a status of 429 or 5xx,
+            with exponential backoff. Interrupted audio downloads are resumed where they broke off.
+        transcription_engine : str, callable or None, default None
+            Speech recognition engine to transcribe the new episodes after their audio is stored, the name of a
+            built-in engine ('vosk') or a factory (see 'zeitsprung.transcription.get_engine'). No transcription if
+            None, the settings of the transcription can be changed with the 'transcriber' attribute.
         verbose : bool, default True
             Print messages about the activities conducted by a class instance.
 
@@ -35,8 +125,15 @@ class Scraper(Base):
         super().__init__(verbose)
         self.created_at = datetime.now(timezone.utc).replace(microsecond=0).isoformat()
         self.data_folder = Path(data_folder)
-        self.db = SQLiteEngine(self.data_folder / 'zeitsprung.db')
+        self.db = SQLiteEngine(self.data_folder / 'zeitsprung.db', verbose=verbose)
+        self.db.metrics = self.metrics
         self.update_interval = update_interval
+        self.max_workers = max(1, max_workers)
+        self.parser = get_parser(parser)
+        if audio_format not in FORMATS:
+            raise ValueError(f"Unknown audio format '{audio_format}', use one of {', '.join(FORMATS)}.")
+        self.base_url = base_url.rstrip('/')
+        self.scheduler = PollingScheduler(max_interval=update_interval, verbose=verbose)
         self.verbose = verbose
 
         if (self.data_folder / 'zeitsprung.db').exists() and reset:
@@ -47,6 +144,7 @@ class Scraper(Base):
 
         elif (self.data_folder / 'zeitsprung.db').exists() and not reset:
             self._print(f"Binding to existing directory structure in '{data_folder}'.")
+            self.db.upgrade_schema()
 
         else:
             self._print(f"Creating directory structure in '{data_folder}'.")
@@ -54,7 +152,16 @@ class Scraper(Base):
             (Path(data_folder) / 'audio').mkdir(parents=True, exist_ok=True)
             self.db.setup_schema()
 
-        self.current_episode = self.db.query_last_episode_id()
+        self.http = HTTPClient(rate_limit=rate_limit, pool_size=self.max_workers,
+                               cache=HTTPCache(self.data_folder / 'http_cache.db'), timeout=timeout, retries=retries,
+                               metrics=self.metrics)
+        self.store = AudioStore(self.data_folder / 'audio' / 'blobs', verbose=verbose)
+        self.pipeline = EpisodePipeline(self.db, self.store, self.data_folder / 'audio', audio_format=audio_format,
+                                        frame_rate=frame_rate, channels=channels, transcode_workers=transcode_workers,
+                                        chunk_size=chunk_size, lookahead=lookahead, verbose=verbose)
+        self.pipeline.metrics = self.metrics
+        self.transcriber = None if transcription_engine is None else \
+            Transcriber(self.db, transcription_engine, verbose=verbose)
 
     def __str__(self) -> str:
         """
@@ -69,10 +176,38 @@ class Scraper(Base):
         return f"Scraper created at '{self.created_at}' with db connection to " \
                f"'{self.db.db_file}', current episode is 'ZS{self.current_episode}'."
 
-    def get_episode_meta(self, i: int) -> Union[list, None]:
+    @property
+    def current_episode(self) -> int:
+        """Number of the last episode in the database."""
+        return self.pipeline.current_episode
+
+    @current_episode.setter
+    def current_episode(self, i: int) -> None:
+        self.pipeline.current_episode = i
+
+    def episode_url(self, i: int) -> str:
+        """
+        Builds the URL of an episode page.
+
+        Parameters
+        ----------
+        i : int
+            Number of the episode.
+
+        Returns
+        -------
+        str
+            URL of the episode page.
+
+        """
+        return f"{self.base_url}/podcast/zs{'0'+str(i) if i < 10 else str(i)}/"
+
+    def get_episode_meta(self, i: int) -> Union[Episode, None]:
         """
         Gets the episodes meta data (title, description, publication and modified at date) and stores it to the
-        database.
+        database. The page is requested conditionally, if it did not change since the last request, the meta data is
+        taken from the HTTP cache without parsing the page again. Only status 404 means, that the episode is not yet
+        published, other errors are raised after the retries of the HTTP client are exhausted.
 
         Parameters
         ----------
@@ -81,40 +216,72 @@ class Scraper(Base):
 
         Returns
         -------
-        list:
-            List containing the meta data of the episode.
-
-        """
-        url = f"https://www.zeitsprung.fm/podcast/zs{'0'+str(i) if i < 10 else str(i)}/"
-        self._print(f'Requesting meta data of episode {i}: {url}')
-        html_doc = get(url)
-        if html_doc.status_code == 200:
-            soup = BeautifulSoup(html_doc.content, 'html.parser')
-            script_content = loads(soup.find("script").contents[0])
-            title = soup.find('title').get_text(strip=True).split(":")
-            return [
-                i,
-                datetime.fromisoformat(self.search_key('datePublished', script_content['@graph'])),
-                datetime.fromisoformat(self.search_key('dateModified', script_content['@graph'])),
-                title[0],
-                title[1][1:],
-                soup.find("meta", {"property": "og:description"}).get('content'),
-                soup.find("meta", {"property": "og:url"}).get('content'),
-                None if soup.find("ul", {"class": "episode_download_list"}) is None else soup.find(
-                    "ul", {"class": "episode_download_list"}).find_all('a')[0].get('href')
-            ]
-        else:  # html_doc.status_code == 404:
+        Episode or None:
+            The meta data of the episode, None if the episode is not yet published.
+
+        """
+        url = self.episode_url(i)
+        self._print(f'Requesting meta data of episode {i}: {url}', uid=i)
+        with self.metrics.timer('http'):
+            html_doc = self.http.get(url, revalidate=True)
+        self.metrics.inc('http_requests')
+        if html_doc.status_code == 304:
+            self.metrics.inc('http_not_modified')
+            return Episode.from_row(loads(self.http.cache.load(url)[2]))
+        elif html_doc.status_code == 200:
+            self.metrics.inc('bytes_downloaded', len(html_doc.content))
+            episode = self.pipeline.parse(i, html_doc.content, self.parser)
+            self.http.cache.store(url, html_doc, dumps(list(episode), default=datetime.isoformat))
+            return episode
+        elif html_doc.status_code == 404:
             return None
+        html_doc.raise_for_status()
+        raise HTTPError(f'Unexpected status {html_doc.status_code} for url: {url}', response=html_doc)
 
-    @staticmethod
-    def search_key(key, dict_obj):
-        for entry in dict_obj:
-            if key in entry:
-                return entry[key]
+    search_key = staticmethod(search_key)
+
+    def download_episode_audio(self, url: str, file_name: Union[str, Path]) -> Union[Path, None]:
+        """
+        Streams the audio of an episode in chunks of 'chunk_size' bytes to a file, without buffering the whole response
+        in memory. Interrupted transfers are resumed with 'Range' requests. If the file already holds the beginning of
+        a download, which was broken off in an earlier run, the rest is requested with 'Range' and 'If-Range' (using
+        the ETag saved next to the file) and appended. The bytes are hashed on the fly and the download is recorded in
+        the audio store. If a blob of an earlier download from the URL is stored and the ETag or Content-Length of the
+        response did not change, the download is skipped.
+
+        Parameters
+        ----------
+        url : str
+            URL to download the audio from.
+        file_name : str or Path
+            File name with path, where the downloaded file should be saved to.
+
+        Returns
+        -------
+        Path or None:
+            Path to the downloaded file, None if the download was skipped.
+
+        """
+        download = self.pipeline.download(url, file_name)
+        with self.http.get(url, allow_redirects=True, stream=True, headers=download.headers) as response:
+            self.metrics.inc('http_requests')
+            if download.is_unchanged(response.status_code, response.headers):
+                return None
+            response.raise_for_status()
+            download.open()
+            try:
+                for chunk in self.http.iter_content(response, chunk_size=self.pipeline.chunk_size):
+                    download.write(chunk)
+            finally:
+                download.close()
+        return download.finish()
 
     def get_episode_audio(self, url: str) -> Union[AudioSegment, None]:
         """
-        Downloads the audio of a specified episode.
+        Downloads the audio of a specified episode to a temporary file in the audio folder and decodes it from there.
+
+        .. deprecated:: 0.2.0
+            Decodes the whole episode into memory, use 'download_episode_audio' and 'transcode_episode_audio' instead.
 
         Parameters
         ----------
@@ -127,10 +294,18 @@ class Scraper(Base):
             The audio of the episode.
 
         """
+        warn("'get_episode_audio' is deprecated, use 'download_episode_audio' and 'transcode_episode_audio' instead.",
+             DeprecationWarning, stacklevel=2)
         if url is not None:
-            self._print(f"Fetching audio file from {url}")
-            audio_mp3 = BytesIO(get(url, allow_redirects=True).content)
-            audio = AudioSegment.from_file(audio_mp3)
+            suffix = Path(urlsplit(url).path).suffix or '.mp3'
+            fd, tmp_file = mkstemp(suffix=suffix, dir=self.data_folder / 'audio')
+            close(fd)
+            try:
+                self.download_episode_audio(url, tmp_file)
+                from pydub import AudioSegment
+                audio = AudioSegment.from_file(tmp_file)
+            finally:
+                remove(tmp_file)
             return audio
         else:
             self._print('No audio file available for this episode.')
@@ -140,6 +315,9 @@ class Scraper(Base):
         """
         Save the audio file of an episode and as '.wav' file.
 
+        .. deprecated:: 0.2.0
+            Ignores 'audio_format', 'frame_rate' and 'channels', use 'transcode_episode_audio' instead.
+
         Parameters
         ----------
         audio :  AudioSegment
@@ -152,35 +330,805 @@ class Scraper(Base):
         None
 
         """
+        warn("'save_episode_audio' is deprecated, use 'transcode_episode_audio' instead.", DeprecationWarning,
+             stacklevel=2)
         self._print(f"Exporting audio sequence to file '{file_name}'")
         audio.export(file_name, format="wav")
 
-    def run(self) -> None:
+    def transcode_episode_audio(self, source: Union[str, Path], target: Union[str, Path]) -> list:
+        """
+        Transcodes a downloaded audio file into the configured format, sample rate and channels. During an update the
+        work is sent to the process pool of the scraper, otherwise it is done in the calling thread.
+
+        Parameters
+        ----------
+        source : str or Path
+            Path to the downloaded audio file.
+        target : str or Path
+            Path to write the transcoded file to.
+
+        Returns
+        -------
+        list
+            Duration in seconds, frame rate, frame width, number of channels, format and size in bytes of the output.
+
+        """
+        return self.pipeline.transcode(source, target)
+
+    def fetch_episode(self, i: int) -> Union[Tuple[Episode, Union[AudioInfo, None], Union[list, None]], None]:
+        """
+        Fetches the meta data and audio of an episode, transcodes the audio file and builds its segment index. The
+        progress is recorded in the 'job' relation and stages completed by previous attempts are skipped. If fetching
+        the audio fails, the error is recorded and the episode is returned without 'audio' row, to be retried by
+        'resume'. If only building the segment index fails, the episode is stored without index, which is then built
+        by 'ClipExtractor' when it is needed.
+
+        Parameters
+        ----------
+        i : int
+            Number of the episode.
+
+        Returns
+        -------
+        tuple or None
+            The meta data, the audio file and the segment index (or None) of the episode, None if the episode is not yet
+            published.
+
+        """
+        episode = self.get_episode_meta(i)
+        if episode is None:
+            return None
+        stage = self.pipeline.begin(i)
+        if episode.url_audio is None:
+            self._print('No audio file available for this episode.')
+            return episode, None, None
+        try:
+            source, target, stage = self.pipeline.audio_paths(i, episode.url_audio, stage)
+            if stage is None:
+                self.download_episode_audio(episode.url_audio, source)
+                self.db.advance_jobs([i], 'downloaded')
+            audio = self.pipeline.store_audio(i, episode.url_audio, source, target, stage == 'transcoded',
+                                              self.transcode_episode_audio)
+        except Exception as e:
+            return self.pipeline.audio_failed(episode, e)
+        return episode, audio, self.pipeline.index(i, audio.file_path)
+
+    def update(self) -> int:
+        """
+        Fetches all episodes published after the current episode. Up to 'max_workers' episodes are requested
+        concurrently and their audio files are transcoded in a pool of 'transcode_workers' processes, while the rows
+        are written to the database in order of the episodes by the calling thread. Rows of episodes finished at the
+        same time are committed in one transaction. The update stops at the first episode, which is not yet published,
+        unless one of the following 'lookahead' episodes is already published. An episode, which still fails after all
+        retries, is treated like an unpublished one and recorded in the 'job' relation to be retried by 'resume'. If a
+        transcription engine is set, the episodes written by the update are transcribed afterwards.
+
+        Returns
+        -------
+        int
+            Number of new episodes.
+
+        """
+        written = []
+        n_new = self._process(count(self.current_episode + 1), stop_unpublished=True, written=written)
+        next_published = self._probe_ahead()
+        while next_published is not None:
+            self._print(f"Episode {self.current_episode + 1} is skipped, continuing with episode {next_published}.")
+            n_new += self._process(count(next_published), stop_unpublished=True, written=written)
+            next_published = self._probe_ahead()
+        if self.transcriber is not None and written:
+            self.transcriber.transcribe(written)
+        return n_new
+
+    def _probe_ahead(self) -> Union[int, None]:
+        for i in self.pipeline.lookahead_uids():
+            if self.get_episode_meta(i) is not None:
+                return i
+        return None
+
+    def resume(self, max_attempts: Union[int, None] = None) -> int:
+        """
+        Resumes the episodes, which did not reach the 'indexed' stage in the 'job' relation, e.g. due to a failed
+        download or a crash. Only the missing stages are rerun. Episodes which fail again are skipped and keep their
+        error, episodes which turn out not to be published are removed from the 'job' relation.
+
+        Parameters
+        ----------
+        max_attempts : int or None, default None
+            Skip episodes, which already failed this many times, no limit if None.
+
+        Returns
+        -------
+        int
+            Number of resumed episodes.
+
+        """
+        uids = self.db.query_incomplete_jobs(max_attempts)['uid'].tolist()
+        self._print(f"Resuming {len(uids)} incomplete episodes.")
+        written = []
+        n_done = self._process(iter(uids), stop_unpublished=False,
+                               on_unpublished=lambda uid: self.db.remove_jobs([uid]), written=written)
+        if self.transcriber is not None and written:
+            self.transcriber.transcribe(written)
+        return n_done
+
+    def get_modification_dates(self, sitemap: str = 'sitemap.xml') -> Dict[int, datetime]:
+        """
+        Reads the modification dates of the episode pages from the sitemap of the website, following nested sitemaps
+        of a sitemap index.
+
+        Parameters
+        ----------
+        sitemap : str, default 'sitemap.xml'
+            URL of the sitemap, relative to the base URL.
+
+        Returns
+        -------
+        dict
+            Maps the numbers of the episodes to the 'lastmod' dates of their pages, empty if no sitemap is available.
+            Pages with invalid dates are left out, so they are requested conditionally by 'refresh'.
+
+        """
+        urls, visited, dates = [urljoin(self.base_url + '/', sitemap)], set(), {}
+        while urls:
+            url = urls.pop()
+            visited.add(url)
+            response = self.http.get(url)
+            self.metrics.inc('http_requests')
+            if response.status_code != 200:
+                self._print(f"No sitemap available at {url} (status {response.status_code}).")
+                continue
+            try:
+                sitemaps, lastmod = parse_sitemap(response.content)
+            except ParseError as e:
+                self._print(f"Failed to parse the sitemap at {url}: {e!r}", WARNING)
+                continue
+            urls += [sitemap_url for sitemap_url in sitemaps if sitemap_url not in visited]
+            for page_url, date in lastmod.items():
+                match = EPISODE_PATH.search(urlsplit(page_url).path)
+                if match is None:
+                    continue
+                try:
+                    dates[int(match.group(1))] = parse_lastmod(date)
+                except ValueError as e:
+                    self._print(f"Skipped the invalid 'lastmod' date of {page_url}, the page is requested "
+                                f"conditionally: {e}", WARNING)
+        return dates
+
+    def refresh(self, sitemap: Union[str, None] = 'sitemap.xml', uids: Union[Iterable[int], None] = None) -> int:
+        """
+        Fetches the stored episodes again, which were modified after they were scraped. Episodes whose 'lastmod' date in
+        the sitemap is not later than the stored 'modified_at' date are skipped, the pages of the other episodes are
+        requested conditionally and compared to the stored meta data. Only the modified episodes are processed again,
+        their audio files are only downloaded again if the audio URL or the ETag or size of the file changed.
+
+        Parameters
+        ----------
+        sitemap : str or None, default 'sitemap.xml'
+            URL of the sitemap relative to the base URL, all episode pages are requested conditionally if None.
+        uids : iterable of int or None, default None
+            Numbers of the episodes to refresh, all stored episodes if None.
+
+        Returns
+        -------
+        int
+            Number of refreshed episodes.
+
+        """
+        from pandas import isna
+        stored = self.db.query_meta(columns=['uid', 'modified_at'], uids=uids)
+        lastmod = {} if sitemap is None else self.get_modification_dates(sitemap)
+        candidates = [uid for uid, modified_at in stored.itertuples(index=False)
+                      if uid not in lastmod or isna(modified_at) or lastmod[uid] > modified_at]
+        self._print(f"Checking {len(candidates)} of {len(stored)} episodes for modifications.")
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            changed = [uid for uid, modified in zip(candidates, pool.map(self._is_modified, candidates)) if modified]
+        self._print(f"Refreshing {len(changed)} modified episodes.")
+        self.metrics.inc('episodes_modified', len(changed))
+        digests = {uid: getattr(self.db.get_audio_info(uid), 'sha256', None) for uid in changed}
+        n_done = self._process(iter(changed), stop_unpublished=False)
+        replaced = [uid for uid in changed if getattr(self.db.get_audio_info(uid), 'sha256', None) != digests[uid]]
+        if self.transcriber is not None and replaced:
+            self.transcriber.transcribe(replaced, overwrite=True)
+        return n_done
+
+    def _is_modified(self, uid: int) -> bool:
+        episode = self.get_episode_meta(uid)
+        return episode is not None and episode != self.db.get_episode(uid)
+
+    def _process(self, uids: Iterator[int], stop_unpublished: bool,
+                 on_unpublished: Union[Callable[[int], None], None] = None, written: Union[list, None] = None) -> int:
+        owns_transcoder = self.pipeline.start_transcoder()
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                return self._fetch_in_order(pool, uids, stop_unpublished, on_unpublished, written)
+        finally:
+            if owns_transcoder:
+                self.pipeline.stop_transcoder()
+
+    def _fetch_in_order(self, pool: ThreadPoolExecutor, uids: Iterator[int], stop_unpublished: bool,
+                        on_unpublished: Union[Callable[[int], None], None], written: Union[list, None]) -> int:
+        n_done = 0
+        pending = deque()
+        batch = []
+        try:
+            while self._submit(pool, uids, pending):
+                uid, future = pending.popleft()
+                try:
+                    rows = future.result()
+                except Exception as e:
+                    rows = e
+                if not self.pipeline.accept(uid, rows, batch, stop_unpublished, on_unpublished):
+                    break
+                if batch and (not pending or not pending[0][1].done()):
+                    n_done += self.pipeline.write(batch, written)
+                    batch = []
+        finally:
+            for _, future in pending:
+                future.cancel()
+            n_done += self.pipeline.write(batch, written)
+        return n_done
+
+    def _submit(self, pool: ThreadPoolExecutor, uids: Iterator[int], pending: deque) -> bool:
+        for uid in uids:
+            pending.append((uid, pool.submit(self.fetch_episode, uid)))
+            if len(pending) >= self.max_workers:
+                break
+        return bool(pending)
+
+    def enqueue(self, uids: Iterable[int]) -> int:
+        """
+        Adds episodes to the work queue in the database, to be fetched by the workers started with 'work'. Episodes
+        which are already in the queue or processed are skipped.
+
+        Parameters
+        ----------
+        uids : iterable of int
+            Numbers of the episodes, e.g. 'range(1, 301)' to rebuild the archive of the first 300 episodes.
+
+        Returns
+        -------
+        int
+            Number of added episodes.
+
+        """
+        return self.db.enqueue_jobs(uids)
+
+    def work(self, owner: Union[str, None] = None, lease: float = 300, batch_size: Union[int, None] = None,
+             max_attempts: int = 3) -> int:
+        """
+        Fetches the episodes from the work queue in the database until it is empty. Several workers in different
+        processes on the same host can work on the same queue: every worker claims a batch of episodes with a lease,
+        which is renewed by a heartbeat thread while the batch is processed. If a worker crashes, its lease expires and
+        the episodes are claimed by another worker. Queued episodes which are not published are removed from the
+        queue. The SQLite database relies on shared memory (WAL mode), so workers on other machines cannot share the
+        data folder over a network file system.
+
+        Parameters
+        ----------
+        owner : str or None, default None
+            Unique name of the worker, '<host>:<process id>:<random suffix>' if None.
+        lease : float, default 300
+            Duration of the leases in seconds, they are renewed every third of the duration.
+        batch_size : int or None, default None
+            Number of episodes claimed at once, twice 'max_workers' if None.
+        max_attempts : int, default 3
+            Skip episodes, which already failed this many times, so the workers stop once the remaining episodes keep
+            failing. They can be retried by 'resume' or another call with a higher limit.
+
+        Returns
+        -------
+        int
+            Number of episodes processed by this worker.
+
+        """
+        owner = owner or f'{gethostname()}:{getpid()}:{uuid4().hex[:8]}'
+        batch_size = batch_size or 2 * self.max_workers
+        self.scheduler.reset()
+        self._print(f"Worker '{owner}' is starting.", owner=owner)
+        n_done = 0
+        owns_transcoder = self.pipeline.start_transcoder()
+        try:
+            with self._heartbeat(owner, lease) as claimed:
+                while not self.scheduler.cancelled:
+                    claimed[:] = self.db.claim_jobs(owner, batch_size, lease, max_attempts)
+                    if not claimed:
+                        expiry = self.db.query_next_lease_expiry(max_attempts)
+                        if expiry is None or not self.scheduler.sleep(min(expiry - time(), lease) + 0.1):
+                            break
+                        continue
+                    try:
+                        n_done += self._work_batch(claimed)
+                    finally:
+                        self.db.release_jobs(owner, claimed)
+                        claimed[:] = []
+        finally:
+            if owns_transcoder:
+                self.pipeline.stop_transcoder()
+        self._print(f"Worker '{owner}' processed {n_done} episodes.", owner=owner, episodes=n_done)
+        return n_done
+
+    @contextmanager
+    def _heartbeat(self, owner: str, lease: float) -> Iterator[list]:
+        claimed = []
+        stopped = Event()
+
+        def renew():
+            while not stopped.wait(lease / 3):
+                uids = list(claimed)
+                lost = set(uids) - set(self.db.renew_leases(owner, uids, lease)) if uids else set()
+                if lost:
+                    self._print(f"Worker '{owner}' lost the leases on episodes {sorted(lost)}.", WARNING, owner=owner)
+
+        thread = Thread(target=renew, daemon=True)
+        thread.start()
+        try:
+            yield claimed
+        finally:
+            stopped.set()
+            thread.join()
+
+    def _work_batch(self, uids: list) -> int:
+        unpublished = []
+        try:
+            n_done = self._process(iter(uids), stop_unpublished=False, on_unpublished=unpublished.append)
+            if self.transcriber is not None and n_done:
+                self.transcriber.transcribe(uids)
+            return n_done
+        finally:
+            self.db.remove_jobs(unpublished)
+
+    def verify(self, max_workers: Union[int, None] = None) -> DataFrame:
+        """
+        Verifies the integrity of the audio files of all episodes, by hashing them in parallel and comparing the
+        digests to the ones recorded in the 'audio' relation. Files stored before the digests were recorded are skipped.
+
+        Parameters
+        ----------
+        max_workers : int or None, default None
+            Number of threads hashing the files, defaults to the number of CPUs plus four.
+
+        Returns
+        -------
+        DataFrame
+            The number of the episode, path and expected digest of the audio file and the status ('ok', 'corrupt' or
+            'missing').
+
+        """
+        audio = self.db.query_audio(columns=['uid', 'file_path', 'sha256']).dropna(subset=['sha256'])
+        result = self.store.verify(dict(zip(audio['file_path'], audio['sha256'])), max_workers=max_workers)
+        return audio[['uid', 'file_path']].merge(result, on='file_path')
+
+    def run(self, metrics_port: Union[int, None] = None) -> None:
+        """
+        Start the scraper, which will resume incomplete episodes of previous runs and then download the meta data and
+        audio files of all not yet existing episodes in the database. Afterwards it polls for new episodes, as
+        scheduled by the publication history, until 'stop' is called. When the scraper stops, the metrics of the run
+        are written as JSON to 'run_summary.json' in the data folder. A stopped scraper can be run again. If 'verbose'
+        is True and the application has not configured logging, the messages are written to stdout (see
+        'configure_logging').
+
+        Parameters
+        ----------
+        metrics_port : int or None, default None
+            Serve the metrics in the Prometheus text format at 'http://127.0.0.1:<metrics_port>/metrics' while running.
+
+        Returns
+        -------
+        None
+
+        """
+        if self.verbose and not logging_configured():
+            configure_logging()
+        self.scheduler.reset()
+        server = None if metrics_port is None else self.metrics.serve(metrics_port)
+        try:
+            try:
+                self.resume()
+            except RequestException as e:
+                self._print(f"Resuming failed after all retries: {e!r}", WARNING)
+            while not self.scheduler.cancelled:
+                try:
+                    self.update()
+                except RequestException as e:
+                    self._print(f"Update failed after all retries: {e!r}", WARNING)
+                self.scheduler.fit(self.db.query_meta(columns=['published_at'])['published_at'])
+                if not self.scheduler.wait():
+                    break
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+            summary = self.metrics.summary()
+            (self.data_folder / 'run_summary.json').write_text(dumps(summary, indent=2))
+            self._print(f"Run finished after {summary['elapsed_seconds']:.0f} seconds with "
+                        f"{summary['counters'].get('episodes', 0)} episodes.", **summary['counters'])
+
+    def stop(self) -> None:
+        """
+        Stops a running scraper after the current update, a waiting scraper stops immediately. The scraper can be run
+        again afterwards.
+
+        Returns
+        -------
+        None
+
+        """
+        self.scheduler.cancel()
+
+
+class AsyncScraper(Base):
+    """
+    Asynchronous variant of the Scraper for applications running an event loop. Requests are sent with 'aiohttp',
+    blocking steps (parsing, decoding, transcoding and database access) are run in executors, so scraping, polling and
+    serving can share one event loop. The state is kept by a synchronous Scraper, available as 'scraper' attribute.
+    """
+
+    def __init__(self, data_folder: str, max_workers: int = 4, rate_limit: Union[float, None] = None,
+                 timeout: Tuple[float, float] = (10, 60), retries: int = 5, verbose: bool = True, **kwargs) -> None:
+        """
+        Class constructor for the AsyncScraper class. Requires the optional 'aiohttp' package.
+
+        Parameters
+        ----------
+        data_folder : str
+            Folder to store the database and audio files. Is created or if existing, the files will bind to this.
+        max_workers : int, default 4
+            Number of episodes fetched concurrently.
+        rate_limit : float or None, default None
+            Maximum number of requests per second sent to a host, unlimited if None.
+        timeout : tuple, default (10, 60)
+            Connect and read timeout of the requests in seconds.
+        retries : int, default 5
+            Maximum number of retries of requests failing with a connection error, a timeout or a status of 429 or 5xx.
+        verbose : bool, default True
+            Print messages about the activities conducted by a class instance.
+        **kwargs
+            Further arguments passed to the constructor of the Scraper, e.g. 'audio_format' or 'parser'.
+
+        Returns
+        -------
+        None
+
+        """
+        super().__init__(verbose)
+        self.scraper = Scraper(data_folder, max_workers=max_workers, rate_limit=rate_limit, timeout=timeout,
+                               retries=retries, verbose=verbose, **kwargs)
+        self.metrics = self.scraper.metrics
+        self.db = self.scraper.db
+        self.scheduler = self.scraper.scheduler
+        self.pipeline = self.scraper.pipeline
+        self.max_workers = self.scraper.max_workers
+        self.http = AsyncHTTPClient(rate_limit=rate_limit, pool_size=self.max_workers, cache=self.scraper.http.cache,
+                                    timeout=timeout, retries=retries, metrics=self.metrics)
+        self.verbose = verbose
+
+    def __str__(self) -> str:
+        """
+        Print function of the class.
+
+        Returns
+        -------
+        str
+            A string, which describes the class instance.
+
+        """
+        return f"Asynchronous scraper with db connection to '{self.db.db_file}', current episode is " \
+               f"'ZS{self.current_episode}'."
+
+    async def __aenter__(self) -> AsyncScraper:
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
+
+    @property
+    def current_episode(self) -> int:
+        """Number of the last episode in the database."""
+        return self.scraper.current_episode
+
+    @staticmethod
+    async def _run(func: Callable, *args, **kwargs):
+        return await get_running_loop().run_in_executor(None, partial(func, *args, **kwargs))
+
+    async def get_episode_meta(self, i: int) -> Union[Episode, None]:
+        """
+        Gets the meta data of an episode, see 'Scraper.get_episode_meta'. The page is parsed in an executor.
+
+        Parameters
+        ----------
+        i : int
+            Number of the episode.
+
+        Returns
+        -------
+        Episode or None:
+            The meta data of the episode, None if the episode is not yet published.
+
+        """
+        url = self.scraper.episode_url(i)
+        self._print(f'Requesting meta data of episode {i}: {url}', uid=i)
+        with self.metrics.timer('http'):
+            response = await self.http.get(url, revalidate=True)
+            async with response:
+                content = await response.read()
+        self.metrics.inc('http_requests')
+        if response.status == 304:
+            self.metrics.inc('http_not_modified')
+            return Episode.from_row(loads((await self._run(self.http.cache.load, url))[2]))
+        elif response.status == 200:
+            self.metrics.inc('bytes_downloaded', len(content))
+            episode = await self._run(self.pipeline.parse, i, content, self.scraper.parser)
+            await self._run(self.http.cache.store, url, response, dumps(list(episode), default=datetime.isoformat))
+            return episode
+        elif response.status == 404:
+            return None
+        response.raise_for_status()
+        raise RequestException(f'Unexpected status {response.status} for url: {url}')
+
+    async def download_episode_audio(self, url: str, file_name: Union[str, Path]) -> Union[Path, None]:
+        """
+        Streams the audio of an episode to a file, resuming downloads broken off in an earlier run, see
+        'Scraper.download_episode_audio'. The chunks are written to the file in an executor.
+
+        Parameters
+        ----------
+        url : str
+            URL to download the audio from.
+        file_name : str or Path
+            File name with path, where the downloaded file should be saved to.
+
+        Returns
+        -------
+        Path or None:
+            Path to the downloaded file, None if the download was skipped.
+
+        """
+        download = await self._run(self.pipeline.download, url, file_name)
+        async with await self.http.get(url, headers=download.headers) as response:
+            self.metrics.inc('http_requests')
+            if download.is_unchanged(response.status, response.headers):
+                return None
+            response.raise_for_status()
+            await self._run(download.open)
+            try:
+                async with aclosing(self.http.iter_content(response, chunk_size=self.pipeline.chunk_size)) as chunks:
+                    async for chunk in chunks:
+                        await self._run(download.write, chunk)
+            finally:
+                await self._run(download.close)
+        return await self._run(download.finish)
+
+    async def fetch_episode(self, i: int) -> Union[Tuple[Episode, Union[AudioInfo, None], Union[list, None]], None]:
+        """
+        Fetches the meta data and audio of an episode, transcodes the audio file and builds its segment index, see
+        'Scraper.fetch_episode'.
+
+        Parameters
+        ----------
+        i : int
+            Number of the episode.
+
+        Returns
+        -------
+        tuple or None
+            The meta data, the audio file and the segment index (or None) of the episode, None if the episode is not yet
+            published.
+
+        """
+        episode = await self.get_episode_meta(i)
+        if episode is None:
+            return None
+        stage = await self._run(self.pipeline.begin, i)
+        if episode.url_audio is None:
+            self._print('No audio file available for this episode.')
+            return episode, None, None
+        try:
+            source, target, stage = await self._run(self.pipeline.audio_paths, i, episode.url_audio, stage)
+            if stage is None:
+                await self.download_episode_audio(episode.url_audio, source)
+                await self._run(self.db.advance_jobs, [i], 'downloaded')
+            audio = await self._run(self.pipeline.store_audio, i, episode.url_audio, source, target,
+                                    stage == 'transcoded', self.scraper.transcode_episode_audio)
+        except Exception as e:
+            return await self._run(self.pipeline.audio_failed, episode, e)
+        return episode, audio, await self._run(self.pipeline.index, i, audio.file_path)
+
+    async def _process(self, uids: Iterator[int], stop_unpublished: bool,
+                       on_unpublished: Union[Callable[[int], None], None] = None) -> AsyncIterator[Episode]:
+        pending = deque()
+        batch = []
+        owns_transcoder = self.pipeline.start_transcoder()
+        try:
+            while self._submit(uids, pending):
+                uid, task = pending.popleft()
+                rows = await self._result(task)
+                if not await self._run(self.pipeline.accept, uid, rows, batch, stop_unpublished, on_unpublished):
+                    break
+                if batch and (not pending or not pending[0][1].done()):
+                    written, batch = batch, []
+                    await self._run(self.pipeline.write, written)
+                    for episode, _, _ in written:
+                        yield episode
+            written, batch = batch, []
+            await self._run(self.pipeline.write, written)
+            for episode, _, _ in written:
+                yield episode
+        finally:
+            for _, task in pending:
+                task.cancel()
+            await gather(*(task for _, task in pending), return_exceptions=True)
+            await self._run(self.pipeline.write, batch)
+            if owns_transcoder:
+                await self._run(self.pipeline.stop_transcoder)
+
+    def _submit(self, uids: Iterator[int], pending: deque) -> bool:
+        for uid in uids:
+            pending.append((uid, ensure_future(self.fetch_episode(uid))))
+            if len(pending) >= self.max_workers:
+                break
+        return bool(pending)
+
+    @staticmethod
+    async def _result(task) -> Union[tuple, Exception, None]:
+        try:
+            return await task
+        except Exception as e:
+            return e
+
+    async def _probe_ahead(self) -> Union[int, None]:
+        for i in self.pipeline.lookahead_uids():
+            if await self.get_episode_meta(i) is not None:
+                return i
+        return None
+
+    async def new_episodes(self) -> AsyncIterator[Episode]:
+        """
+        Iterates over the episodes published after the current episode, up to 'max_workers' are fetched concurrently
+        (see 'Scraper.update'). Every episode is yielded as soon as it is written to the database. If a transcription
+        engine is set, the new episodes are transcribed afterwards. Close the iterator when leaving the loop early, e.g.
+        with 'aclosing', so the pending requests are cancelled right away.
+
+        Returns
+        -------
+        AsyncIterator[Episode]
+            The new episodes.
+
+        """
+        written = []
+        async with aclosing(self._process(count(self.current_episode + 1), stop_unpublished=True)) as episodes:
+            async for episode in episodes:
+                written.append(episode.uid)
+                yield episode
+        next_published = await self._probe_ahead()
+        while next_published is not None:
+            self._print(f"Episode {self.current_episode + 1} is skipped, continuing with episode {next_published}.")
+            async with aclosing(self._process(count(next_published), stop_unpublished=True)) as episodes:
+                async for episode in episodes:
+                    written.append(episode.uid)
+                    yield episode
+            next_published = await self._probe_ahead()
+        if self.scraper.transcriber is not None and written:
+            await self._run(self.scraper.transcriber.transcribe, written)
+
+    async def update(self) -> int:
+        """
+        Fetches all episodes published after the current episode, up to 'max_workers' concurrently.
+
+        Returns
+        -------
+        int
+            Number of new episodes.
+
+        """
+        async with aclosing(self.new_episodes()) as episodes:
+            return len([episode async for episode in episodes])
+
+    async def resume(self, max_attempts: Union[int, None] = None) -> int:
+        """
+        Resumes the episodes, which did not reach the 'indexed' stage in the 'job' relation, see 'Scraper.resume'.
+
+        Parameters
+        ----------
+        max_attempts : int or None, default None
+            Skip episodes, which already failed this many times, no limit if None.
+
+        Returns
+        -------
+        int
+            Number of resumed episodes.
+
+        """
+        uids = (await self._run(self.db.query_incomplete_jobs, max_attempts))['uid'].tolist()
+        self._print(f"Resuming {len(uids)} incomplete episodes.")
+        unpublished = []
+        try:
+            async with aclosing(self._process(iter(uids), False, on_unpublished=unpublished.append)) as episodes:
+                written = [episode.uid async for episode in episodes]
+        finally:
+            await self._run(self.db.remove_jobs, unpublished)
+        if self.scraper.transcriber is not None and written:
+            await self._run(self.scraper.transcriber.transcribe, written)
+        return len(written)
+
+    async def episodes(self) -> AsyncIterator[Episode]:
+        """
+        Resumes the incomplete episodes of previous runs, fetches all new episodes and then polls for new episodes, as
+        scheduled by the publication history. The episodes are yielded as they are written to the database, until
+        'stop' is called or the iterating task is cancelled. A new iteration after 'stop' polls again. Close the
+        iterator when leaving the loop early, e.g. with 'aclosing', otherwise the pending requests are only cancelled
+        when it is garbage collected.
+
+        Returns
+        -------
+        AsyncIterator[Episode]
+            The resumed and newly published episodes.
+
+        """
+        from aiohttp import ClientError
+        self.scheduler.reset()
+        uids = (await self._run(self.db.query_incomplete_jobs))['uid'].tolist()
+        unpublished = []
+        try:
+            async with aclosing(self._process(iter(uids), False, on_unpublished=unpublished.append)) as episodes:
+                async for episode in episodes:
+                    yield episode
+        finally:
+            await self._run(self.db.remove_jobs, unpublished)
+        while not self.scheduler.cancelled:
+            try:
+                async with aclosing(self.new_episodes()) as episodes:
+                    async for episode in episodes:
+                        yield episode
+            except (ClientError, RequestException) as e:
+                self._print(f"Update failed after all retries: {e!r}", WARNING)
+            meta = await self._run(self.db.query_meta, columns=['published_at'])
+            self.scheduler.fit(meta['published_at'])
+            if not await self.scheduler.wait_async():
+                break
+
+    async def run(self) -> None:
+        """
+        Runs the scraper until 'stop' is called or the task is cancelled, see 'episodes'. When the scraper stops, the
+        metrics of the run are written as JSON to 'run_summary.json' in the data folder. If 'verbose' is True and the
+        application has not configured logging, the messages are written to stdout (see 'configure_logging').
+
+        Returns
+        -------
+        None
+
+        """
+        if self.verbose and not logging_configured():
+            configure_logging()
+        try:
+            async with aclosing(self.episodes()) as episodes:
+                async for _ in episodes:
+                    pass
+        finally:
+            summary = self.metrics.summary()
+            (self.scraper.data_folder / 'run_summary.json').write_text(dumps(summary, indent=2))
+            self._print(f"Run finished after {summary['elapsed_seconds']:.0f} seconds with "
+                        f"{summary['counters'].get('episodes', 0)} episodes.", **summary['counters'])
+
+    def stop(self) -> None:
+        """
+        Stops a running scraper after the current update, a waiting scraper stops immediately. The scraper can be run
+        again afterwards.
+
+        Returns
+        -------
+        None
+
+        """
+        self.scheduler.cancel()
+
+    async def close(self) -> None:
         """
-        Start the scraper, which will download the meta data and audio files of all not yet existing episodes in the
-        database.
+        Closes the HTTP session, a new session is opened on the next request.
 
         Returns
         -------
         None
 
         """
-        while True:
-            meta_row = self.get_episode_meta(self.current_episode + 1)
-            if meta_row is not None:
-                self.db.insert_meta_row(meta_row)
-                audio = self.get_episode_audio(meta_row[7])
-                if audio is not None:
-                    audio_row = [
-                        self.current_episode + 1,
-                        self.data_folder / 'audio' / f'{str(self.current_episode + 1).zfill(3)}.wav',
-                        round(audio.duration_seconds),
-                        audio.frame_rate,
-                        audio.frame_width
-                    ]
-                    self.save_episode_audio(audio, audio_row[1])
-                    self.db.insert_audio_row(audio_row)
-                self.current_episode += 1
-            else:
-                self._print(f"Episode not yet published, pausing for {int(self.update_interval/(60*60))} hours.")
-                sleep(self.update_interval)
+        await self.http.close()
@@ -0,0 +1,292 @@
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha256
+from os import replace
+from pathlib import Path
+from sqlite3 import connect
+from threading import Lock
+from typing import TYPE_CHECKING, Dict, Tuple, Union
+from zeitsprung.base import Base
+
+if TYPE_CHECKING:
+    from pandas import DataFrame
+
+HASH_CHUNK_SIZE = 1024*1024
+
+
+def file_digest(file_name: Union[str, Path], chunk_size: int = HASH_CHUNK_SIZE) -> str:
+    """
+    Computes the SHA-256 digest of a file, reading it in chunks.
+
+    Parameters
+    ----------
+    file_name : str or Path
+        Path to the file.
+    chunk_size : int, default 1024*1024
+        Number of bytes read at once.
+
+    Returns
+    -------
+    str
+        Hexadecimal SHA-256 digest of the file content.
+
+    """
+    digest = sha256()
+    with open(file_name, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class AudioStore(Base):
+    """Content-addressed store, which keeps every audio file once under the SHA-256 digest of its content."""
+
+    def __init__(self, folder: Union[str, Path], verbose: bool = True) -> None:
+        """
+        Class constructor for the AudioStore class. The blobs are stored as 'folder/ab/abcdef....wav', the downloads
+        they were transcoded from are recorded in the index 'folder/index.db', which is kept if the database of the
+        scraper is reset.
+
+        Parameters
+        ----------
+        folder : str or Path
+            Folder to store the blobs and the index in, is created if it does not exist.
+        verbose : bool, default True
+            Print messages about the activities conducted by a class instance.
+
+        Returns
+        -------
+        None
+
+        """
+        super().__init__(verbose)
+        self.folder = Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.verbose = verbose
+        self._lock = Lock()
+        self._conn = connect(self.folder / 'index.db', timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS source (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                size INTEGER,
+                sha256 TEXT NOT NULL
+            );
+            ''')
+            self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS variant (
+                source_sha256 TEXT NOT NULL,
+                variant TEXT NOT NULL,
+                blob TEXT NOT NULL,
+                PRIMARY KEY (source_sha256, variant)
+            );
+            ''')
+
+    def __str__(self) -> str:
+        """
+        Print function of the class.
+
+        Returns
+        -------
+        str
+            A string, which describes the class instance.
+
+        """
+        return f"Content-addressed audio store in '{self.folder}'."
+
+    def blob_path(self, digest: str, audio_format: str) -> Path:
+        """
+        Builds the path of a blob.
+
+        Parameters
+        ----------
+        digest : str
+            SHA-256 digest of the blob.
+        audio_format : str
+            Format of the audio file, used as file extension.
+
+        Returns
+        -------
+        Path
+            Path to the blob.
+
+        """
+        return self.folder / digest[:2] / f'{digest}.{audio_format}'
+
+    def record_source(self, url: str, etag: Union[str, None], size: Union[int, None], digest: str) -> None:
+        """
+        Records a download, to recognize it by its URL, ETag and Content-Length before downloading it again.
+
+        Parameters
+        ----------
+        url : str
+            URL of the downloaded audio file.
+        etag : str or None
+            ETag header of the response.
+        size : int or None
+            Content-Length header of the response.
+        digest : str
+            SHA-256 digest of the downloaded bytes.
+
+        Returns
+        -------
+        None
+
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO source (url, etag, size, sha256) VALUES (?, ?, ?, ?)', (url, etag, size, digest)
+            )
+
+    def source_digest(self, url: str) -> Union[str, None]:
+        """
+        Looks up the digest of the last download from an URL.
+
+        Parameters
+        ----------
+        url : str
+            URL of the audio file.
+
+        Returns
+        -------
+        str or None
+            SHA-256 digest of the downloaded bytes, None if the URL was not downloaded yet.
+
+        """
+        with self._lock:
+            row = self._conn.execute('SELECT sha256 FROM source WHERE url = ?', (url,)).fetchone()
+        return None if row is None else row[0]
+
+    def lookup(self, url: str, variant: str) -> Union[Tuple[Union[str, None], Union[int, None]], None]:
+        """
+        Looks up the validators of the last download from an URL, if a blob transcoded from it is stored.
+
+        Parameters
+        ----------
+        url : str
+            URL of the audio file.
+        variant : str
+            Transcoding settings of the blob.
+
+        Returns
+        -------
+        tuple or None
+            The ETag and size of the download, None if no blob of the URL is stored.
+
+        """
+        with self._lock:
+            row = self._conn.execute('''
+            SELECT source.etag, source.size, variant.blob FROM source
+            JOIN variant ON variant.source_sha256 = source.sha256
+            WHERE source.url = ? AND variant.variant = ?
+            ''', (url, variant)).fetchone()
+        if row is None or not Path(row[2]).exists():
+            return None
+        return row[0], row[1]
+
+    def find(self, source_digest: Union[str, None], variant: str) -> Union[Path, None]:
+        """
+        Finds the blob transcoded from a download with the given settings.
+
+        Parameters
+        ----------
+        source_digest : str or None
+            SHA-256 digest of the downloaded bytes.
+        variant : str
+            Transcoding settings of the blob.
+
+        Returns
+        -------
+        Path or None
+            Path to the blob, None if it is not stored.
+
+        """
+        if source_digest is None:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT blob FROM variant WHERE source_sha256 = ? AND variant = ?', (source_digest, variant)
+            ).fetchone()
+        if row is None or not Path(row[0]).exists():
+            return None
+        return Path(row[0])
+
+    def put(self, file_name: Union[str, Path], source_digest: Union[str, None] = None, variant: Union[str, None] = None,
+            digest: Union[str, None] = None) -> Tuple[str, Path]:
+        """
+        Moves a file into the store. If a blob with the same content is already stored, the file is removed instead.
+
+        Parameters
+        ----------
+        file_name : str or Path
+            Path to the file, its extension is kept.
+        source_digest : str or None, default None
+            SHA-256 digest of the download the file was transcoded from, to find the blob by 'find'.
+        variant : str or None, default None
+            Transcoding settings of the file.
+        digest : str or None, default None
+            SHA-256 digest of the file, computed if None.
+
+        Returns
+        -------
+        tuple
+            The SHA-256 digest and the path of the blob.
+
+        """
+        file_name = Path(file_name)
+        digest = digest or file_digest(file_name)
+        blob = self.blob_path(digest, file_name.suffix[1:])
+        if blob.exists():
+            self._print(f"Blob '{digest}' is already stored, removing '{file_name}'.")
+            file_name.unlink()
+        else:
+            blob.parent.mkdir(exist_ok=True)
+            replace(file_name, blob)
+        if source_digest is not None and variant is not None:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO variant (source_sha256, variant, blob) VALUES (?, ?, ?)',
+                    (source_digest, variant, str(blob))
+                )
+        return digest, blob
+
+    def verify(self, expected: Union[Dict[Union[str, Path], str], None] = None,
+               max_workers: Union[int, None] = None) -> DataFrame:
+        """
+        Verifies the integrity of the stored files by hashing them in parallel.
+
+        Parameters
+        ----------
+        expected : dict or None, default None
+            Maps file paths to their expected SHA-256 digests, all blobs of the store are checked against the digests
+            in their names if None.
+        max_workers : int or None, default None
+            Number of threads hashing the files, defaults to the number of CPUs plus four.
+
+        Returns
+        -------
+        DataFrame
+            The checked files with their expected digests and status ('ok', 'corrupt' or 'missing').
+
+        """
+        if expected is None:
+            expected = {blob: blob.stem for blob in sorted(self.folder.glob('??/*.*'))}
+        expected = {Path(file_name): digest for file_name, digest in expected.items()}
+        files = list(expected)
+
+        def status(file_name: Path) -> str:
+            if not file_name.exists():
+                return 'missing'
+            return 'ok' if file_digest(file_name) == expected[file_name] else 'corrupt'
+
+        from pandas import DataFrame
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            result = DataFrame({
+                'file_path': [str(file_name) for file_name in files],
+                'sha256': [expected[file_name] for file_name in files],
+                'status': list(executor.map(status, files))
+            })
+        n_failed = (result['status'] != 'ok').sum()
+        self._print(f"Verified {len(result)} files, {n_failed} are corrupt or missing.")
+        return result
@@ -0,0 +1,231 @@
+from __future__ import annotations
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from json import loads
+from logging import WARNING
+from math import ceil
+from multiprocessing import get_context
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Iterable, List, Tuple, Union
+from zeitsprung.audio import load_samples, to_mono
+from zeitsprung.base import Base
+from zeitsprung.database import SQLiteEngine
+
+if TYPE_CHECKING:
+    from numpy import ndarray
+
+Segment = Tuple[float, float, str]
+VOSK_FRAME_RATE = 16000
+_transcribe = None
+
+
+def vosk_engine(model: Union[str, Path, None] = None, lang: str = 'de') -> Callable:
+    """
+    Loads a Vosk speech recognition model, which runs offline on the CPU. Requires the optional 'vosk' package.
+
+    Parameters
+    ----------
+    model : str, Path or None, default None
+        Path to the folder of an unpacked Vosk model, the small model of the language is used if None (downloaded by
+        Vosk on first use).
+    lang : str, default 'de'
+        Language of the model, if no path is given.
+
+    Returns
+    -------
+    callable
+        Function, which transcribes a batch of chunks of mono samples in [-1, 1] at a given frame rate into the start
+        and stop in seconds relative to the chunk and the text of the recognized utterances.
+
+    """
+    from numpy import arange, clip, interp, int16
+    from vosk import KaldiRecognizer, Model, SetLogLevel
+    SetLogLevel(-1)
+    vosk_model = Model(str(model)) if model is not None else Model(lang=lang)
+
+    def transcribe(chunks: List[ndarray], frame_rate: int) -> List[List[Segment]]:
+        result = []
+        for samples in chunks:
+            if frame_rate != VOSK_FRAME_RATE:
+                n_frames = int(len(samples) * VOSK_FRAME_RATE / frame_rate)
+                samples = interp(arange(n_frames) * frame_rate / VOSK_FRAME_RATE, arange(len(samples)), samples)
+            pcm = (clip(samples, -1, 1) * 32767).astype(int16).tobytes()
+            recognizer = KaldiRecognizer(vosk_model, VOSK_FRAME_RATE)
+            recognizer.SetWords(True)
+            utterances = []
+            for i in range(0, len(pcm), 8000):
+                if recognizer.AcceptWaveform(pcm[i:i + 8000]):
+                    utterances.append(loads(recognizer.Result()))
+            utterances.append(loads(recognizer.FinalResult()))
+            result.append([(words[0]['start'], words[-1]['end'], utterance['text'])
+                           for utterance in utterances for words in [utterance.get('result')] if words])
+        return result
+
+    return transcribe
+
+
+ENGINES = {
+    'vosk': vosk_engine
+}
+
+
+def get_engine(engine: Union[str, Callable]) -> Callable:
+    """
+    Resolves the factory of the speech recognition engine.
+
+    Parameters
+    ----------
+    engine : str or callable
+        Name of a built-in engine ('vosk') or a custom factory without arguments, e.g. 'functools.partial(vosk_engine,
+        "path/to/model")'. The factory is called once per worker process and returns a function with the signature of
+        the engine returned by 'vosk_engine'. It must be picklable, in order to be sent to the worker processes.
+
+    Returns
+    -------
+    callable
+        The factory of the engine.
+
+    """
+    if callable(engine):
+        return engine
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown transcription engine '{engine}', use one of {', '.join(ENGINES)}.")
+    return ENGINES[engine]
+
+
+def _load_engine(factory: Callable) -> None:
+    global _transcribe
+    _transcribe = factory()
+
+
+def transcribe_chunks(file_name: Union[str, Path], chunks: List[Tuple[float, float]]) -> List[Segment]:
+    """
+    Transcribes a batch of chunks of an audio file with the engine loaded in the worker process. '.wav' files are
+    memory-mapped, so only the chunks of the batch are read, other formats are decoded.
+
+    Parameters
+    ----------
+    file_name : str or Path
+        Path to the audio file.
+    chunks : list of tuples
+        Start and stop in seconds of the chunks, chunks beyond the end of the file are skipped.
+
+    Returns
+    -------
+    list
+        Start and stop in seconds relative to the start of the file and the text of the transcribed segments.
+
+    """
+    samples, frame_rate = load_samples(file_name)
+    offsets, batch = [], []
+    for start, stop in chunks:
+        chunk = samples[round(start * frame_rate):round(stop * frame_rate)]
+        if len(chunk):
+            offsets.append(start)
+            batch.append(to_mono(chunk))
+    segments = _transcribe(batch, frame_rate) if batch else []
+    return [(offset + start, offset + stop, text) for offset, chunk_segments in zip(offsets, segments)
+            for start, stop, text in chunk_segments if text]
+
+
+class Transcriber(Base):
+    """Class to transcribe the stored audio files of the episodes with a local speech recognition engine."""
+
+    def __init__(self, db: SQLiteEngine, engine: Union[str, Callable] = 'vosk', chunk_length: float = 30.0,
+                 batch_size: int = 8, max_workers: Union[int, None] = None, verbose: bool = True) -> None:
+        """
+        Class constructor for the Transcriber class.
+
+        Parameters
+        ----------
+        db : SQLiteEngine
+            Database with the 'audio' relation of the episodes, the results are written to the 'transcript' relation.
+        engine : str or callable, default 'vosk'
+            Speech recognition engine, the name of a built-in engine or a factory (see 'get_engine').
+        chunk_length : float, default 30.0
+            Length of the chunks in seconds, in which the audio files are transcribed.
+        batch_size : int, default 8
+            Number of chunks sent to a worker process at once.
+        max_workers : int or None, default None
+            Number of worker processes, each loads the model once. Defaults to the number of CPUs.
+        verbose : bool, default True
+            Print messages about the activities conducted by a class instance.
+
+        Returns
+        -------
+        None
+
+        """
+        super().__init__(verbose)
+        self.db = db
+        self.engine = get_engine(engine)
+        self.chunk_length = chunk_length
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.verbose = verbose
+
+    def __str__(self) -> str:
+        """
+        Print function of the class.
+
+        Returns
+        -------
+        str
+            A string, which describes the class instance.
+
+        """
+        return f"Transcriber with chunks of {self.chunk_length} seconds in batches of {self.batch_size}."
+
+    def transcribe(self, uids: Union[Iterable[int], None] = None, overwrite: bool = False) -> int:
+        """
+        Transcribes the audio files of the episodes in a pool of processes. The chunks of '.wav' files are sent to the
+        workers in batches, other formats are transcribed in one batch per episode to decode them only once. The
+        transcript of an episode is written to the database by the calling thread, when all of its batches are done.
+
+        Parameters
+        ----------
+        uids : iterable of int or None, default None
+            Numbers of the episodes, all episodes with audio files if None.
+        overwrite : bool, default False
+            Transcribe episodes again, which are already marked as transcribed.
+
+        Returns
+        -------
+        int
+            Number of transcribed episodes.
+
+        """
+        audio = self.db.query_audio(columns=['uid', 'file_path', 'duration'], uids=uids)
+        if not overwrite:
+            audio = audio[~audio['uid'].isin(self.db.query_transcribed_uids())]
+        if audio.empty:
+            return 0
+        self._print(f"Transcribing {len(audio)} episodes.")
+        n_done = 0
+        with ProcessPoolExecutor(self.max_workers, mp_context=get_context('spawn'), initializer=_load_engine,
+                                 initargs=(self.engine,)) as pool:
+            futures, segments = {}, {}
+            for uid, file_path, duration in audio.itertuples(index=False):
+                chunks = [(i * self.chunk_length, (i + 1) * self.chunk_length)
+                          for i in range(ceil((duration + 1) / self.chunk_length))]
+                batch_size = self.batch_size if Path(file_path).suffix.lower() == '.wav' else len(chunks)
+                segments[uid] = []
+                for i in range(0, len(chunks), batch_size):
+                    futures[pool.submit(transcribe_chunks, file_path, chunks[i:i + batch_size])] = uid
+            remaining = Counter(futures.values())
+            for future in as_completed(futures):
+                uid = futures[future]
+                if uid not in segments:
+                    continue
+                try:
+                    segments[uid] += future.result()
+                except Exception as e:
+                    self._print(f"Failed to transcribe episode {uid}: {e!r}", WARNING, uid=uid, error=repr(e))
+                    del segments[uid]
+                    continue
+                remaining[uid] -= 1
+                if remaining[uid] == 0:
+                    self.db.insert_transcript(uid, sorted(segments.pop(uid)))
+                    n_done += 1
+        self._print(f"Transcribed {n_done} episodes.")
+        return n_done